@@ -0,0 +1,141 @@
+"""
+In-process caches for VibeBeats
+
+Thin wrappers around cachetools that keep hit/miss counters so every cache can
+report its effectiveness through the metrics endpoint.
+"""
+
+import time
+
+from cachetools import TLRUCache, TTLCache
+
+_MISSING = object()
+
+
+class StatsCache:
+    """Wraps a cachetools cache and counts hits and misses."""
+
+    def __init__(self, cache):
+        self._cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return a cached value, counting the lookup as a hit or miss."""
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """Return a cached value without touching the counters."""
+        return self._cache.get(key, default)
+
+    def set(self, key, value):
+        """Store a value under key."""
+        self._cache[key] = value
+
+    def invalidate(self, key):
+        """Drop a single entry if present."""
+        self._cache.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self) -> dict:
+        """Return size and hit/miss figures."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class StatsTTLCache(StatsCache):
+    """TTL + LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(TTLCache(maxsize=maxsize, ttl=ttl))
+
+
+class StatsBytesTTLCache(StatsCache):
+    """TTL + LRU cache of bytes values bounded by their total length."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        super().__init__(TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=len))
+
+    def set(self, key, value):
+        """Store a value under key unless it alone exceeds the bound."""
+        if len(value) <= self._cache.maxsize:
+            self._cache[key] = value
+
+    def stats(self) -> dict:
+        """Return size, bytes held and hit/miss figures."""
+        return {**super().stats(), "bytes": self._cache.currsize}
+
+
+class StatsTLRUCache(StatsCache):
+    """LRU cache whose entries expire at a per-entry wall-clock timestamp.
+
+    ``expires_at(key, value)`` must return the expiry as a Unix timestamp.
+    """
+
+    def __init__(self, maxsize: int, expires_at):
+        super().__init__(TLRUCache(
+            maxsize=maxsize,
+            ttu=lambda key, value, now: expires_at(key, value),
+            timer=time.time,
+        ))
+
+
+class TaggedTTLCache(StatsTTLCache):
+    """TTL + LRU cache whose entries can also be dropped by tag.
+
+    Entries are stored with a set of tags (for example the beats they contain)
+    so a write can invalidate exactly the entries it affects.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._tagged = {}
+        self._sets_since_prune = 0
+
+    def set(self, key, value, tags=()):
+        """Store a value under key, indexed by each of tags."""
+        super().set(key, value)
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+
+        # Expired and evicted keys linger in the tag index; sweep them periodically
+        self._sets_since_prune += 1
+        if self._sets_since_prune >= self._cache.maxsize:
+            self._prune()
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry stored with any of tags."""
+        for tag in tags:
+            for key in self._tagged.pop(tag, ()):
+                self._cache.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        super().clear()
+        self._tagged.clear()
+
+    def _prune(self):
+        self._sets_since_prune = 0
+        for tag in list(self._tagged):
+            live = {key for key in self._tagged[tag] if key in self._cache}
+            if live:
+                self._tagged[tag] = live
+            else:
+                del self._tagged[tag]
@@ -0,0 +1,227 @@
+"""
+Columnar Catalog Index for VibeBeats
+
+An optional in-process snapshot of the beat catalog stored as NumPy columns
+(bpm, price, genre code, plays, purchases, created_at) plus an id
+array. Filter + sort + limit queries are answered with vectorized masks and a
+partial sort, returning only the ids of the page; the caller hydrates those
+from Mongo with one $in lookup. Text search and sorts the index does not hold
+fall back to Mongo.
+
+Ordering matches pagination.paginate: (sort field, id) in the sort direction,
+with the same opaque cursors. created_at keeps BSON's type order too, so ISO
+strings written by the API and seeded BSON dates page the way Mongo sorts them.
+
+The index is per process. Each worker applies its own beat writes and
+purchases immediately and reloads the whole catalog every
+CATALOG_INDEX_REFRESH_SECONDS (see server.py), which picks up other workers'
+writes and flushed play counts. Play counts are never applied in between, so
+the index orders by the same values the hydrated documents show.
+"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+_NUMERIC_COLUMNS = {
+    "bpm": np.int32,
+    "price": np.float64,
+    "genre": np.int32,
+    "plays": np.int64,
+    "purchases": np.int64,
+    "created_at": np.int64,  # See _created_key
+}
+
+SORT_FIELDS = ("created_at", "plays", "purchases", "price", "bpm")
+
+_INITIAL_CAPACITY = 1024
+
+
+def _id_prefix(beat_id: str) -> np.uint64:
+    # First 8 UTF-8 bytes as a big-endian integer: orders like the id string itself
+    return np.uint64(int.from_bytes(beat_id.encode("utf-8")[:8].ljust(8, b"\0"), "big"))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+# created_at keys are BSON type rank * _TYPE_SPAN + microseconds since the epoch;
+# the span leaves room for any date between the years 385 and 3554
+_TYPE_SPAN = 10 ** 17
+_NULL, _STRING, _DATE = 0, 1, 2
+
+
+def _created_key(value) -> int:
+    # null < string < date, as Mongo sorts mixed created_at values
+    if isinstance(value, str):
+        rank, value = _STRING, datetime.fromisoformat(value)
+    elif isinstance(value, datetime):
+        rank = _DATE
+    else:
+        return _NULL
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return rank * _TYPE_SPAN + (value - _EPOCH) // _MICROSECOND
+
+
+def _created_value(key: int):
+    rank = (key + _TYPE_SPAN // 2) // _TYPE_SPAN
+    if rank == _NULL:
+        return None
+    value = _EPOCH + (key - rank * _TYPE_SPAN) * _MICROSECOND
+    return value.isoformat() if rank == _STRING else value
+
+
+class CatalogIndex:
+    """Columnar beat snapshot answering filter + top-k queries without Mongo."""
+
+    def __init__(self):
+        self.ready = False
+        self._size = 0
+        self._free = []
+        self._rows = {}
+        self._genres = {}
+        self._ids = np.empty(_INITIAL_CAPACITY, dtype=object)
+        self._id_keys = np.zeros(_INITIAL_CAPACITY, dtype=np.uint64)
+        self._alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self._columns = {name: np.zeros(_INITIAL_CAPACITY, dtype=dtype) for name, dtype in _NUMERIC_COLUMNS.items()}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, beat: dict):
+        """Insert a beat or overwrite its row."""
+        row = self._rows.get(beat["id"])
+        if row is None:
+            row = self._free.pop() if self._free else self._append_row()
+            self._rows[beat["id"]] = row
+            self._ids[row] = beat["id"]
+            self._id_keys[row] = _id_prefix(beat["id"])
+            self._alive[row] = True
+
+        genre = beat.get("genre")
+        self._columns["genre"][row] = self._genres.setdefault(genre, len(self._genres))
+        self._columns["bpm"][row] = beat.get("bpm") or 0
+        self._columns["price"][row] = beat.get("price") or 0
+        self._columns["plays"][row] = beat.get("plays") or 0
+        self._columns["purchases"][row] = beat.get("purchases") or 0
+        self._columns["created_at"][row] = _created_key(beat.get("created_at"))
+
+    def remove(self, beat_id: str):
+        """Drop a beat; its row is reused by the next insert."""
+        row = self._rows.pop(beat_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self._ids[row] = None
+            self._free.append(row)
+
+    def ids(self) -> list:
+        """Ids of every indexed beat."""
+        return list(self._rows)
+
+    def increment(self, beat_id: str, field: str, amount: float = 1):
+        """Add amount to a numeric column of one beat (plays, purchases)."""
+        row = self._rows.get(beat_id)
+        if row is not None:
+            self._columns[field][row] += amount
+
+    def cursor_value(self, beat_id: str, field: str):
+        """Sort value of one beat in the form Mongo stores it, for building cursors."""
+        value = self._columns[field][self._rows[beat_id]].item()
+        if field == "created_at":
+            return _created_value(value)
+        return value
+
+    def _append_row(self) -> int:
+        if self._size == len(self._alive):
+            capacity = len(self._alive) * 2
+            self._ids = np.resize(self._ids, capacity)
+            self._ids[self._size:] = None
+            self._id_keys = np.concatenate([self._id_keys, np.zeros(capacity - self._size, dtype=np.uint64)])
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - self._size, dtype=bool)])
+            for name, column in self._columns.items():
+                self._columns[name] = np.concatenate([column, np.zeros(capacity - self._size, dtype=column.dtype)])
+        self._size += 1
+        return self._size - 1
+
+    def query(
+        self,
+        sort_field: str,
+        direction: int,
+        limit: int,
+        genre: Optional[str] = None,
+        min_bpm: Optional[int] = None,
+        max_bpm: Optional[int] = None,
+        max_price: Optional[float] = None,
+        after: Optional[tuple] = None,
+    ) -> list:
+        """Return up to limit beat ids ordered by (sort_field, id) in direction.
+
+        after is a decoded cursor (sort value, id); results start strictly past it.
+        """
+        n = self._size
+        mask = self._alive[:n].copy()
+        if genre:
+            code = self._genres.get(genre)
+            if code is None:
+                return []
+            mask &= self._columns["genre"][:n] == code
+        if min_bpm:
+            mask &= self._columns["bpm"][:n] >= min_bpm
+        if max_bpm:
+            mask &= self._columns["bpm"][:n] <= max_bpm
+        if max_price:
+            mask &= self._columns["price"][:n] <= max_price
+
+        # Work in ascending order: negate values and invert id prefixes for descending sorts
+        descending = direction < 0
+        values = self._columns[sort_field][:n]
+        keys = -values if descending else values
+        id_keys = ~self._id_keys[:n] if descending else self._id_keys[:n]
+
+        if after is not None:
+            value, beat_id = after
+            if sort_field == "created_at":
+                value = _created_key(value)
+            key = -value if descending else value
+            id_key = _id_prefix(beat_id)
+            id_key = ~id_key if descending else id_key
+            beyond = (keys > key) | ((keys == key) & (id_keys > id_key))
+            # Ids sharing the cursor's 8-byte prefix are compared in full
+            for row in np.flatnonzero(mask & (keys == key) & (id_keys == id_key)):
+                beyond[row] = self._ids[row] < beat_id if descending else self._ids[row] > beat_id
+            mask &= beyond
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > limit:
+            # Partial selection on the sort value, then on the id prefix among rows tied at the cutoff
+            cutoff = np.partition(keys[candidates], limit - 1)[limit - 1]
+            better = candidates[keys[candidates] < cutoff]
+            tied = candidates[keys[candidates] == cutoff]
+            needed = limit - len(better)
+            if len(tied) > needed:
+                id_cutoff = np.partition(id_keys[tied], needed - 1)[needed - 1]
+                tied = tied[id_keys[tied] <= id_cutoff]
+            candidates = np.concatenate([better, tied])
+
+        rows = sorted(candidates.tolist(), key=lambda row: self._ids[row], reverse=descending)
+        rows.sort(key=lambda row: (keys[row], id_keys[row]))
+        return [self._ids[row] for row in rows[:limit]]
+
+    def stats(self) -> dict:
+        """Return row counts and the bytes held by the columns."""
+        return {
+            "ready": self.ready,
+            "beats": len(self._rows),
+            "capacity": len(self._alive),
+            "genres": len(self._genres),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes used by the columns, ids and row map."""
+        size = self._alive.nbytes + self._ids.nbytes + self._id_keys.nbytes + sys.getsizeof(self._rows)
+        size += sum(column.nbytes for column in self._columns.values())
+        size += sum(sys.getsizeof(beat_id) for beat_id in self._rows)
+        return size
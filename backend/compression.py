@@ -0,0 +1,237 @@
+"""
+Response Compression for VibeBeats
+
+An ASGI middleware that gzip- or brotli-compresses text responses above a size
+threshold. A response's ETag identifies its exact body, so compressed bodies
+are kept in a byte-bounded, expiring cache keyed by (ETag, encoding) and a hot
+catalog page is compressed once rather than once per request. Streamed
+responses (exports) are compressed chunk by chunk. Every compressible response
+carries Vary: Accept-Encoding, whether or not this client got it compressed.
+
+Compressed representations get their own ETag ('"abc"' becomes '"abc-gzip"');
+identity_etag() maps it back for conditional request checks.
+"""
+
+import re
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+DEFAULT_MEDIA_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/csv",
+    "text/css",
+    "text/html",
+    "text/plain",
+})
+
+_ENCODED_ETAG_RE = re.compile(r'-(?:gzip|br)"$')
+
+
+def identity_etag(etag: str) -> str:
+    """Strip the encoding suffix this middleware adds to an ETag."""
+    return _ENCODED_ETAG_RE.sub('"', etag)
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compresses allowlisted responses for clients that accept gzip or br.
+
+    cache is a StatsCache (or None) holding the precompressed bodies of
+    responses that carry an ETag.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        media_types=DEFAULT_MEDIA_TYPES,
+        exclude_paths=(),
+        cache=None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.media_types = frozenset(media_types)
+        self.exclude_paths = tuple(exclude_paths)
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        encoding = self._negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    response_headers = MutableHeaders(raw=message["headers"])
+                    if self.compressible(message["status"], response_headers):
+                        response_headers.add_vary_header("Accept-Encoding")
+                await send(message)
+
+            return await self.app(scope, receive, send_with_vary)
+
+        responder = _CompressingResponder(self, send, encoding, headers.get("if-none-match", ""))
+        await self.app(scope, receive, responder.send)
+
+    def _negotiate(self, accept_encoding: str):
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.partition(";")
+            quality = 1.0
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if quality > 0:
+                accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compressible(self, status: int, headers) -> bool:
+        """Whether a response's representation depends on Accept-Encoding."""
+        if status == 304:
+            # Stands in for the 200 it revalidates, which is compressible if it has an ETag
+            return "etag" in headers
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return media_type in self.media_types and "content-encoding" not in headers
+
+    def compressor(self, encoding: str):
+        if encoding == "br":
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return zlib.compress(body, self.gzip_level, wbits=31)
+
+
+class _CompressingResponder:
+    """Per-request send() wrapper; holds the start message until the first body chunk."""
+
+    def __init__(self, middleware: CompressionMiddleware, send, encoding: str, if_none_match: str):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.if_none_match = if_none_match
+        self.start = None
+        self.stream = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if self.passthrough:
+            return await self._send(message)
+
+        if message["type"] == "http.response.start":
+            return await self._on_start(message)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(message.get("body", b""))
+            if not message.get("more_body", False):
+                chunk += self.stream.finish()
+            return await self._send({**message, "body": chunk})
+
+        return await self._on_first_body(message)
+
+    async def _on_start(self, message):
+        headers = MutableHeaders(raw=message["headers"])
+        compressible = self.middleware.compressible(message["status"], headers)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+
+        if message["status"] == 304:
+            # The client revalidated the representation it holds, compressed or not
+            if "etag" in headers and f'-{self.encoding}"' in self.if_none_match:
+                headers["etag"] = _encoded_etag(headers["etag"], self.encoding)
+            self.passthrough = True
+            return await self._send(message)
+
+        if not compressible:
+            self.passthrough = True
+            return await self._send(message)
+
+        self.start = message
+
+    async def _on_first_body(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+
+        if not more_body:
+            if len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                return await self._send(message)
+
+            compressed = self._compressed(body, headers.get("etag"))
+            headers["content-encoding"] = self.encoding
+            headers["content-length"] = str(len(compressed))
+            if "etag" in headers:
+                headers["etag"] = _encoded_etag(headers["etag"], self.encoding)
+            self.passthrough = True
+            await self._send(self.start)
+            return await self._send({**message, "body": compressed})
+
+        # Streaming response: compress each chunk as it arrives
+        self.stream = self.middleware.compressor(self.encoding)
+        headers["content-encoding"] = self.encoding
+        if "content-length" in headers:
+            del headers["content-length"]
+        if "etag" in headers:
+            headers["etag"] = _encoded_etag(headers["etag"], self.encoding)
+        await self._send(self.start)
+        await self._send({**message, "body": self.stream.compress(body)})
+
+    def _compressed(self, body: bytes, etag) -> bytes:
+        cache = self.middleware.cache
+        if cache is None or not etag or self.start["status"] != 200:
+            return self.middleware.compress(self.encoding, body)
+
+        key = (etag, self.encoding)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = self.middleware.compress(self.encoding, body)
+            cache.set(key, compressed)
+        return compressed
@@ -7,10 +7,23 @@ This script:
 3. Validates database connection and configuration
 
 Usage:
-    python init_db.py [--seed]
+    python init_db.py [--seed] [--verify-indexes] [--backfill-producer-stats]
+                      [--backfill-sales-buckets]
 
 Options:
-    --seed    Populate database with sample data
+    --seed              Populate an empty database with sample data and
+                        build its counters and buckets (existing data is
+                        left alone; use the backfill options for it)
+    --backfill-producer-stats
+                        Recompute the total_* counters in producer_stats,
+                        the producers' daily sales rollups and each beat's
+                        purchase count from the purchases collection
+    --backfill-sales-buckets
+                        Rebuild the monthly sales time-series buckets, per
+                        beat and per producer, from the purchases collection
+    --verify-indexes    Explain every endpoint query shape and fail if any
+                        plan uses a COLLSCAN or an in-memory SORT, except
+                        the bounded sorts listed in BOUNDED_SORTS
 """
 
 import asyncio
@@ -19,6 +32,10 @@ import os
 from datetime import datetime, timedelta
 import uuid
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+import sales_buckets
+from pagination import encode_cursor, keyset_filter
+from search_index import beat_search_words
 from passlib.context import CryptContext
 import random
 
@@ -28,6 +45,7 @@ load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "vibeats")
+LISTENER_SKETCH_RETENTION_DAYS = int(os.getenv("LISTENER_SKETCH_RETENTION_DAYS", "35"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -42,6 +60,53 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# Mirrors BEAT_SORT_FIELDS in server.py
+BEAT_SORT_FIELDS = {
+    "created_at": -1,
+    "plays": -1,
+    "purchases": -1,
+    "price": 1,
+    "bpm": 1,
+    "title": 1,
+    "trending": -1,
+}
+
+# Indexes from earlier versions that the compound indexes below supersede, or whose
+# fields moved elsewhere (producer counters now live in producer_stats)
+SUPERSEDED_INDEXES = {
+    "users": ["user_type_1_total_sales_-1_id_-1"],
+    "beats": ["producer_id_1", "genre_1", "created_at_1", "price_1", "plays_1", "purchases_1"],
+    "purchases": ["buyer_id_1", "producer_id_1", "created_at_1"],
+    "projects": ["artist_id_1", "created_at_1"],
+}
+
+
+# Catalog search index; producer_name is included so $text covers every field the
+# old regex search matched, and titles outrank tags and descriptions
+BEATS_TEXT_INDEX_WEIGHTS = {"title": 10, "producer_name": 5, "tags": 5, "description": 1}
+
+
+async def create_beats_text_index(db):
+    """Create the catalog text index, rebuilding it if its fields or weights changed."""
+    existing = (await db.beats.index_information()).get("beats_text_search")
+    if existing and existing.get("weights") != BEATS_TEXT_INDEX_WEIGHTS:
+        await db.beats.drop_index("beats_text_search")
+    await db.beats.create_index(
+        [(field, "text") for field in BEATS_TEXT_INDEX_WEIGHTS],
+        name="beats_text_search",
+        weights=BEATS_TEXT_INDEX_WEIGHTS
+    )
+
+
+async def drop_superseded_indexes(db):
+    """Drop old single-field indexes so the planner cannot pick them over a sort index."""
+    for collection, names in SUPERSEDED_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+
+
 async def create_indexes(db):
     """Create MongoDB indexes for optimal query performance."""
     print("\n[1/3] Creating indexes...")
@@ -52,50 +117,94 @@ async def create_indexes(db):
     await db.users.create_index("email", unique=True)
     await db.users.create_index("user_type")
     await db.users.create_index("created_at")
+    await db.users.create_index([("user_type", 1), ("created_at", -1)])
+
+    # Producer counters (one document per producer, kept apart from the public profile)
+    print("  Creating producer_stats indexes...")
+    await db.producer_stats.create_index("producer_id", unique=True)
+    await db.producer_stats.create_index([("total_sales", -1), ("producer_id", -1)])
 
     # Beats collection indexes
     print("  Creating beats indexes...")
     await db.beats.create_index("id", unique=True)
-    await db.beats.create_index("producer_id")
-    await db.beats.create_index("genre")
-    await db.beats.create_index("created_at")
-    await db.beats.create_index("price")
-    await db.beats.create_index("plays")
-    await db.beats.create_index("purchases")
-    await db.beats.create_index(
-        [("title", "text"), ("description", "text"), ("tags", "text")],
-        name="beats_text_search"
-    )
+    # get_beats: equality on genre, sort on the requested field, bpm/price ranges
+    # filtered from the index keys. The trailing id matches the keyset tiebreaker.
+    for field, direction in BEAT_SORT_FIELDS.items():
+        keys = [(field, direction), ("id", direction)]
+        keys += [(range_field, 1) for range_field in ("bpm", "price") if range_field != field]
+        await db.beats.create_index(keys)
+        await db.beats.create_index([("genre", 1)] + keys)
+    await db.beats.create_index([("producer_id", 1), ("created_at", -1), ("id", -1)])
+    await create_beats_text_index(db)
+    # Short searches: anchored prefixes of the normalized words of each beat
+    await db.beats.create_index("search_words")
 
     # Purchases collection indexes
     print("  Creating purchases indexes...")
     await db.purchases.create_index("id", unique=True)
-    await db.purchases.create_index("buyer_id")
-    await db.purchases.create_index("producer_id")
     await db.purchases.create_index("beat_id")
     await db.purchases.create_index([("beat_id", 1), ("buyer_id", 1)], unique=True)
-    await db.purchases.create_index("created_at")
+    await db.purchases.create_index([("buyer_id", 1), ("created_at", -1), ("id", -1)])
+    await db.purchases.create_index([("producer_id", 1), ("created_at", -1), ("id", -1)])
 
     # Projects collection indexes
     print("  Creating projects indexes...")
     await db.projects.create_index("id", unique=True)
-    await db.projects.create_index("artist_id")
     await db.projects.create_index("beat_id")
     await db.projects.create_index("status")
-    await db.projects.create_index("created_at")
+    await db.projects.create_index([("artist_id", 1), ("updated_at", -1), ("id", -1)])
+
+    # Producer daily rollups (sales, revenue and plays per producer per day)
+    print("  Creating producer_daily_stats indexes...")
+    await db.producer_daily_stats.create_index([("producer_id", 1), ("day", 1)], unique=True)
+    await db.producer_daily_stats.create_index([("day", 1), ("producer_id", 1)])
+
+    # Sales time-series buckets (one document per producer, beat and month, and per producer and month)
+    print("  Creating sales_buckets indexes...")
+    await db.sales_buckets.create_index([("producer_id", 1), ("beat_id", 1), ("month", 1)], unique=True)
+    # Producer-wide "*" buckets from earlier versions now live in producer_sales_buckets
+    await db.sales_buckets.delete_many({"beat_id": "*"})
+    await db.producer_sales_buckets.create_index([("producer_id", 1), ("month", 1)], unique=True)
+
+    # Unique-listener sketches (one document per beat or producer per day)
+    print("  Creating listener_sketches indexes...")
+    await db.listener_sketches.create_index([("scope", 1), ("key", 1), ("day", 1)], unique=True)
+    await db.listener_sketches.create_index("expires_at", expireAfterSeconds=0)
+    # Sketches written before retention existed expire like new ones
+    await db.listener_sketches.update_many({"expires_at": {"$exists": False}}, [{"$set": {"expires_at": {"$add": [
+        {"$dateFromString": {"dateString": "$day", "format": "%Y-%m-%d"}},
+        LISTENER_SKETCH_RETENTION_DAYS * 24 * 3600 * 1000
+    ]}}}])
+
+    # Revoked tokens collection indexes (TTL index drops entries once the token expires)
+    print("  Creating revoked_tokens indexes...")
+    await db.revoked_tokens.create_index("token_digest", unique=True)
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+
+    # Refresh tokens collection indexes
+    print("  Creating refresh_tokens indexes...")
+    await db.refresh_tokens.create_index("token_digest", unique=True)
+    await db.refresh_tokens.create_index("family_id")
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+
+    # Shared rate limit buckets (only used with RATE_LIMIT_BACKEND=mongo)
+    print("  Creating rate_limits indexes...")
+    await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+
+    await drop_superseded_indexes(db)
 
     print("  All indexes created successfully!")
 
 
 async def seed_database(db):
-    """Populate database with sample data for development."""
+    """Populate database with sample data for development; return whether anything was inserted."""
     print("\n[2/3] Seeding database...")
 
     # Check if data already exists
     existing_users = await db.users.count_documents({})
     if existing_users > 0:
         print("  Database already has data. Skipping seed.")
-        return
+        return False
 
     # Sample genres and keys
     genres = ["Hip Hop", "Trap", "R&B", "Pop", "Lo-fi", "Electronic"]
@@ -225,6 +334,242 @@ async def seed_database(db):
     print(f"    - {len(producers)} producers")
     print(f"    - {len(artists)} artists")
     print(f"    - {len(beats)} beats")
+    return True
+
+
+async def backfill_search_words(db, batch_size: int = 1000):
+    """Store search_words on beats written before short searches used it (and on seeded beats)."""
+    projection = {"_id": 0, "id": 1, "title": 1, "producer_name": 1, "tags": 1, "description": 1}
+    requests = []
+    updated = 0
+    async for beat in db.beats.find({"search_words": {"$exists": False}}, projection):
+        requests.append(UpdateOne({"id": beat["id"]}, {"$set": {"search_words": beat_search_words(beat)}}))
+        if len(requests) >= batch_size:
+            await db.beats.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        await db.beats.bulk_write(requests, ordered=False)
+        updated += len(requests)
+    if updated:
+        print(f"  Stored search words on {updated} beats")
+
+
+async def backfill_producer_stats(db):
+    """Recompute producer_stats, daily sales rollups and beats.purchases from purchases.
+
+    The API maintains these counters incrementally; run this once after upgrading,
+    or to repair drift. Increments landing while it runs can be overwritten.
+    Counters left on users by earlier versions are removed.
+    """
+    print("\n[backfill] Recomputing producer counters...")
+
+    totals = {}
+    async for row in db.beats.aggregate([
+        {"$group": {"_id": "$producer_id", "total_beats": {"$sum": 1}, "total_plays": {"$sum": "$plays"}}}
+    ]):
+        totals.setdefault(row["_id"], {}).update(total_beats=row["total_beats"], total_plays=row["total_plays"])
+    async for row in db.purchases.aggregate([
+        # Older seed data stored the amount as "price"
+        {"$group": {
+            "_id": "$producer_id",
+            "total_sales": {"$sum": 1},
+            "total_revenue": {"$sum": {"$ifNull": ["$amount", "$price"]}}
+        }}
+    ]):
+        totals.setdefault(row["_id"], {}).update(total_sales=row["total_sales"], total_revenue=row["total_revenue"])
+
+    # Daily sales rollups for the leaderboard; plays were never recorded per day before
+    await db.purchases.aggregate([
+        {"$group": {
+            "_id": {
+                "producer_id": "$producer_id",
+                "day": {"$cond": [
+                    {"$eq": [{"$type": "$created_at"}, "date"]},
+                    {"$dateToString": {"date": "$created_at", "format": "%Y-%m-%d"}},
+                    {"$substrBytes": ["$created_at", 0, 10]}
+                ]}
+            },
+            "sales": {"$sum": 1},
+            "revenue": {"$sum": {"$ifNull": ["$amount", "$price"]}}
+        }},
+        {"$project": {"_id": 0, "producer_id": "$_id.producer_id", "day": "$_id.day", "sales": 1, "revenue": 1}},
+        {"$merge": {"into": "producer_daily_stats", "on": ["producer_id", "day"], "whenMatched": "merge"}}
+    ]).to_list(None)
+
+    # Per-beat purchase counters, incremented alongside the rollups on every purchase
+    purchases = {row["_id"]: row["count"] async for row in db.purchases.aggregate([
+        {"$group": {"_id": "$beat_id", "count": {"$sum": 1}}}
+    ])}
+    requests = []
+    async for beat in db.beats.find({}, {"_id": 0, "id": 1}):
+        requests.append(UpdateOne({"id": beat["id"]}, {"$set": {"purchases": purchases.get(beat["id"], 0)}}))
+        if len(requests) >= 1000:
+            await db.beats.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        await db.beats.bulk_write(requests, ordered=False)
+
+    zero = {"total_beats": 0, "total_sales": 0, "total_revenue": 0.0, "total_plays": 0}
+    requests = []
+    updated = 0
+    async for producer in db.users.find({"user_type": "producer"}, {"_id": 0, "id": 1}):
+        requests.append(UpdateOne(
+            {"producer_id": producer["id"]}, {"$set": {**zero, **totals.get(producer["id"], {})}}, upsert=True
+        ))
+        if len(requests) >= 1000:
+            await db.producer_stats.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        await db.producer_stats.bulk_write(requests, ordered=False)
+        updated += len(requests)
+    await db.users.update_many({"user_type": "producer"}, {"$unset": {counter: "" for counter in zero}})
+    print(f"  Updated counters for {updated} producers")
+
+
+async def backfill_sales_buckets(db, batch_size: int = 5000):
+    """Rebuild sales_buckets and producer_sales_buckets from purchases, one bulk upsert per batch.
+
+    Buckets are cleared first and rebuilt with $inc, so run this while no
+    purchases are being made.
+    """
+    print("\n[backfill] Rebuilding sales buckets...")
+    await db.sales_buckets.delete_many({})
+    await db.producer_sales_buckets.delete_many({})
+
+    processed = 0
+    increments = {}
+
+    async def flush():
+        requests = [
+            sales_buckets.bucket_update(producer_id, beat_id, revenue, day, sales)
+            for (producer_id, beat_id, day), (sales, revenue) in increments.items()
+        ]
+        producer_totals = {}
+        for (producer_id, _, day), (sales, revenue) in increments.items():
+            total_sales, total_revenue = producer_totals.get((producer_id, day), (0, 0.0))
+            producer_totals[(producer_id, day)] = (total_sales + sales, total_revenue + revenue)
+        producer_requests = [
+            sales_buckets.producer_bucket_update(producer_id, revenue, day, sales)
+            for (producer_id, day), (sales, revenue) in producer_totals.items()
+        ]
+        if requests:
+            await db.sales_buckets.bulk_write(requests, ordered=False)
+            await db.producer_sales_buckets.bulk_write(producer_requests, ordered=False)
+        increments.clear()
+
+    cursor = db.purchases.find(
+        {}, {"_id": 0, "producer_id": 1, "beat_id": 1, "amount": 1, "price": 1, "created_at": 1}
+    ).batch_size(batch_size)
+    async for purchase in cursor:
+        key = (purchase["producer_id"], purchase["beat_id"], sales_buckets.as_date(purchase["created_at"]))
+        sales, revenue = increments.get(key, (0, 0.0))
+        # Older seed data stored the amount as "price"
+        increments[key] = (sales + 1, revenue + purchase.get("amount", purchase.get("price", 0)))
+        processed += 1
+        if processed % batch_size == 0:
+            await flush()
+            print(f"  {processed} purchases processed")
+    await flush()
+    print(f"  Built sales buckets from {processed} purchases")
+
+
+# The only shapes allowed an in-memory SORT, each with what bounds the documents it sorts.
+# The server counts search matches first and walks the sort index past SEARCH_SORT_MAX_MATCHES
+BOUNDED_SORTS = {
+    "get_beats short search": "at most SEARCH_SORT_MAX_MATCHES (500) matches",
+    "get_beats search": "at most SEARCH_SORT_MAX_MATCHES (500) matches",
+    "get_beats search sort=relevance": "top-k by textScore, keeps at most one page (200) in memory",
+}
+
+
+def endpoint_query_shapes():
+    """List (name, collection, filter, sort, hint) for every query the API issues."""
+    genre_filter = {"genre": "Trap"}
+    range_filter = {"bpm": {"$gte": 90, "$lte": 140}, "price": {"$lte": 100}}
+    shapes = []
+
+    for field, direction in BEAT_SORT_FIELDS.items():
+        sort = [(field, direction), ("id", direction)]
+        last = {"id": "b", field: "2025-01-01T00:00:00+00:00" if field == "created_at" else 0}
+        after = keyset_filter(field, direction, encode_cursor(last, field))
+        shapes += [
+            (f"get_beats sort={field}", "beats", {}, sort, None),
+            (f"get_beats genre sort={field}", "beats", genre_filter, sort, None),
+            (f"get_beats ranges sort={field}", "beats", range_filter, sort, None),
+            (f"get_beats genre+ranges sort={field}", "beats", {**genre_filter, **range_filter}, sort, None),
+            (f"get_beats next page sort={field}", "beats", {"$and": [genre_filter, after]}, sort, None),
+        ]
+
+    newest_first = [("created_at", -1), ("id", -1)]
+    newest_index = [("created_at", -1), ("id", -1), ("bpm", 1), ("price", 1)]
+    short_search = {"$and": [{"search_words": {"$regex": "^da"}}]}
+    text_search = {"$text": {"$search": "dark"}}
+    shapes += [
+        ("get_producer_beats", "beats", {"producer_id": "p"}, newest_first, None),
+        ("get_my_purchases", "purchases", {"buyer_id": "u"}, newest_first, None),
+        ("get_my_sales", "purchases", {"producer_id": "p"}, newest_first, None),
+        ("get_my_projects", "projects", {"artist_id": "u"}, [("updated_at", -1), ("id", -1)], None),
+        ("get_producers", "users", {"user_type": "producer"}, [("created_at", -1)], None),
+        ("get_producers sort=sales", "producer_stats", {}, [("total_sales", -1), ("producer_id", -1)], None),
+        ("get_producers counters", "producer_stats", {"producer_id": {"$in": ["p1", "p2"]}}, None, None),
+        ("get_sales_timeseries beat", "sales_buckets",
+         {"producer_id": "p", "beat_id": "b", "month": {"$gte": "2024-01", "$lte": "2025-12"}}, None, None),
+        ("get_sales_timeseries", "producer_sales_buckets",
+         {"producer_id": "p", "month": {"$gte": "2024-01", "$lte": "2025-12"}}, None, None),
+        ("get_beats short search count", "beats", short_search, None, None),
+        ("get_beats short search", "beats", short_search, newest_first, None),
+        # More than SEARCH_SORT_MAX_MATCHES matches: the server walks the sort index instead
+        ("get_beats short search many matches", "beats", short_search, newest_first, newest_index),
+        ("get_beats search count", "beats", text_search, None, None),
+        ("get_beats search", "beats", text_search, newest_first, None),
+        ("get_beats search many matches", "beats", {"search_words": {"$in": ["dark"]}}, newest_first, newest_index),
+        ("get_beats search sort=relevance", "beats", text_search, [("score", {"$meta": "textScore"})], None),
+        ("get_beat", "beats", {"id": "b"}, None, None),
+        ("purchase lookup", "purchases", {"beat_id": "b", "buyer_id": "u"}, None, None),
+    ]
+    return shapes
+
+
+def plan_stages(plan):
+    """Yield every stage name in an explain plan tree (classic and SBE formats)."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("queryPlan", "inputStage"):
+        yield from plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+async def verify_indexes(db):
+    """Explain each endpoint query shape and report plans that scan or sort in memory."""
+    print("\n[verify] Explaining endpoint query shapes...")
+    failures = 0
+
+    for name, collection, query, sort, hint in endpoint_query_shapes():
+        cursor = db[collection].find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        if hint:
+            cursor = cursor.hint(hint)
+        explain = await cursor.limit(51).explain()
+        stages = list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages or "SORT" in stages and name not in BOUNDED_SORTS:
+            failures += 1
+            print(f"  FAIL {name}: {' <- '.join(stages)}")
+        elif "SORT" in stages:
+            print(f"  ok*  {name}: {' <- '.join(stages)} (in-memory sort of {BOUNDED_SORTS[name]})")
+        else:
+            print(f"  ok   {name}: {' <- '.join(stages)}")
+
+    if failures:
+        print(f"  {failures} query shape(s) need an index")
+    else:
+        print("  Every query shape is served by an index")
+    return failures == 0
 
 
 async def verify_connection(client, db):
@@ -263,6 +608,9 @@ async def main():
 
     # Parse arguments
     seed = "--seed" in sys.argv
+    verify = "--verify-indexes" in sys.argv
+    backfill_producers = "--backfill-producer-stats" in sys.argv
+    backfill_buckets = "--backfill-sales-buckets" in sys.argv
 
     # Connect to MongoDB
     client = AsyncIOMotorClient(MONGO_URL)
@@ -272,15 +620,27 @@ async def main():
         # Create indexes
         await create_indexes(db)
 
-        # Seed database if requested
-        if seed:
-            await seed_database(db)
+        # Seed database if requested (the verifier needs data for realistic plans)
+        seeded = False
+        if seed or verify:
+            seeded = await seed_database(db)
         else:
             print("\n[2/3] Skipping seed (use --seed to populate sample data)")
+        await backfill_search_words(db)
+
+        # Freshly seeded producers start without counters. The backfills rewrite live
+        # counters and clear the buckets, so on existing data they only run when asked for
+        if seeded or backfill_producers:
+            await backfill_producer_stats(db)
+        if seeded or backfill_buckets:
+            await backfill_sales_buckets(db)
 
         # Verify connection
         success = await verify_connection(client, db)
 
+        if success and verify:
+            success = await verify_indexes(db)
+
         if success:
             print("\n" + "=" * 50)
             print("  Database initialization complete!")
@@ -0,0 +1,21 @@
+"""
+Fast JSON Responses for VibeBeats
+
+orjson-backed response class used as the application default. orjson writes
+datetimes, dates and UUIDs natively in the same ISO/str form jsonable_encoder
+produces; anything it does not know (pydantic models, Decimal, timedelta)
+falls back to jsonable_encoder so the output matches the stock JSONResponse.
+"""
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONResponse(ORJSONResponse):
+    """ORJSONResponse that defers unknown types to jsonable_encoder."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=jsonable_encoder, option=_OPTIONS)
@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) Pagination for VibeBeats
+
+List endpoints page on (sort_field, id) instead of skip/offset, so every page
+is a bounded index range scan no matter how deep the client has paged. The
+cursor handed to clients is an opaque base64 encoding of the last document's
+sort value and id.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 200
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _decode_value(obj):
+    if "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    """Build the cursor pointing just past doc."""
+    raw = json.dumps([doc.get(sort_field), doc["id"]], default=_encode_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (sort_value, id) from a cursor, raising 400 if it was tampered with."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded), object_hook=_decode_value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(doc_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, doc_id
+
+
+# BSON sort order of the types a sort field can hold; $lt/$gt only match within one type
+_TYPE_ORDER = ("null", "number", "string", "date")
+
+
+def _bson_type(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return "number"
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(sort_field: str, direction: int, cursor: str) -> dict:
+    """Match documents strictly after the cursor in (sort_field, id) order.
+
+    A field can hold mixed types (created_at is an ISO string when written
+    by the API and a BSON date in seeded data), so besides the same-type
+    comparison the filter also matches every value of a type that sorts
+    after the cursor's in this direction.
+    """
+    value, doc_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    clauses = [{sort_field: value, "id": {op: doc_id}}]
+    if value is not None:
+        clauses.append({sort_field: {op: value}})
+
+    position = _TYPE_ORDER.index(_bson_type(value))
+    following = _TYPE_ORDER[:position] if direction < 0 else _TYPE_ORDER[position + 1:]
+    if "null" in following:
+        clauses.append({sort_field: None})  # null or missing
+    types = [name for name in following if name != "null"]
+    if types:
+        clauses.append({sort_field: {"$type": types}})
+    return {"$or": clauses}
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    direction: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None,
+    hint: Optional[list] = None,
+) -> tuple:
+    """Fetch one page; return (documents, next_cursor or None).
+
+    hint names the index to walk, for filters the planner would otherwise
+    serve from another index and sort in memory.
+    """
+    if cursor:
+        after = keyset_filter(sort_field, direction, cursor)
+        query = {"$and": [query, after]} if query else after
+
+    # One extra document tells us whether another page exists without a count
+    find = collection.find(query, projection or {"_id": 0}).sort([(sort_field, direction), ("id", direction)])
+    if hint:
+        find = find.hint(hint)
+    docs = await find.limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
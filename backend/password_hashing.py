@@ -0,0 +1,85 @@
+"""
+Password Hashing Worker Pool for VibeBeats
+
+bcrypt is deliberately slow (~200ms per hash), so hashing and verification run
+on a dedicated thread pool instead of the event loop. The pool admits a bounded
+number of pending jobs and rejects the rest immediately so login bursts cannot
+queue up unbounded work.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password pool queue is full."""
+
+
+class PasswordHasher:
+    """Runs bcrypt work on a bounded thread pool and records latency metrics."""
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._latencies = deque(maxlen=1024)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with a fresh salt."""
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Check a password against a stored bcrypt hash."""
+        return await self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    async def _run(self, func, *args):
+        # bcrypt releases the GIL, so threads give real parallelism here
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise PasswordHasherBusy()
+
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._latencies.append(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        """Return queue depth and latency figures for the metrics endpoint."""
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": max(0, self._in_flight - self.max_workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+"""
+Write-behind Play Counters for VibeBeats
+
+Play events are aggregated in memory and flushed as a single unordered
+bulk_write, either every flush interval (the maximum staleness) or as soon as
+the buffer holds too many distinct keys. PlayCountBuffer sums play counts per
+beat (or producer); DailyPlayRollupBuffer sums them per producer per day;
+ListenerSketchBuffer merges HyperLogLog registers per beat and producer per day.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from hyperloglog import merge
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Accumulates per-key values and flushes them with one bulk_write.
+
+    Subclasses define how two pending values combine (_combine) and the
+    update each key turns into (_request).
+    """
+
+    def __init__(self, collection, flush_interval: float, max_keys: int):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self._pending = {}
+        self._flush_task = None
+        self.flushes = 0
+        self.flushed_keys = 0
+        self.dropped_keys = 0
+
+    def _add(self, key, value):
+        current = self._pending.get(key)
+        self._pending[key] = value if current is None else self._combine(current, value)
+        if len(self._pending) >= self.max_keys and not self._flushing():
+            self._start_flush()
+
+    def _combine(self, current, value):
+        raise NotImplementedError
+
+    def _request(self, key, value):
+        raise NotImplementedError
+
+    def _flushing(self) -> bool:
+        return self._flush_task is not None and not self._flush_task.done()
+
+    def _start_flush(self):
+        # Every write runs in the tracked task, so a flush is never started twice
+        batch, self._pending = self._pending, {}
+        self._flush_task = asyncio.create_task(self._write(batch))
+        self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        if task.cancelled():
+            logger.error(f"{type(self).__name__} flush cancelled, buffered values lost")
+        elif task.exception() is not None:
+            logger.error(f"{type(self).__name__} flush crashed: {task.exception()!r}")
+
+    async def flush(self):
+        """Write every pending value with one unordered bulk_write.
+
+        Waits for a flush already in progress first. The write itself runs in
+        its own task, so cancelling the caller (e.g. run() at shutdown) never
+        abandons a batch halfway.
+        """
+        if self._flushing():
+            await asyncio.wait({self._flush_task})
+        if self._pending:
+            self._start_flush()
+            await asyncio.wait({self._flush_task})
+
+    async def _write(self, batch: dict):
+        keys = list(batch)
+        try:
+            await self.collection.bulk_write([self._request(key, batch[key]) for key in keys], ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            self._requeue({keys[i]: batch[keys[i]] for i in failed})
+            logger.error(f"{type(self).__name__} flush failed for {len(failed)} keys")
+        except Exception as e:
+            self._requeue(batch)
+            logger.error(f"{type(self).__name__} flush failed: {str(e)}")
+        else:
+            self.flushes += 1
+            self.flushed_keys += len(keys)
+
+    def _requeue(self, batch: dict):
+        # Keep failed values for the next flush, but never grow past the bound
+        for key, value in batch.items():
+            if key in self._pending or len(self._pending) < self.max_keys:
+                current = self._pending.get(key)
+                self._pending[key] = value if current is None else self._combine(current, value)
+            else:
+                self.dropped_keys += 1
+
+    async def run(self):
+        """Flush forever at the configured interval."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        """Return buffer size and flush counters."""
+        return {
+            "pending_keys": len(self._pending),
+            "max_keys": self.max_keys,
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": self.flushes,
+            "flushed_keys": self.flushed_keys,
+            "dropped_keys": self.dropped_keys,
+        }
+
+
+class PlayCountBuffer(WriteBehindBuffer):
+    """Sums play increments per document id into a counter field (beats.plays by default)."""
+
+    def __init__(
+        self, collection, flush_interval: float, max_keys: int,
+        field: str = "plays", key_field: str = "id", upsert: bool = False
+    ):
+        super().__init__(collection, flush_interval, max_keys)
+        self.field = field
+        self.key_field = key_field
+        self.upsert = upsert
+
+    def record(self, beat_id: str, count: int = 1):
+        """Count plays for beat_id; they reach Mongo on the next flush."""
+        self._add(beat_id, count)
+
+    def pending(self, beat_id: str) -> int:
+        """Plays recorded for beat_id that are not in Mongo yet."""
+        return self._pending.get(beat_id, 0)
+
+    def discard(self, beat_id: str) -> int:
+        """Drop the plays pending for beat_id (e.g. a deleted beat) and return how many there were."""
+        return self._pending.pop(beat_id, 0)
+
+    def _combine(self, current, value):
+        return current + value
+
+    def _request(self, beat_id, count):
+        return UpdateOne({self.key_field: beat_id}, {"$inc": {self.field: count}}, upsert=self.upsert)
+
+
+class DailyPlayRollupBuffer(WriteBehindBuffer):
+    """Sums plays per (owner id, day) into upserted rollup documents."""
+
+    def __init__(self, collection, flush_interval: float, max_keys: int, owner_field: str):
+        super().__init__(collection, flush_interval, max_keys)
+        self.owner_field = owner_field
+
+    def record(self, owner_id: str, day: str, count: int = 1):
+        """Count plays for owner_id on day (YYYY-MM-DD)."""
+        self._add((owner_id, day), count)
+
+    def _combine(self, current, value):
+        return current + value
+
+    def _request(self, key, count):
+        owner_id, day = key
+        return UpdateOne({self.owner_field: owner_id, "day": day}, {"$inc": {"plays": count}}, upsert=True)
+
+
+class ListenerSketchBuffer(WriteBehindBuffer):
+    """Merges HyperLogLog registers per (scope, key, day) sketch document.
+
+    Sketches are stored as {"scope", "key", "day", "r": {"<index>": rank},
+    "expires_at"} and merged server-side with $max, so flushes from several
+    workers commute. expires_at is set once, retention_days after the day, for
+    the TTL index to drop sketches nothing reads any more.
+    """
+
+    def __init__(self, collection, flush_interval: float, max_keys: int, retention_days: int):
+        super().__init__(collection, flush_interval, max_keys)
+        self.retention_days = retention_days
+
+    def record(self, scope: str, key: str, day: str, register: tuple):
+        """Fold one (index, rank) register update into a sketch."""
+        index, rank = register
+        self._add((scope, key, day), {index: rank})
+
+    def _combine(self, current, value):
+        return merge(current, value)
+
+    def _request(self, sketch_key, registers):
+        scope, key, day = sketch_key
+        expires_at = datetime.fromisoformat(day).replace(tzinfo=timezone.utc) + timedelta(days=self.retention_days)
+        return UpdateOne(
+            {"scope": scope, "key": key, "day": day},
+            {
+                "$max": {f"r.{index}": rank for index, rank in registers.items()},
+                "$setOnInsert": {"expires_at": expires_at}
+            },
+            upsert=True
+        )
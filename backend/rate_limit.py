@@ -0,0 +1,168 @@
+"""
+Token-bucket Rate Limiting for VibeBeats
+
+An ASGI middleware that charges every request against a per-IP bucket and,
+when the caller can be identified, a per-user bucket. Routes carry different
+costs so bcrypt-bound logins and catalog searches drain a bucket faster than
+cheap reads. Bucket state lives in a pluggable backend: in-process by default,
+or a MongoDB collection when several workers must share limits.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from pymongo import ReturnDocument
+
+
+def client_ip(scope, trusted_proxies: int = 0) -> str:
+    """Return the caller's address behind trusted_proxies reverse proxies.
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For. Once the direct peer is added, the caller is therefore
+    trusted_proxies entries from the right. Anything further left came from
+    the client and may be forged.
+    """
+    addresses = []
+    if trusted_proxies:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                addresses += [part.strip() for part in value.decode("latin-1").split(",") if part.strip()]
+    client = scope.get("client")
+    addresses.append(client[0] if client else "unknown")
+    return addresses[max(0, len(addresses) - 1 - trusted_proxies)]
+
+
+@dataclass(frozen=True)
+class BucketPolicy:
+    """Refill rate in tokens per second and bucket capacity."""
+    rate: float
+    burst: float
+
+
+class InMemoryRateLimitBackend:
+    """Keeps buckets in an LRU-ordered dict local to this process.
+
+    At max_keys the least recently used bucket is evicted. Buckets are touched
+    on every request, so an active caller is never the one forgotten; an
+    evicted caller restarts with a full bucket, exactly as if it had been idle
+    long enough to refill.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self.evictions = 0
+
+    async def consume(self, key: str, cost: float, policy: BucketPolicy) -> float:
+        """Take cost tokens from key's bucket; return 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            bucket = self._buckets[key] = [policy.burst, now]
+        else:
+            self._buckets.move_to_end(key)
+
+        tokens = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return 0.0
+        bucket[0] = tokens
+        return (cost - tokens) / policy.rate
+
+
+class MongoRateLimitBackend:
+    """Shares buckets between workers through a MongoDB collection.
+
+    Each consume is a single atomic find_one_and_update using an aggregation
+    pipeline, so concurrent workers never double-spend tokens.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def consume(self, key: str, cost: float, policy: BucketPolicy) -> float:
+        """Take cost tokens from key's bucket; return 0 if allowed, else seconds to wait."""
+        now = time.time()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=policy.burst / policy.rate)
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}]}
+        refilled = {"$add": [{"$ifNull": ["$tokens", policy.burst]}, {"$multiply": [elapsed, policy.rate]}]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": {"$min": [policy.burst, refilled]}, "updated_at": now, "expires_at": expires_at}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (cost - bucket["tokens"]) / policy.rate
+
+
+class RateLimitMiddleware:
+    """Rejects requests with 429 and Retry-After once a bucket runs dry.
+
+    cost_fn(scope) returns the request's cost (<= 0 skips limiting) and
+    user_key_fn(scope) returns a user id or None for anonymous callers.
+    Behind a proxy, trusted_proxies must count the proxy hops, or every caller
+    shares the proxy's IP bucket.
+    """
+
+    def __init__(
+        self,
+        app,
+        backend,
+        ip_policy: BucketPolicy,
+        user_policy: BucketPolicy,
+        cost_fn: Callable[[dict], float],
+        user_key_fn: Callable[[dict], Optional[str]],
+        trusted_proxies: int = 0,
+    ):
+        self.app = app
+        self.backend = backend
+        self.ip_policy = ip_policy
+        self.user_policy = user_policy
+        self.cost_fn = cost_fn
+        self.user_key_fn = user_key_fn
+        self.trusted_proxies = trusted_proxies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        cost = self.cost_fn(scope)
+        if cost <= 0:
+            return await self.app(scope, receive, send)
+
+        retry_after = await self.backend.consume("ip:" + client_ip(scope, self.trusted_proxies), cost, self.ip_policy)
+        if not retry_after:
+            user_id = self.user_key_fn(scope)
+            if user_id:
+                retry_after = await self.backend.consume("user:" + user_id, cost, self.user_policy)
+
+        if retry_after:
+            return await self._reject(send, retry_after)
+        return await self.app(scope, receive, send)
+
+    async def _reject(self, send, retry_after: float):
+        body = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
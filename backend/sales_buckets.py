@@ -0,0 +1,93 @@
+"""
+Sales Time-series Buckets for VibeBeats
+
+Per-beat sales are pre-aggregated into one document per (producer, beat, month):
+
+    {"producer_id", "beat_id", "month": "2025-03", "sales", "revenue",
+     "days": {"07": {"sales": 2, "revenue": 59.98}, ...}}
+
+so a two-year chart for a beat reads 24 documents whatever the number of
+purchases behind it. Producer-wide series read the same shape without
+beat_id from producer_sales_buckets, one document per (producer, month),
+which keeps them at 24 documents too where the daily rollup would need 730.
+"""
+
+from datetime import date, datetime, timedelta
+
+from pymongo import UpdateOne
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def _increments(amount: float, day: date, sales: int) -> dict:
+    day_key = f"days.{day.day:02d}"
+    return {
+        "sales": sales,
+        "revenue": amount,
+        f"{day_key}.sales": sales,
+        f"{day_key}.revenue": amount,
+    }
+
+
+def bucket_update(producer_id: str, beat_id: str, amount: float, day: date, sales: int = 1) -> UpdateOne:
+    """Upsert adding sales and revenue for day to the beat's month bucket."""
+    month = day.strftime("%Y-%m")
+    return UpdateOne(
+        {"producer_id": producer_id, "beat_id": beat_id, "month": month},
+        {"$inc": _increments(amount, day, sales)},
+        upsert=True
+    )
+
+
+def producer_bucket_update(producer_id: str, amount: float, day: date, sales: int = 1) -> UpdateOne:
+    """Upsert adding sales and revenue for day to the producer's month bucket."""
+    month = day.strftime("%Y-%m")
+    return UpdateOne({"producer_id": producer_id, "month": month}, {"$inc": _increments(amount, day, sales)}, upsert=True)
+
+
+def month_range(start: date, end: date) -> dict:
+    """Mongo filter on month for buckets overlapping [start, end]."""
+    return {"$gte": start.strftime("%Y-%m"), "$lte": end.strftime("%Y-%m")}
+
+
+def _period(day: date, granularity: str) -> str:
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()  # ISO week, starting Monday
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def bucket_days(buckets: list):
+    """Yield (day, totals) for every day recorded in month buckets."""
+    for bucket in buckets:
+        year, month = (int(part) for part in bucket["month"].split("-"))
+        for day_of_month, totals in bucket.get("days", {}).items():
+            yield date(year, month, int(day_of_month)), totals
+
+
+def series(days, start: date, end: date, granularity: str) -> list:
+    """Sum (day, totals) pairs into zero-filled points per period between start and end."""
+    points = {}
+    day = start
+    while day <= end:
+        points.setdefault(_period(day, granularity), {"sales": 0, "revenue": 0.0})
+        day += timedelta(days=1)
+
+    for day, totals in days:
+        if start <= day <= end:
+            point = points[_period(day, granularity)]
+            point["sales"] += totals.get("sales", 0)
+            point["revenue"] += totals.get("revenue", 0)
+
+    return [
+        {"period": period, "sales": point["sales"], "revenue": round(point["revenue"], 2)}
+        for period, point in points.items()
+    ]
+
+
+def as_date(value) -> date:
+    """Calendar day (UTC) of a stored created_at, ISO string or datetime."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.date()
@@ -0,0 +1,337 @@
+"""
+Typeahead Prefix Index for VibeBeats
+
+Keeps every word of beat titles, producer names and tags in a sorted term list
+so a prefix lookup is a binary search over the vocabulary. Each term maps to
+the beats, producers or tags containing it, kept in rank order (beats by
+plays, producers and tags by name), so a lookup merges the postings of the
+matching terms lazily and stops as soon as it has enough results.
+
+Prefixes of one or two characters match thousands of terms, so their first
+TOP_KEYS keys are kept precomputed instead of being merged on every keystroke.
+
+The index lives in process memory. This worker's beat and profile writes
+update it immediately; writes made by other workers and play counts only
+arrive when the server reloads it (SUGGEST_INDEX_REFRESH_SECONDS). A reload
+stages batches of beats into a fresh index and finishes it with finish_load(),
+so the server can build it in a worker thread and swap it in when complete.
+"""
+
+import bisect
+import heapq
+import re
+import sys
+import unicodedata
+from itertools import islice
+from typing import Optional
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Upper bound on keys inspected per lookup when later query words filter most of them out
+MAX_SCANNED = 20000
+
+# Prefixes up to this long keep their first TOP_KEYS keys precomputed
+SHORT_PREFIX_LENGTH = 2
+TOP_KEYS = 1000
+
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def words(text: Optional[str]) -> list:
+    """Lowercase, accent-free words of text, so 'Lo-Fi Beyoncé' gives ['lo', 'fi', 'beyonce']."""
+    if not text:
+        return []
+    if text.isascii():
+        return _WORD_RE.findall(text.lower())
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return _WORD_RE.findall("".join(ch for ch in decomposed if not unicodedata.combining(ch)))
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse punctuation so 'Lo-Fi Beyoncé' becomes 'lo fi beyonce'."""
+    return " ".join(words(text))
+
+
+def beat_search_words(beat: dict) -> list:
+    """Distinct words of a beat's title, producer name, tags and description, stored for prefix search."""
+    found = set(words(beat.get("title"))) | set(words(beat.get("producer_name"))) | set(words(beat.get("description")))
+    for tag in beat.get("tags") or []:
+        found.update(words(tag))
+    return sorted(found)
+
+
+def _short_prefixes(term: str):
+    return {term[:length] for length in range(1, SHORT_PREFIX_LENGTH + 1)}
+
+
+class _TermIndex:
+    """Sorted vocabulary plus term -> keys postings ordered by rank(key)."""
+
+    def __init__(self, rank):
+        self.rank = rank
+        self.terms = []
+        self.postings = {}
+        # Short prefix -> number of postings under it, and -> its first TOP_KEYS keys
+        self.short_counts = {}
+        self.short_top = {}
+
+    def load(self, ranked_keys, terms_of):
+        """Replace the contents with keys given in rank order, each indexed under terms_of(key).
+
+        Appending in rank order leaves every postings list sorted without a sort,
+        and the first keys seen under a short prefix are its precomputed top keys.
+        """
+        postings, short_top, term_prefixes = {}, {}, {}
+        for key in ranked_keys:
+            for term in terms_of(key):
+                keys = postings.get(term)
+                if keys is None:
+                    postings[term] = [key]
+                    prefixes = term_prefixes[term] = _short_prefixes(term)
+                else:
+                    keys.append(key)
+                    prefixes = term_prefixes[term]
+                for prefix in prefixes:
+                    top = short_top.get(prefix)
+                    if top is None:
+                        short_top[prefix] = [key]
+                    elif len(top) < TOP_KEYS and top[-1] != key:
+                        # Keys arrive one at a time, so a key already listed is the last one
+                        top.append(key)
+        self.postings = postings
+        self.terms = sorted(postings)
+        self.short_counts = {}
+        for term, prefixes in term_prefixes.items():
+            for prefix in prefixes:
+                self.short_counts[prefix] = self.short_counts.get(prefix, 0) + len(postings[term])
+        self.short_top = short_top
+
+    def add(self, term: str, key):
+        keys = self.postings.get(term)
+        if keys is None:
+            self.postings[term] = [key]
+            bisect.insort(self.terms, term)
+        else:
+            bisect.insort(keys, key, key=self.rank)
+        for prefix in _short_prefixes(term):
+            self.short_counts[prefix] = self.short_counts.get(prefix, 0) + 1
+            top = self.short_top.get(prefix)
+            if top is not None and key not in top:
+                position = bisect.bisect_left(top, self.rank(key), key=self.rank)
+                if position < TOP_KEYS:
+                    top.insert(position, key)
+                    del top[TOP_KEYS:]
+
+    def remove(self, term: str, key):
+        # rank(key) must still return the value the key was inserted with
+        keys = self.postings.get(term)
+        if keys is None:
+            return
+        position = bisect.bisect_left(keys, self.rank(key), key=self.rank)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+        else:
+            return
+        if not keys:
+            del self.postings[term]
+            del self.terms[bisect.bisect_left(self.terms, term)]
+        for prefix in _short_prefixes(term):
+            self.short_counts[prefix] -= 1
+            if not self.short_counts[prefix]:
+                del self.short_counts[prefix]
+                self.short_top.pop(prefix, None)
+            elif key in self.short_top.get(prefix, ()):
+                # The key may still sit under another term with this prefix; recompute on the next lookup
+                del self.short_top[prefix]
+
+    def _matching_terms(self, prefix: str) -> list:
+        start = bisect.bisect_left(self.terms, prefix)
+        return self.terms[start:bisect.bisect_left(self.terms, prefix + _MAX_CHAR, start)]
+
+    def count(self, prefix: str) -> int:
+        """Number of postings under terms starting with prefix (an upper bound on distinct keys)."""
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            return self.short_counts.get(prefix, 0)
+        return sum(len(self.postings[term]) for term in self._matching_terms(prefix))
+
+    def _merge(self, prefix: str):
+        seen = set()
+        streams = [self.postings[term] for term in self._matching_terms(prefix)]
+        for key in heapq.merge(*streams, key=self.rank):
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+    def keys_with_prefix(self, prefix: str):
+        """Yield each key of the terms starting with prefix once, in rank order."""
+        if len(prefix) > SHORT_PREFIX_LENGTH or prefix not in self.short_counts:
+            yield from self._merge(prefix)
+            return
+        top = self.short_top.get(prefix)
+        if top is None:
+            top = self.short_top[prefix] = list(islice(self._merge(prefix), TOP_KEYS))
+        yield from top
+        if len(top) == TOP_KEYS:
+            yield from islice(self._merge(prefix), TOP_KEYS, None)
+
+
+class SuggestIndex:
+    """In-memory typeahead over beats, producers and tags."""
+
+    def __init__(self):
+        self._beats = {}
+        self._producers = {}
+        self._tag_counts = {}
+        self._beat_terms = _TermIndex(lambda key: (-self._beats[key]["plays"], key))
+        self._producer_terms = _TermIndex(lambda key: (self._producers[key], key))
+        self._tag_terms = _TermIndex(lambda tag: tag)
+        self.ready = False
+
+    @staticmethod
+    def _entry(beat: dict) -> dict:
+        tags, beat_words = [], set(words(beat.get("title")))
+        beat_words.update(words(beat.get("producer_name")))
+        for tag in beat.get("tags") or []:
+            tag_words = words(tag)
+            if tag_words:
+                tags.append(tag)
+                beat_words.update(tag_words)
+        return {
+            "id": beat["id"],
+            "title": beat.get("title", ""),
+            "producer_id": beat.get("producer_id"),
+            "producer_name": beat.get("producer_name", ""),
+            "plays": beat.get("plays", 0),
+            "tags": tags,
+            "words": beat_words,
+        }
+
+    def load(self, beats, producers):
+        """Replace the whole index with beat documents and (id, name) producer pairs."""
+        self._beats, self._producers, self._tag_counts = {}, {}, {}
+        self.stage_beats(beats)
+        self.stage_producers(producers)
+        self.finish_load()
+
+    def stage_beats(self, beats):
+        """Add a batch of beat documents for finish_load() to index."""
+        for beat in beats:
+            entry = self._beats[beat["id"]] = self._entry(beat)
+            for tag in entry["tags"]:
+                self._tag_counts[tag] = self._tag_counts.get(tag, 0) + 1
+
+    def stage_producers(self, producers):
+        """Add a batch of (id, name) producer pairs for finish_load() to index."""
+        self._producers.update(producers)
+
+    def finish_load(self):
+        """Build the term indexes over everything staged and make the index ready for lookups.
+
+        Nothing else may touch the index meanwhile, so a server builds a fresh
+        one (possibly in a worker thread) and swaps it in afterwards.
+        """
+        beats = self._beats
+        ranked = sorted(beats, key=self._beat_terms.rank)
+        self._beat_terms.load(ranked, lambda key: beats[key]["words"])
+        ranked = sorted(self._producers, key=self._producer_terms.rank)
+        self._producer_terms.load(ranked, lambda key: set(words(self._producers[key])))
+        self._tag_terms.load(sorted(self._tag_counts), lambda tag: [normalize(tag)])
+        self.ready = True
+
+    def add_beat(self, beat: dict):
+        """Index or re-index a beat document."""
+        self.remove_beat(beat["id"])
+        entry = self._beats[beat["id"]] = self._entry(beat)
+        for word in entry["words"]:
+            self._beat_terms.add(word, beat["id"])
+        for tag in entry["tags"]:
+            self._tag_counts[tag] = self._tag_counts.get(tag, 0) + 1
+            if self._tag_counts[tag] == 1:
+                self._tag_terms.add(normalize(tag), tag)
+
+    def remove_beat(self, beat_id: str):
+        """Drop a beat from the index."""
+        entry = self._beats.get(beat_id)
+        if entry is None:
+            return
+        for word in entry["words"]:
+            self._beat_terms.remove(word, beat_id)
+        del self._beats[beat_id]
+        for tag in entry["tags"]:
+            self._tag_counts[tag] -= 1
+            if not self._tag_counts[tag]:
+                del self._tag_counts[tag]
+                self._tag_terms.remove(normalize(tag), tag)
+
+    def set_producer(self, producer_id: str, name: str):
+        """Index or rename a producer."""
+        old = self._producers.get(producer_id)
+        if old is not None:
+            for word in set(words(old)):
+                self._producer_terms.remove(word, producer_id)
+        self._producers[producer_id] = name
+        for word in set(words(name)):
+            self._producer_terms.add(word, producer_id)
+
+    def suggest(self, query: str, limit: int = 10) -> dict:
+        """Return beats, producers and tags where every query word prefixes some word."""
+        query_words = words(query)
+        if not query_words:
+            return {"beats": [], "producers": [], "tags": []}
+
+        beats = [self._beats[key] for key in self.match_beat_ids(query, limit)]
+        producers = self._match(self._producer_terms, query_words, lambda key: words(self._producers[key]), limit)
+        tags = list(islice(self._tag_terms.keys_with_prefix(" ".join(query_words)), limit))
+
+        return {
+            "beats": [
+                {"id": b["id"], "title": b["title"], "producer_id": b["producer_id"], "producer_name": b["producer_name"]}
+                for b in beats
+            ],
+            "producers": [{"id": key, "name": self._producers[key]} for key in producers],
+            "tags": tags,
+        }
+
+    def match_beat_ids(self, query: str, limit: int) -> list:
+        """Ids of up to limit beats where every query word prefixes some word, most played first."""
+        query_words = words(query)
+        if not query_words:
+            return []
+        return self._match(self._beat_terms, query_words, lambda key: self._beats[key]["words"], limit)
+
+    @staticmethod
+    def _match(terms: _TermIndex, query_words: list, words_of, limit: int) -> list:
+        # Stream the most selective word's keys in rank order and filter them by the other words,
+        # so the limit applies to true matches rather than to an arbitrary candidate subset
+        first, *rest = sorted(set(query_words), key=terms.count)
+        found = []
+        for key in islice(terms.keys_with_prefix(first), MAX_SCANNED):
+            if all(any(word.startswith(prefix) for word in words_of(key)) for prefix in rest):
+                found.append(key)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def stats(self) -> dict:
+        """Return entry counts and an estimate of the memory held by the index."""
+        return {
+            "ready": self.ready,
+            "beats": len(self._beats),
+            "producers": len(self._producers),
+            "terms": len(self._beat_terms.terms) + len(self._producer_terms.terms) + len(self._tag_terms.terms),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes used by the index's containers and strings."""
+        size = sys.getsizeof(self._beats) + sys.getsizeof(self._producers) + sys.getsizeof(self._tag_counts)
+        for entry in self._beats.values():
+            size += sys.getsizeof(entry) + sys.getsizeof(entry["words"]) + sys.getsizeof(entry["tags"])
+            size += sys.getsizeof(entry["title"]) + sys.getsizeof(entry["producer_name"])
+        for index in (self._beat_terms, self._producer_terms, self._tag_terms):
+            size += sys.getsizeof(index.terms) + sys.getsizeof(index.postings)
+            for term, keys in index.postings.items():
+                size += sys.getsizeof(term) + sys.getsizeof(keys)
+            size += sys.getsizeof(index.short_counts) + sys.getsizeof(index.short_top)
+            size += sum(sys.getsizeof(keys) for keys in index.short_top.values())
+        return size
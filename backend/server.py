@@ -1,20 +1,40 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Literal
+from typing import Callable, List, Optional, Literal
 import uuid
-from datetime import datetime, timezone, timedelta
-import bcrypt
+from datetime import date, datetime, timezone, timedelta
 import jwt
 import base64
+import csv
 import io
+import json
+import re
+import asyncio
+import hashlib
+import time
+import secrets
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from cache import StatsBytesTTLCache, StatsTLRUCache, StatsTTLCache, TaggedTTLCache
+from compression import CompressionMiddleware, identity_etag
+from rate_limit import BucketPolicy, InMemoryRateLimitBackend, MongoRateLimitBackend, RateLimitMiddleware, client_ip
+from json_response import FastJSONResponse
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, paginate
+from search_index import SuggestIndex, beat_search_words, words
+import catalog_index
+from play_counter import DailyPlayRollupBuffer, ListenerSketchBuffer, PlayCountBuffer
+import hyperloglog
+from trending import TrendingBuffer
+import sales_buckets
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,15 +47,252 @@ db = client[os.environ['DB_NAME']]
 # JWT Settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_HOURS = 168  # 7 days
+ACCESS_TOKEN_EXPIRATION_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRATION_MINUTES', '15'))
+REFRESH_TOKEN_EXPIRATION_HOURS = 168  # 7 days
+
+# Authenticated user cache
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+
+# Verified token cache and revocation list
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '50000'))
+REVOCATION_RELOAD_SECONDS = float(os.environ.get('REVOCATION_RELOAD_SECONDS', '60'))
+
+# Accounts allowed to read operational endpoints such as /api/stats/metrics
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Reverse proxies (ingress, load balancer) in front of the app. Each appends the address it
+# received the request from to X-Forwarded-For, so the client IP is read that many hops from
+# the right; with 0 the TCP peer is the client. Set it before enabling rate limiting behind a
+# proxy, or every caller shares the proxy's IP bucket
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+# Rate limiting (rates are tokens per second, a plain request costs 1 token); off unless enabled
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # memory | mongo
+RATE_LIMIT_IP_RATE = float(os.environ.get('RATE_LIMIT_IP_RATE', '20'))
+RATE_LIMIT_IP_BURST = float(os.environ.get('RATE_LIMIT_IP_BURST', '100'))
+RATE_LIMIT_USER_RATE = float(os.environ.get('RATE_LIMIT_USER_RATE', '10'))
+RATE_LIMIT_USER_BURST = float(os.environ.get('RATE_LIMIT_USER_BURST', '60'))
+RATE_LIMIT_ROUTE_COSTS = {
+    ("POST", "/api/auth/login"): 10,
+    ("POST", "/api/auth/register"): 10,
+    ("POST", "/api/auth/refresh"): 2,
+    ("GET", "/api/"): 0.5,
+    ("GET", "/api/purchases/my-sales/export"): 20,
+    ("GET", "/api/purchases/my-purchases/export"): 20,
+}
+RATE_LIMIT_SEARCH_COST = 5
+
+# Sortable catalog fields and their direction; each has a matching compound index in init_db.py
+BEAT_SORT_FIELDS = {
+    "created_at": -1,
+    "plays": -1,
+    "purchases": -1,
+    "price": 1,
+    "bpm": 1,
+    "title": 1,
+    "trending": -1,
+}
+
+# Counters kept per producer in producer_stats by the beat, purchase and play write paths
+PRODUCER_COUNTERS = {"total_beats": 0, "total_sales": 0, "total_revenue": 0.0, "total_plays": 0}
+# Revenue is private to the producer's own dashboard; everything else may be shown publicly
+PUBLIC_PRODUCER_COUNTERS = {counter: zero for counter, zero in PRODUCER_COUNTERS.items() if counter != "total_revenue"}
+
+# Fields stored for bookkeeping (legacy ETag versions and counters, credentials, search words) that responses never include
+BEAT_PROJECTION = {"_id": 0, "version": 0, "search_words": 0}
+USER_PROJECTION = {"_id": 0, "password": 0, "version": 0, **{counter: 0 for counter in PRODUCER_COUNTERS}}
+
+# Compact beat projection for grid views: no description, and legacy inline
+# base64 covers (written by older update_beat versions) are never shipped
+BEAT_CARD_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in (
+        "id", "title", "producer_id", "producer_name", "genre", "bpm", "key", "price",
+        "license_type", "audio_url", "tags", "plays", "purchases", "trending", "created_at"
+    )},
+    "cover_url": {"$cond": [
+        {"$eq": [{"$substrCP": [{"$ifNull": ["$cover_url", ""]}, 0, 5]}, "data:"]},
+        None,
+        "$cover_url"
+    ]}
+}
+
+# Catalog listing cache
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', '1000'))
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '30'))
+CATALOG_WARMUP_TOP_N = int(os.environ.get('CATALOG_WARMUP_TOP_N', '10'))
+
+# Optional NumPy columnar snapshot answering catalog filter + sort queries in process
+CATALOG_INDEX_ENABLED = os.environ.get('CATALOG_INDEX_ENABLED', 'false').lower() == 'true'
+# The snapshot is per process: reloading it picks up other workers' writes and flushed play counts
+CATALOG_INDEX_REFRESH_SECONDS = float(os.environ.get('CATALOG_INDEX_REFRESH_SECONDS', '60'))
+
+# Play counts are buffered in memory and flushed at most this many seconds late
+PLAY_FLUSH_INTERVAL_SECONDS = float(os.environ.get('PLAY_FLUSH_INTERVAL_SECONDS', '5'))
+PLAY_BUFFER_MAX_BEATS = int(os.environ.get('PLAY_BUFFER_MAX_BEATS', '10000'))
+
+# Repeat plays by the same listener within this window count once
+PLAY_DEDUPE_WINDOW_SECONDS = float(os.environ.get('PLAY_DEDUPE_WINDOW_SECONDS', '1800'))
+PLAY_DEDUPE_MAX_ENTRIES = int(os.environ.get('PLAY_DEDUPE_MAX_ENTRIES', '200000'))
+UNIQUE_LISTENER_WINDOW_DAYS = 30
+# Daily listener sketches are kept a little longer than the window that reads them
+LISTENER_SKETCH_RETENTION_DAYS = int(os.environ.get('LISTENER_SKETCH_RETENTION_DAYS', '35'))
+# Queued offline plays older than this are rejected instead of backdating closed days
+PLAY_EVENT_MAX_AGE_SECONDS = float(os.environ.get('PLAY_EVENT_MAX_AGE_SECONDS', '3600'))
+
+# Trending score: event weights and how fast their influence halves
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '48'))
+TRENDING_PURCHASE_WEIGHT = float(os.environ.get('TRENDING_PURCHASE_WEIGHT', '25'))
+TRENDING_NEW_BEAT_WEIGHT = float(os.environ.get('TRENDING_NEW_BEAT_WEIGHT', '10'))
+
+# Purchase exports are read in cursor batches and flushed to the client every EXPORT_CHUNK_ROWS rows
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_CHUNK_ROWS = 500
+SALES_EXPORT_COLUMNS = [
+    "id", "created_at", "beat_id", "beat_title", "buyer_id", "buyer_name",
+    "amount", "license_type", "payment_method", "payment_status"
+]
+PURCHASES_EXPORT_COLUMNS = [
+    "id", "created_at", "beat_id", "beat_title", "producer_id",
+    "amount", "license_type", "payment_method", "payment_status"
+]
+
+# Leaderboard windows in days (None = all time) and how long a ranking is reused
+LEADERBOARD_WINDOWS = {"7d": 7, "30d": 30, "all": None}
+LEADERBOARD_MAX_SIZE = 100
+LEADERBOARD_CACHE_TTL_SECONDS = float(os.environ.get('LEADERBOARD_CACHE_TTL_SECONDS', '60'))
+# Rendered /users/producers responses; counters in them are at most this old, like the Cache-Control max-age
+PRODUCER_LIST_CACHE_SIZE = 100
+PRODUCER_LIST_CACHE_TTL_SECONDS = float(os.environ.get('PRODUCER_LIST_CACHE_TTL_SECONDS', '60'))
+
+# Per-user dashboard cache; writes on this worker invalidate it, the TTL bounds staleness elsewhere
+DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', '10000'))
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '30'))
+
+# Sales time-series range: default window and the longest range one request may ask for
+SALES_TIMESERIES_DEFAULT_DAYS = 90
+SALES_TIMESERIES_MAX_DAYS = 5 * 366
+
+# Largest number of ids one batch lookup may ask for
+BEAT_BATCH_MAX_IDS = 500
+
+# Facet bucket boundaries for the browse filters
+FACET_BPM_BOUNDARIES = [0, 80, 100, 120, 140, 160, 180]
+FACET_PRICE_BOUNDARIES = [0, 25, 50, 100, 200]
+FACET_CACHE_TTL_SECONDS = float(os.environ.get('FACET_CACHE_TTL_SECONDS', '60'))
+# Unfiltered counts are recomputed in the background this often and are never invalidated by writes
+FACET_REFRESH_SECONDS = float(os.environ.get('FACET_REFRESH_SECONDS', '60'))
+
+# Cache-Control per route family; ETags hash the response body, so the catalog always revalidates
+CACHE_CONTROL_POLICIES = {
+    "catalog": "public, no-cache",
+    "beat": "public, no-cache",
+    "user": "public, max-age=60",
+    "producers": "public, max-age=60",
+}
+# Collection versions (other workers' writes, for cache invalidation) are re-read at most this often
+VERSION_SYNC_SECONDS = float(os.environ.get('VERSION_SYNC_SECONDS', '1'))
+
+# Response compression; compressed bodies of responses with an ETag are cached for a while
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+COMPRESSION_CACHE_TTL_SECONDS = float(os.environ.get('COMPRESSION_CACHE_TTL_SECONDS', '300'))
+
+# Searches shorter than this match word prefixes of beats.search_words instead of the text index
+TEXT_SEARCH_MIN_LENGTH = int(os.environ.get('TEXT_SEARCH_MIN_LENGTH', '3'))
+# Searches with at most this many matches are sorted in memory; more walk the sort index
+SEARCH_SORT_MAX_MATCHES = int(os.environ.get('SEARCH_SORT_MAX_MATCHES', '500'))
+# The suggest index is per process: reloading it picks up other workers' writes and play counts
+SUGGEST_INDEX_REFRESH_SECONDS = float(os.environ.get('SUGGEST_INDEX_REFRESH_SECONDS', '300'))
+# Beats read per cursor batch and staged into the fresh index in a worker thread
+SUGGEST_INDEX_BATCH_SIZE = int(os.environ.get('SUGGEST_INDEX_BATCH_SIZE', '5000'))
 
 app = FastAPI(
     title="VibeBeats API",
     description="API para marketplace de beats musicais",
-    version="1.0.0"
+    version="1.0.0",
+    # Hot paths return FastJSONResponse directly to also skip jsonable_encoder
+    default_response_class=FastJSONResponse
 )
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# bcrypt runs on its own bounded pool so logins never block the event loop
+password_hasher = PasswordHasher()
+
+# user_id -> user document (without password), shared by all authenticated routes
+user_cache = StatsTTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+# token digest -> verified JWT payload, each entry expiring at the token's own exp
+token_cache = StatsTLRUCache(maxsize=TOKEN_CACHE_SIZE, expires_at=lambda digest, payload: payload['exp'])
+
+# token digest -> exp timestamp for logged out tokens, mirrored in db.revoked_tokens
+revoked_tokens = {}
+
+# Normalized get_beats parameters -> rendered (body, ETag), tagged by genre, sort and contained beats;
+# ("beat", id) -> the rendered beat page, tagged by its beat
+catalog_cache = TaggedTTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL_SECONDS)
+
+# Normalized filter set -> facet counts, dropped on every beat write
+facet_cache = StatsTTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=FACET_CACHE_TTL_SECONDS)
+# Facet counts over the whole catalog, see refresh_unfiltered_facets_periodically()
+unfiltered_facets = {}
+
+# (sort, limit, users version) -> rendered producer list
+producer_list_cache = StatsTTLCache(maxsize=PRODUCER_LIST_CACHE_SIZE, ttl=PRODUCER_LIST_CACHE_TTL_SECONDS)
+
+# Leaderboard window -> ranked producers
+leaderboard_cache = StatsTTLCache(maxsize=len(LEADERBOARD_WINDOWS), ttl=LEADERBOARD_CACHE_TTL_SECONDS)
+
+# User id -> dashboard response, dropped by that user's beat, purchase and project writes
+dashboard_cache = StatsTTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+# Columnar catalog snapshot, None unless CATALOG_INDEX_ENABLED
+beat_columns = catalog_index.CatalogIndex() if CATALOG_INDEX_ENABLED else None
+
+# Already-compressed bodies keyed by (ETag, encoding)
+compressed_responses = StatsBytesTTLCache(max_bytes=COMPRESSION_CACHE_MAX_BYTES, ttl=COMPRESSION_CACHE_TTL_SECONDS)
+
+# Last collection version this worker has seen and when it was read, see sync_versions()
+collection_versions = {}
+versions_synced_at = {}
+
+# Write-behind buffer for beat play counts
+play_buffer = PlayCountBuffer(db.beats, PLAY_FLUSH_INTERVAL_SECONDS, PLAY_BUFFER_MAX_BEATS)
+
+# Play counts rolled up per producer (producer_stats.total_plays)
+producer_play_buffer = PlayCountBuffer(
+    db.producer_stats, PLAY_FLUSH_INTERVAL_SECONDS, PLAY_BUFFER_MAX_BEATS,
+    field="total_plays", key_field="producer_id", upsert=True
+)
+
+# Plays per producer per day, summed by the leaderboard
+producer_daily_plays = DailyPlayRollupBuffer(
+    db.producer_daily_stats, PLAY_FLUSH_INTERVAL_SECONDS, PLAY_BUFFER_MAX_BEATS, owner_field="producer_id"
+)
+
+# Play and purchase events folded into beats.trending
+trending_buffer = TrendingBuffer(db.beats, PLAY_FLUSH_INTERVAL_SECONDS, PLAY_BUFFER_MAX_BEATS, TRENDING_HALF_LIFE_HOURS)
+
+# Daily unique-listener sketches per beat and per producer
+listener_sketches = ListenerSketchBuffer(
+    db.listener_sketches, PLAY_FLUSH_INTERVAL_SECONDS, PLAY_BUFFER_MAX_BEATS, LISTENER_SKETCH_RETENTION_DAYS
+)
+
+# (beat_id, listener) pairs already counted within the dedupe window
+play_dedupe = StatsTTLCache(maxsize=PLAY_DEDUPE_MAX_ENTRIES, ttl=PLAY_DEDUPE_WINDOW_SECONDS)
+
+# Typeahead over beat titles, producer names and tags, built at startup
+suggest_index = SuggestIndex()
+# Changes made while a fresh suggest index is being built, replayed onto it before the swap
+suggest_index_changes = None
+
+background_tasks = []
 
 # ============ MODELS ============
 
@@ -59,6 +316,12 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class Beat(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -76,8 +339,19 @@ class Beat(BaseModel):
     tags: List[str] = []
     plays: int = 0
     purchases: int = 0
+    trending: Optional[float] = None  # Log-space decayed popularity, see trending.py
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class PlayEvent(BaseModel):
+    played_at: Optional[datetime] = None  # When a queued play happened, at most PLAY_EVENT_MAX_AGE_SECONDS ago
+
+class PlayEventBatch(BaseModel):
+    events: List[PlayEvent] = Field(default_factory=lambda: [PlayEvent()], max_length=100)
+
+class BeatBatchRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[str] = None
+
 class BeatCreate(BaseModel):
     title: str
     genre: str
@@ -133,34 +407,313 @@ class CoverGenerationRequest(BaseModel):
 
 # ============ AUTH HELPERS ============
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please try again shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
 
-def create_token(user_id: str, email: str) -> str:
+def create_access_token(user: dict) -> str:
+    # Only fields that never change travel in the token; mutable ones (name) are read from the user doc
     payload = {
-        'user_id': user_id,
-        'email': email,
-        'exp': datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+        'user_id': user['id'],
+        'email': user['email'],
+        'user_type': user['user_type'],
+        'exp': datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRATION_MINUTES)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+async def create_refresh_token(user_id: str, family_id: Optional[str] = None) -> str:
+    """Issue an opaque refresh token; only its digest is stored."""
+    token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await db.refresh_tokens.insert_one({
+        "token_digest": hashlib.sha256(token.encode('utf-8')).hexdigest(),
+        "user_id": user_id,
+        "family_id": family_id or str(uuid.uuid4()),
+        "created_at": now,
+        "expires_at": now + timedelta(hours=REFRESH_TOKEN_EXPIRATION_HOURS),
+        "used_at": None
+    })
+    return token
+
+async def issue_tokens(user: dict, family_id: Optional[str] = None) -> dict:
+    return {
+        "token": create_access_token(user),
+        "refresh_token": await create_refresh_token(user['id'], family_id),
+        "expires_in": ACCESS_TOKEN_EXPIRATION_MINUTES * 60
+    }
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+
 def decode_token(token: str) -> dict:
+    digest = token_digest(token)
+    if digest in revoked_tokens:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+    
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    token_cache.set(digest, payload)
+    return payload
+
+async def revoke_token(token: str, payload: dict):
+    digest = token_digest(token)
+    revoked_tokens[digest] = payload['exp']
+    token_cache.invalidate(digest)
+    await db.revoked_tokens.update_one(
+        {"token_digest": digest},
+        {"$set": {"expires_at": datetime.fromtimestamp(payload['exp'], timezone.utc)}},
+        upsert=True
+    )
+
+async def load_revoked_tokens():
+    """Replace the in-memory denylist with the unexpired entries stored in Mongo."""
+    now = datetime.now(timezone.utc)
+    cursor = db.revoked_tokens.find({"expires_at": {"$gt": now}}, {"_id": 0, "token_digest": 1, "expires_at": 1})
+    loaded = {}
+    async for entry in cursor:
+        expires_at = entry['expires_at'].replace(tzinfo=timezone.utc)
+        loaded[entry['token_digest']] = expires_at.timestamp()
+        token_cache.invalidate(entry['token_digest'])
+    revoked_tokens.clear()
+    revoked_tokens.update(loaded)
+
+async def reload_revoked_tokens_periodically():
+    while True:
+        await asyncio.sleep(REVOCATION_RELOAD_SECONDS)
+        try:
+            await load_revoked_tokens()
+        except Exception as e:
+            logger.error(f"Error reloading revoked tokens: {str(e)}")
+
+async def load_user(user_id: str) -> dict:
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, USER_PROJECTION)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.set(user['id'], user)
+    # Handlers may mutate the document, so never hand out the cached instance
+    return dict(user)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     payload = decode_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await load_user(payload['user_id'])
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Identify the caller from the access token alone, without a database read."""
+    payload = decode_token(credentials.credentials)
+    if 'user_type' not in payload:
+        # Tokens issued before role claims existed still need the lookup
+        return await get_current_user(credentials)
+    return {
+        "id": payload['user_id'],
+        "email": payload['email'],
+        "user_type": payload['user_type']
+    }
+
+async def require_admin(current_user: dict = Depends(get_token_claims)) -> dict:
+    if current_user['email'].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# ============ RATE LIMITING ============
+
+def rate_limit_cost(scope: dict) -> float:
+    cost = RATE_LIMIT_ROUTE_COSTS.get((scope["method"], scope["path"]))
+    if cost is not None:
+        return cost
+    if scope["path"].startswith("/api/beats") and b"search=" in scope["query_string"]:
+        return RATE_LIMIT_SEARCH_COST
+    return 1
+
+def rate_limit_user_key(scope: dict) -> Optional[str]:
+    # Only tokens already verified by decode_token identify a user; no JWT work happens here
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            payload = token_cache.peek(token_digest(token))
+            return payload['user_id'] if payload else None
+    return None
+
+# ============ QUERY HELPERS ============
+
+async def sum_documents(collection, match: dict, field: str) -> tuple:
+    """Return (count, sum of field) over every document matching match."""
+    result = await collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "total": {"$sum": f"${field}"}}}
+    ]).to_list(1)
+    if not result:
+        return 0, 0
+    return result[0]['count'], result[0]['total']
+
+async def update_producer_counters(producer_id: str, **deltas):
+    """Apply $inc deltas to a producer's materialized counters."""
+    await db.producer_stats.update_one({"producer_id": producer_id}, {"$inc": deltas}, upsert=True)
+
+async def load_producer_counters(producer_id: str) -> dict:
+    """Return a producer's counters, computing and storing them if producer_stats lacks any."""
+    stats = await db.producer_stats.find_one(
+        {"producer_id": producer_id}, {"_id": 0, **{counter: 1 for counter in PRODUCER_COUNTERS}}
+    ) or {}
+    if all(counter in stats for counter in PRODUCER_COUNTERS):
+        return stats
+    
+    # Not backfilled yet (or created by a lone increment): aggregate once and store the result
+    total_beats, total_plays = await sum_documents(db.beats, {"producer_id": producer_id}, "plays")
+    total_sales, total_revenue = await sum_documents(db.purchases, {"producer_id": producer_id}, "amount")
+    stats = {
+        "total_beats": total_beats, "total_plays": total_plays,
+        "total_sales": total_sales, "total_revenue": total_revenue
+    }
+    await db.producer_stats.update_one({"producer_id": producer_id}, {"$set": stats}, upsert=True)
+    return stats
+
+async def public_producer_counters(producer_ids: List[str]) -> dict:
+    """Return the public counters of each producer, zero for producers without a stats document."""
+    projection = {"_id": 0, "producer_id": 1, **{counter: 1 for counter in PUBLIC_PRODUCER_COUNTERS}}
+    counters = {producer_id: dict(PUBLIC_PRODUCER_COUNTERS) for producer_id in producer_ids}
+    async for stats in db.producer_stats.find({"producer_id": {"$in": producer_ids}}, projection):
+        counters[stats.pop('producer_id')].update(stats)
+    return counters
+
+def update_suggest_index(change: Callable[[SuggestIndex], None]):
+    """Apply change to the live suggest index and to the one being built, if any."""
+    change(suggest_index)
+    if suggest_index_changes is not None:
+        suggest_index_changes.append(change)
+
+async def build_suggest_index():
+    """Build a fresh typeahead index over every beat and producer and swap it in.
+    
+    The cursor is streamed in batches and the indexing runs in a worker thread,
+    so the event loop keeps serving requests; the old index answers until the swap.
+    """
+    global suggest_index, suggest_index_changes
+    index = SuggestIndex()
+    suggest_index_changes = []
+    try:
+        projection = {"_id": 0, "id": 1, "title": 1, "producer_id": 1, "producer_name": 1, "tags": 1, "plays": 1}
+        batch = []
+        async for beat in db.beats.find({}, projection).batch_size(SUGGEST_INDEX_BATCH_SIZE):
+            batch.append(beat)
+            if len(batch) >= SUGGEST_INDEX_BATCH_SIZE:
+                await asyncio.to_thread(index.stage_beats, batch)
+                batch = []
+        await asyncio.to_thread(index.stage_beats, batch)
+        producers = [
+            (producer['id'], producer['name'])
+            async for producer in db.users.find({"user_type": "producer"}, {"_id": 0, "id": 1, "name": 1})
+        ]
+        index.stage_producers(producers)
+        await asyncio.to_thread(index.finish_load)
+        
+        # Back on the loop: nothing can interleave between the replay and the swap
+        for change in suggest_index_changes:
+            change(index)
+        suggest_index = index
+    finally:
+        suggest_index_changes = None
+    logger.info(f"Suggest index ready: {suggest_index.stats()}")
+
+async def refresh_suggest_index_periodically():
+    while True:
+        try:
+            await build_suggest_index()
+        except Exception as e:
+            logger.error(f"Error building suggest index: {str(e)}")
+        await asyncio.sleep(SUGGEST_INDEX_REFRESH_SECONDS)
+
+# ============ CONDITIONAL REQUESTS ============
+
+def on_external_write(name: str):
+    # Another worker changed the collection; our targeted invalidations never saw it
+    if name == "beats":
+        catalog_cache.clear()
+        facet_cache.clear()
+
+async def bump_version(*names: str):
+    """Record a write to each named collection so other workers drop their cached copies."""
+    for name in names:
+        doc = await db.collection_versions.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        previous = collection_versions.get(name)
+        collection_versions[name] = doc['version']
+        if previous is not None and doc['version'] != previous + 1:
+            on_external_write(name)
+
+async def sync_versions(*names: str) -> dict:
+    """Return the current version of each named collection, re-reading any older than VERSION_SYNC_SECONDS."""
+    now = time.monotonic()
+    stale = [name for name in names if now - versions_synced_at.get(name, float("-inf")) >= VERSION_SYNC_SECONDS]
+    if stale:
+        versions = {name: 0 for name in stale}
+        async for doc in db.collection_versions.find({"_id": {"$in": stale}}):
+            versions[doc['_id']] = doc['version']
+        for name, version in versions.items():
+            previous = collection_versions.get(name)
+            collection_versions[name] = version
+            versions_synced_at[name] = now
+            if previous is not None and version != previous:
+                on_external_write(name)
+    return {name: collection_versions[name] for name in names}
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Compressed representations carry an encoding suffix on the same ETag
+    return etag in (identity_etag(candidate.strip()) for candidate in header.split(","))
+
+def not_modified(etag: str, policy: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL_POLICIES[policy]})
+
+def render(content) -> tuple:
+    """Serialize content and return (body, ETag); cached pairs answer repeats without either step."""
+    # The ETag hashes the body itself, so plays, trending and counter updates change it too
+    body = FastJSONResponse(content=content).body
+    return body, f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+def rendered_response(request: Request, rendered: tuple, policy: str) -> Response:
+    """Answer 304 if the client already holds exactly these bytes, else send them."""
+    body, etag = rendered
+    if etag_matches(request, etag):
+        return not_modified(etag, policy)
+    return Response(
+        body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL_POLICIES[policy]}
+    )
 
 # ============ HEALTH CHECK ============
 
@@ -185,39 +738,84 @@ async def register(user_data: UserRegister):
     )
     
     user_dict = user.model_dump()
-    user_dict['password'] = hash_password(user_data.password)
+    user_dict['password'] = await hash_password(user_data.password)
     user_dict['created_at'] = user_dict['created_at'].isoformat()
     
     await db.users.insert_one(user_dict)
+    await bump_version("users")
+    if user.user_type == 'producer':
+        # Every producer has a stats document, so sorting producer_stats by sales lists them all
+        await db.producer_stats.insert_one({"producer_id": user.id, **PRODUCER_COUNTERS})
+        update_suggest_index(lambda index: index.set_producer(user.id, user.name))
     
-    token = create_token(user.id, user.email)
+    tokens = await issue_tokens(user_dict)
     
     return {
         "message": "User registered successfully",
-        "token": token,
+        **tokens,
         "user": user.model_dump()
     }
 
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    user = await db.users.find_one(
+        {"email": credentials.email}, {field: 0 for field in USER_PROJECTION if field != 'password'}
+    )
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(credentials.password, user['password']):
+    if not await verify_password(credentials.password, user['password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_token(user['id'], user['email'])
+    tokens = await issue_tokens(user)
     
     # Remove password from response
     user.pop('password', None)
     
     return {
         "message": "Login successful",
-        "token": token,
+        **tokens,
         "user": user
     }
 
+@api_router.post("/auth/refresh")
+async def refresh_tokens(refresh_data: RefreshRequest):
+    digest = hashlib.sha256(refresh_data.refresh_token.encode('utf-8')).hexdigest()
+    now = datetime.now(timezone.utc)
+    
+    # Each refresh token is single use: claim it atomically before rotating
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"token_digest": digest, "used_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}}
+    )
+    if not stored:
+        reused = await db.refresh_tokens.find_one({"token_digest": digest, "used_at": {"$ne": None}})
+        if reused:
+            # A rotated token was presented again: assume theft and kill the whole family
+            await db.refresh_tokens.delete_many({"family_id": reused['family_id']})
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    user = await load_user(stored['user_id'])
+    tokens = await issue_tokens(user, family_id=stored['family_id'])
+    
+    return {"message": "Token refreshed", **tokens}
+
+@api_router.post("/auth/logout")
+async def logout(
+    logout_data: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    payload = decode_token(credentials.credentials)
+    await revoke_token(credentials.credentials, payload)
+    
+    if logout_data and logout_data.refresh_token:
+        digest = hashlib.sha256(logout_data.refresh_token.encode('utf-8')).hexdigest()
+        stored = await db.refresh_tokens.find_one({"token_digest": digest, "user_id": payload['user_id']})
+        if stored:
+            await db.refresh_tokens.delete_many({"family_id": stored['family_id']})
+    
+    return {"message": "Logged out successfully"}
+
 @api_router.get("/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
     current_user.pop('password', None)
@@ -241,80 +839,129 @@ async def update_profile(
     
     if update_data:
         await db.users.update_one({"id": current_user['id']}, {"$set": update_data})
+        await bump_version("users")
+        user_cache.invalidate(current_user['id'])
+        if name and current_user['user_type'] == 'producer':
+            update_suggest_index(lambda index: index.set_producer(current_user['id'], name))
     
-    updated_user = await db.users.find_one({"id": current_user['id']}, {"_id": 0, "password": 0})
+    updated_user = await db.users.find_one({"id": current_user['id']}, USER_PROJECTION)
     return {"message": "Profile updated successfully", "user": updated_user}
 
 # ============ USERS ROUTES ============
 
 @api_router.get("/users/producers")
-async def get_producers(sort: Optional[str] = None, limit: Optional[int] = None):
+async def get_producers(request: Request, sort: Optional[str] = None, limit: Optional[int] = None):
     """Get list of all producers with optional sorting and limit"""
+    # Profile writes bump the users version and so miss the cache; counters are at most the TTL old
+    cache_key = (sort, limit, (await sync_versions("users"))["users"])
+    rendered = producer_list_cache.get(cache_key)
+    if rendered is not None:
+        return rendered_response(request, rendered, "producers")
     try:
-        # Find all producers
-        query = {"user_type": "producer"}
-        cursor = db.users.find(query, {"_id": 0, "password": 0})
-        
-        # Apply sorting if specified
+        # Totals are materialized in producer_stats, so this is two indexed reads
         if sort == "sales":
-            # We'll need to aggregate sales data
-            pipeline = [
-                {"$match": {"user_type": "producer"}},
-                {
-                    "$lookup": {
-                        "from": "purchases",
-                        "localField": "id",
-                        "foreignField": "producer_id",
-                        "as": "sales"
-                    }
-                },
-                {
-                    "$lookup": {
-                        "from": "beats",
-                        "localField": "id",
-                        "foreignField": "producer_id",
-                        "as": "beats"
-                    }
-                },
-                {
-                    "$addFields": {
-                        "total_sales": {"$size": "$sales"},
-                        "total_beats": {"$size": "$beats"}
-                    }
-                },
-                {"$sort": {"total_sales": -1}},
-                {"$project": {"_id": 0, "password": 0, "sales": 0, "beats": 0}}
-            ]
-            
+            cursor = db.producer_stats.find({}, {"_id": 0, "producer_id": 1}).sort([("total_sales", -1), ("producer_id", -1)])
             if limit:
-                pipeline.append({"$limit": limit})
-                
-            producers = await db.users.aggregate(pipeline).to_list(length=None)
+                cursor = cursor.limit(limit)
+            ids = [stats['producer_id'] async for stats in cursor]
+            users = await db.users.find({"id": {"$in": ids}}, USER_PROJECTION).to_list(length=None)
+            by_id = {user['id']: user for user in users}
+            producers = [by_id[producer_id] for producer_id in ids if producer_id in by_id]
         else:
             # Default sorting by creation date
-            cursor = cursor.sort("created_at", -1)
+            cursor = db.users.find({"user_type": "producer"}, USER_PROJECTION).sort("created_at", -1)
             if limit:
                 cursor = cursor.limit(limit)
             producers = await cursor.to_list(length=None)
-            
-            # Add total_beats and total_sales for each producer
-            for producer in producers:
-                beats_count = await db.beats.count_documents({"producer_id": producer["id"]})
-                sales_count = await db.purchases.count_documents({"producer_id": producer["id"]})
-                producer["total_beats"] = beats_count
-                producer["total_sales"] = sales_count
         
-        return {"producers": producers, "count": len(producers)}
+        counters = await public_producer_counters([producer['id'] for producer in producers])
+        for producer in producers:
+            producer.update(counters[producer['id']])
+        
+        rendered = render({"producers": producers, "count": len(producers)})
+        producer_list_cache.set(cache_key, rendered)
+        return rendered_response(request, rendered, "producers")
     except Exception as e:
         logger.error(f"Error fetching producers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/users/producers/leaderboard")
+async def get_producer_leaderboard(
+    window: Literal["7d", "30d", "all"] = "7d",
+    limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_SIZE)
+):
+    """Top producers by sales (then revenue, which is never shown) over a rolling window."""
+    ranking = leaderboard_cache.get(window)
+    if ranking is None:
+        days = LEADERBOARD_WINDOWS[window]
+        if days is None:
+            # All-time totals are already materialized in producer_stats
+            rows = await db.producer_stats.find(
+                {}, {"_id": 0, "producer_id": 1, "total_sales": 1, "total_plays": 1}
+            ).sort([("total_sales", -1), ("producer_id", -1)]).limit(LEADERBOARD_MAX_SIZE).to_list(LEADERBOARD_MAX_SIZE)
+            users = await db.users.find(
+                {"id": {"$in": [row['producer_id'] for row in rows]}}, {"_id": 0, "id": 1, "name": 1, "avatar_url": 1}
+            ).to_list(len(rows))
+            by_id = {user['id']: user for user in users}
+            ranking = [
+                {
+                    "id": row['producer_id'],
+                    "name": by_id[row['producer_id']]['name'],
+                    "avatar_url": by_id[row['producer_id']].get('avatar_url'),
+                    "sales": row.get('total_sales', 0),
+                    "plays": row.get('total_plays', 0)
+                }
+                for row in rows if row['producer_id'] in by_id
+            ]
+        else:
+            # Reads at most producers x days rollup rows, however long the purchase history is
+            since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+            rows = await db.producer_daily_stats.aggregate([
+                {"$match": {"day": {"$gte": since}}},
+                {"$group": {
+                    "_id": "$producer_id",
+                    "sales": {"$sum": "$sales"},
+                    "revenue": {"$sum": "$revenue"},
+                    "plays": {"$sum": "$plays"}
+                }},
+                # Equal sales and revenue rank like window=all: higher producer id first
+                {"$sort": {"sales": -1, "revenue": -1, "_id": -1}},
+                {"$limit": LEADERBOARD_MAX_SIZE}
+            ]).to_list(LEADERBOARD_MAX_SIZE)
+            users = await db.users.find(
+                {"id": {"$in": [row['_id'] for row in rows]}}, {"_id": 0, "id": 1, "name": 1, "avatar_url": 1}
+            ).to_list(len(rows))
+            by_id = {user['id']: user for user in users}
+            ranking = [
+                {
+                    "id": row['_id'],
+                    "name": by_id[row['_id']]['name'],
+                    "avatar_url": by_id[row['_id']].get('avatar_url'),
+                    "sales": row['sales'],
+                    "plays": row['plays']
+                }
+                for row in rows if row['_id'] in by_id
+            ]
+        leaderboard_cache.set(window, ranking)
+    
+    return FastJSONResponse(
+        {"window": window, "producers": ranking[:limit], "count": len(ranking[:limit])},
+        headers={"Cache-Control": CACHE_CONTROL_POLICIES["producers"]}
+    )
+
 @api_router.get("/users/{user_id}")
-async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+async def get_user(user_id: str, request: Request):
+    # Every profile write bumps the users version, so a revalidation is answered without reading the user
+    version = (await sync_versions("users"))["users"]
+    etag = f'"{hashlib.sha1(f"{user_id}:{version}".encode("utf-8")).hexdigest()[:20]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, "user")
+    
+    user = await db.users.find_one({"id": user_id}, USER_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    
+    return rendered_response(request, (FastJSONResponse(content=user).body, etag), "user")
 
 # ============ BEATS ROUTES ============
 
@@ -395,24 +1042,31 @@ async def create_beat(
         cover_url=cover_url,
         tags=tags_list
     )
+    # New releases start with a boost that decays like any other activity
+    beat.trending = trending_buffer.score(TRENDING_NEW_BEAT_WEIGHT, beat.created_at)
     
     beat_dict = beat.model_dump()
     beat_dict['created_at'] = beat_dict['created_at'].isoformat()
+    beat_dict['search_words'] = beat_search_words(beat_dict)
     
     await db.beats.insert_one(beat_dict)
+    await update_producer_counters(current_user['id'], total_beats=1)
+    dashboard_cache.invalidate(current_user['id'])
+    await bump_version("beats")
+    update_suggest_index(lambda index: index.add_beat(beat_dict))
+    if beat_columns is not None:
+        beat_columns.upsert(beat_dict)
+    invalidate_catalog(beat_dict)
     
     return {"message": "Beat uploaded successfully", "beat": beat.model_dump()}
 
-@api_router.get("/beats")
-async def get_beats(
+def build_beats_query(
     genre: Optional[str] = None,
     min_bpm: Optional[int] = None,
     max_bpm: Optional[int] = None,
     max_price: Optional[float] = None,
-    search: Optional[str] = None,
-    sort_by: Optional[str] = "created_at",
-    limit: int = 50
-):
+    search: Optional[str] = None
+) -> dict:
     query = {}
     
     if genre:
@@ -426,35 +1080,417 @@ async def get_beats(
             query['bpm'] = {"$lte": max_bpm}
     if max_price:
         query['price'] = {"$lte": max_price}
-    if search:
-        query['$or'] = [
-            {'title': {'$regex': search, '$options': 'i'}},
-            {'producer_name': {'$regex': search, '$options': 'i'}},
-            {'tags': {'$regex': search, '$options': 'i'}}
-        ]
     
-    sort_order = -1 if sort_by in ['created_at', 'plays', 'purchases'] else 1
+    search = search.strip() if search else None
+    if search and len(search) >= TEXT_SEARCH_MIN_LENGTH:
+        query['$text'] = {'$search': search}
+    elif search and words(search):
+        # Too short for whole-word text matching: every search word must prefix a stored word.
+        # Anchored and case-sensitive on normalized words, each regex is an index range scan
+        query['$and'] = [{'search_words': {'$regex': f'^{re.escape(word)}'}} for word in words(search)]
     
-    beats = await db.beats.find(query, {"_id": 0}).sort(sort_by, sort_order).limit(limit).to_list(limit)
+    return query
+
+def sort_index_keys(sort_by: str, genre: Optional[str] = None) -> list:
+    """Key pattern of the init_db index serving a catalog sort, within one genre or across all."""
+    direction = BEAT_SORT_FIELDS[sort_by]
+    keys = [(sort_by, direction), ("id", direction)]
+    keys += [(field, 1) for field in ("bpm", "price") if field != sort_by]
+    return [("genre", 1)] + keys if genre else keys
+
+def beat_projection(fields: Optional[str], sort_field: str = "created_at") -> dict:
+    """Translate a fields= parameter into a Mongo projection."""
+    if not fields:
+        return BEAT_PROJECTION
+    if fields == "card":
+        return BEAT_CARD_PROJECTION
+    
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(Beat.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    # Pagination needs the id and sort value of the last document on the page
+    requested |= {"id", sort_field}
+    return {"_id": 0, **{field: 1 for field in requested}}
+
+def invalidate_catalog(beat: dict, previous_genre: Optional[str] = None):
+    """Drop cached listings and facet counts a change to beat can affect."""
+    facet_cache.clear()
+    tags = [f"beat:{beat['id']}", "genre:*", f"genre:{beat.get('genre')}"]
+    if previous_genre:
+        tags.append(f"genre:{previous_genre}")
+    catalog_cache.invalidate_tags(*tags)
+
+async def list_beats(
+    genre: Optional[str] = None,
+    min_bpm: Optional[int] = None,
+    max_bpm: Optional[int] = None,
+    max_price: Optional[float] = None,
+    search: Optional[str] = None,
+    sort_by: str = "created_at",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> dict:
+    """Return a rendered catalog page (body, ETag) from the listing cache, querying Mongo on a miss."""
+    search = search.strip().lower() if search else None
+    cache_key = (genre, min_bpm, max_bpm, max_price, search, sort_by, limit, cursor, fields)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    response = await query_beats(genre, min_bpm, max_bpm, max_price, search, sort_by, limit, cursor, fields)
+    
+    tags = [f"genre:{genre or '*'}", f"sort:{sort_by}"]
+    tags += [f"beat:{beat['id']}" for beat in response['beats']]
+    rendered = render(response)
+    catalog_cache.set(cache_key, rendered, tags)
+    return rendered
+
+async def warm_catalog_cache():
+    """Pre-load the landing page and the listings of the most populated genres."""
+    try:
+        top_genres = await db.beats.aggregate([
+            {"$sortByCount": "$genre"},
+            {"$limit": CATALOG_WARMUP_TOP_N}
+        ]).to_list(CATALOG_WARMUP_TOP_N)
+        
+        await list_beats()
+        for entry in top_genres:
+            await list_beats(genre=entry['_id'])
+        logger.info(f"Catalog cache warmed with {len(catalog_cache)} listings")
+    except Exception as e:
+        logger.error(f"Error warming catalog cache: {str(e)}")
+
+async def query_beats(
+    genre: Optional[str],
+    min_bpm: Optional[int],
+    max_bpm: Optional[int],
+    max_price: Optional[float],
+    search: Optional[str],
+    sort_by: str,
+    limit: int,
+    cursor: Optional[str],
+    fields: Optional[str]
+) -> dict:
+    if sort_by != 'relevance' and sort_by not in BEAT_SORT_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sort_by must be one of: {', '.join(BEAT_SORT_FIELDS)}, relevance"
+        )
+    
+    query = build_beats_query(genre, min_bpm, max_bpm, max_price, search)
+    
+    if sort_by == 'relevance':
+        if '$text' in query:
+            # textScore cannot appear in a filter, so relevance results are a single page
+            if cursor:
+                raise HTTPException(status_code=400, detail="cursor is not supported with sort_by=relevance")
+            beats = await db.beats.find(query, beat_projection(fields)) \
+                .sort([("score", {"$meta": "textScore"})]) \
+                .limit(limit) \
+                .to_list(limit)
+            return {"beats": beats, "count": len(beats), "next_cursor": None}
+        sort_by = 'created_at'
+    
+    sort_order = BEAT_SORT_FIELDS[sort_by]
+    
+    if beat_columns is not None and beat_columns.ready and not search and sort_by in catalog_index.SORT_FIELDS:
+        return await query_beat_columns(genre, min_bpm, max_bpm, max_price, sort_by, sort_order, limit, cursor, fields)
+    
+    hint = None
+    if '$text' in query or '$and' in query:
+        # A search can match most of the catalog. Past SEARCH_SORT_MAX_MATCHES, walk the sort
+        # index and filter instead of letting the planner sort every match in memory
+        matches = await db.beats.count_documents(query, limit=SEARCH_SORT_MAX_MATCHES + 1)
+        if matches > SEARCH_SORT_MAX_MATCHES:
+            if '$text' in query:
+                # A text index cannot be read in sort order: match the stored words instead
+                # (exact words, so without the text index's stemming)
+                query = {key: value for key, value in query.items() if key != '$text'}
+                query['search_words'] = {'$in': words(search)}
+            hint = sort_index_keys(sort_by, genre)
+    
+    beats, next_cursor = await paginate(
+        db.beats, query, sort_by, sort_order, limit, cursor, beat_projection(fields, sort_by), hint
+    )
+    
+    return {"beats": beats, "count": len(beats), "next_cursor": next_cursor}
+
+async def query_beat_columns(
+    genre: Optional[str],
+    min_bpm: Optional[int],
+    max_bpm: Optional[int],
+    max_price: Optional[float],
+    sort_by: str,
+    sort_order: int,
+    limit: int,
+    cursor: Optional[str],
+    fields: Optional[str]
+) -> dict:
+    """Pick the page from the columnar index, then load just those beats from Mongo."""
+    ids = beat_columns.query(
+        sort_by, sort_order, limit + 1, genre, min_bpm, max_bpm, max_price,
+        after=decode_cursor(cursor) if cursor else None
+    )
+    
+    next_cursor = None
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_cursor({"id": ids[-1], sort_by: beat_columns.cursor_value(ids[-1], sort_by)}, sort_by)
+    
+    beats, _ = await fetch_beats_by_ids(ids, beat_projection(fields, sort_by))
+    return {"beats": beats, "count": len(beats), "next_cursor": next_cursor}
+
+async def build_catalog_index():
+    """Load every beat into the columnar index and drop beats deleted since the last load.
+    
+    Queries use Mongo until the first load finishes.
+    """
+    try:
+        projection = {"_id": 0, "id": 1, "genre": 1, "bpm": 1, "price": 1, "plays": 1, "purchases": 1, "created_at": 1}
+        # Beats this worker inserts while the load runs are not in this set, so they survive it
+        vanished = set(beat_columns.ids())
+        async for beat in db.beats.find({}, projection):
+            beat_columns.upsert(beat)
+            vanished.discard(beat['id'])
+        for beat_id in vanished:
+            beat_columns.remove(beat_id)
+        beat_columns.ready = True
+        logger.info(f"Catalog index loaded with {len(beat_columns)} beats")
+    except Exception as e:
+        logger.error(f"Error building catalog index: {str(e)}")
+
+async def refresh_catalog_index_periodically():
+    while True:
+        await build_catalog_index()
+        await asyncio.sleep(CATALOG_INDEX_REFRESH_SECONDS)
+
+@api_router.get("/beats")
+async def get_beats(
+    request: Request,
+    genre: Optional[str] = None,
+    min_bpm: Optional[int] = None,
+    max_bpm: Optional[int] = None,
+    max_price: Optional[float] = None,
+    search: Optional[str] = None,
+    sort_by: str = "created_at",
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="'card' or a comma-separated list of beat fields")
+):
+    params = (genre, min_bpm, max_bpm, max_price, search, sort_by, limit, cursor, fields)
+    # Picks up other workers' writes so cached listings are dropped
+    await sync_versions("beats")
+    return rendered_response(request, await list_beats(*params), "catalog")
+
+async def fetch_beats_by_ids(ids: List[str], projection: dict) -> tuple:
+    """Load beats with one $in query; return (beats in requested order, missing ids)."""
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > BEAT_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BEAT_BATCH_MAX_IDS} ids per request")
+    
+    docs = await db.beats.find({"id": {"$in": unique_ids}}, projection).to_list(len(unique_ids))
+    by_id = {doc['id']: doc for doc in docs}
+    
+    beats = [by_id[beat_id] for beat_id in unique_ids if beat_id in by_id]
+    missing = [beat_id for beat_id in unique_ids if beat_id not in by_id]
+    return beats, missing
+
+@api_router.get("/beats/batch")
+async def get_beats_batch(
+    ids: str = Query(..., description="Comma-separated beat ids"),
+    fields: Optional[str] = Query(None, description="'card' or a comma-separated list of beat fields")
+):
+    # Batch lookups resolve references (purchases, projects, favorites) and never count as plays
+    beat_ids = [beat_id.strip() for beat_id in ids.split(",") if beat_id.strip()]
+    beats, missing = await fetch_beats_by_ids(beat_ids, beat_projection(fields))
+    return FastJSONResponse({"beats": beats, "count": len(beats), "missing": missing})
+
+@api_router.post("/beats/batch")
+async def post_beats_batch(batch: BeatBatchRequest):
+    beats, missing = await fetch_beats_by_ids(batch.ids, beat_projection(batch.fields))
+    return FastJSONResponse({"beats": beats, "count": len(beats), "missing": missing})
+
+async def compute_facets(query: dict) -> dict:
+    """Count the beats matching query per genre, bpm range, price range and license type."""
+    def bucket(field, boundaries):
+        return [{"$bucket": {
+            "groupBy": f"${field}",
+            "boundaries": boundaries + [float("inf")],
+            "default": "other",
+            "output": {"count": {"$sum": 1}}
+        }}]
+    
+    def by_value(field):
+        return [{"$sortByCount": f"${field}"}]
+    
+    # One pass over the matching beats computes every facet
+    result = await db.beats.aggregate([
+        {"$match": query},
+        {"$facet": {
+            "genre": by_value("genre"),
+            "bpm": bucket("bpm", FACET_BPM_BOUNDARIES),
+            "price": bucket("price", FACET_PRICE_BOUNDARIES),
+            "license_type": by_value("license_type"),
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
+    facets = result[0]
+    
+    def ranges(buckets, boundaries):
+        upper = dict(zip(boundaries, boundaries[1:]))
+        return [
+            {"min": b['_id'], "max": upper.get(b['_id']), "count": b['count']}
+            if b['_id'] != "other" else {"min": None, "max": None, "count": b['count']}
+            for b in buckets
+        ]
     
-    return {"beats": beats, "count": len(beats)}
+    return {
+        "total": facets['total'][0]['count'] if facets['total'] else 0,
+        "genre": [{"value": entry['_id'], "count": entry['count']} for entry in facets['genre']],
+        "bpm": ranges(facets['bpm'], FACET_BPM_BOUNDARIES),
+        "price": ranges(facets['price'], FACET_PRICE_BOUNDARIES),
+        "license_type": [{"value": entry['_id'], "count": entry['count']} for entry in facets['license_type']]
+    }
+
+async def refresh_unfiltered_facets_periodically():
+    # The unfiltered counts scan the whole catalog, so they are materialized off the request path
+    while True:
+        try:
+            unfiltered_facets["counts"] = await compute_facets({})
+        except Exception as e:
+            logger.error(f"Error computing facet counts: {str(e)}")
+        await asyncio.sleep(FACET_REFRESH_SECONDS)
+
+@api_router.get("/beats/facets")
+async def get_beat_facets(
+    genre: Optional[str] = None,
+    min_bpm: Optional[int] = None,
+    max_bpm: Optional[int] = None,
+    max_price: Optional[float] = None,
+    search: Optional[str] = None
+):
+    search = search.strip().lower() if search else None
+    cache_key = (genre, min_bpm, max_bpm, max_price, search)
+    if not any(cache_key):
+        counts = unfiltered_facets.get("counts")
+        if counts is None:
+            counts = unfiltered_facets["counts"] = await compute_facets({})
+        return FastJSONResponse(counts)
+    
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    
+    response = await compute_facets(build_beats_query(genre, min_bpm, max_bpm, max_price, search))
+    facet_cache.set(cache_key, response)
+    return FastJSONResponse(response)
+
+@api_router.get("/beats/suggest")
+async def suggest_beats(q: str, limit: int = Query(10, ge=1, le=25)):
+    return suggest_index.suggest(q, limit)
 
 @api_router.get("/beats/{beat_id}")
-async def get_beat(beat_id: str):
-    beat = await db.beats.find_one({"id": beat_id}, {"_id": 0})
+async def get_beat(beat_id: str, request: Request):
+    await sync_versions("beats")
+    cache_key = ("beat", beat_id)
+    rendered = catalog_cache.get(cache_key)
+    if rendered is None:
+        beat = await db.beats.find_one({"id": beat_id}, BEAT_PROJECTION)
+        if not beat:
+            raise HTTPException(status_code=404, detail="Beat not found")
+        
+        # Include plays this worker has not flushed yet; flushing moves them into the stored count
+        beat['plays'] = beat.get('plays', 0) + play_buffer.pending(beat_id)
+        rendered = render(beat)
+        catalog_cache.set(cache_key, rendered, [f"beat:{beat_id}"])
+    
+    return rendered_response(request, rendered, "beat")
+
+@api_router.post("/beats/{beat_id}/play")
+async def record_plays(
+    beat_id: str,
+    request: Request,
+    batch: Optional[PlayEventBatch] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    beat = await db.beats.find_one({"id": beat_id}, {"_id": 0, "producer_id": 1})
     if not beat:
         raise HTTPException(status_code=404, detail="Beat not found")
     
-    # Increment play count
-    await db.beats.update_one({"id": beat_id}, {"$inc": {"plays": 1}})
-    beat['plays'] = beat.get('plays', 0) + 1
-    
-    return beat
+    # Listener identity is always derived server-side, so clients cannot mint new listeners.
+    # Plays are public: an expired or revoked token still counts, as an anonymous listener
+    user_id = None
+    if credentials:
+        try:
+            user_id = decode_token(credentials.credentials)['user_id']
+        except HTTPException:
+            pass
+    if user_id:
+        listener = f"user:{user_id}"
+    else:
+        listener = "client:" + hashlib.sha256(
+            f"{client_ip(request.scope, TRUSTED_PROXY_HOPS)}|{request.headers.get('user-agent', '')}".encode('utf-8')
+        ).hexdigest()[:16]
+    events = (batch or PlayEventBatch()).events
+    now = datetime.now(timezone.utc)
+    oldest = now - timedelta(seconds=PLAY_EVENT_MAX_AGE_SECONDS)
+    counted = 0
+    rejected = 0
+    
+    for event in events:
+        played_at = event.played_at or now
+        if played_at.tzinfo is None:
+            played_at = played_at.replace(tzinfo=timezone.utc)
+        if played_at < oldest:
+            rejected += 1
+            continue
+        played_at = min(played_at, now)
+        day = played_at.date().isoformat()
+        
+        register = hyperloglog.register_for(listener)
+        listener_sketches.record("beat", beat_id, day, register)
+        listener_sketches.record("producer", beat['producer_id'], day, register)
+        
+        if play_dedupe.get((beat_id, listener)) is None:
+            play_dedupe.set((beat_id, listener), True)
+            play_buffer.record(beat_id)
+            producer_play_buffer.record(beat['producer_id'])
+            producer_daily_plays.record(beat['producer_id'], day)
+            trending_buffer.record(beat_id, 1, played_at)
+            counted += 1
+    
+    if counted:
+        # The play count is part of the beat's page, not of listings (those refresh with CATALOG_CACHE_TTL_SECONDS)
+        catalog_cache.invalidate(("beat", beat_id))
+    
+    return {"counted": counted, "deduplicated": len(events) - counted - rejected, "rejected": rejected}
+
+async def unique_listeners(scope: str, keys: List[str], days: int = UNIQUE_LISTENER_WINDOW_DAYS) -> dict:
+    """Estimate distinct listeners per key over the last days by merging daily sketches."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+    merged = {key: {} for key in keys}
+    cursor = db.listener_sketches.find(
+        {"scope": scope, "key": {"$in": keys}, "day": {"$gte": since}},
+        {"_id": 0, "key": 1, "r": 1}
+    )
+    async for sketch in cursor:
+        hyperloglog.merge(merged[sketch['key']], sketch.get('r', {}))
+    return {key: hyperloglog.estimate(registers) for key, registers in merged.items()}
 
 @api_router.get("/beats/producer/{producer_id}")
-async def get_producer_beats(producer_id: str):
-    beats = await db.beats.find({"producer_id": producer_id}, {"_id": 0}).to_list(1000)
-    return {"beats": beats, "count": len(beats)}
+async def get_producer_beats(
+    producer_id: str,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="'card' or a comma-separated list of beat fields")
+):
+    beats, next_cursor = await paginate(
+        db.beats, {"producer_id": producer_id}, "created_at", -1, limit, cursor, beat_projection(fields)
+    )
+    return {"beats": beats, "count": len(beats), "next_cursor": next_cursor}
 
 @api_router.put("/beats/{beat_id}")
 async def update_beat(
@@ -468,7 +1504,7 @@ async def update_beat(
     license_type: str = Form(...),
     tags: str = Form(""),
     cover_file: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     if current_user['user_type'] != 'producer':
         raise HTTPException(status_code=403, detail="Only producers can update beats")
@@ -502,14 +1538,21 @@ async def update_beat(
         "tags": tags_list,
         "cover_url": cover_url
     }
+    update_data["search_words"] = beat_search_words({**beat, **update_data})
     
     await db.beats.update_one({"id": beat_id}, {"$set": update_data})
-    
-    updated_beat = await db.beats.find_one({"id": beat_id}, {"_id": 0})
+    await bump_version("beats")
+    
+    updated_beat = await db.beats.find_one({"id": beat_id}, BEAT_PROJECTION)
+    update_suggest_index(lambda index: index.add_beat(updated_beat))
+    if beat_columns is not None:
+        beat_columns.upsert(updated_beat)
+    invalidate_catalog(updated_beat, previous_genre=beat['genre'])
+    dashboard_cache.invalidate(current_user['id'])
     return {"message": "Beat updated successfully", "beat": updated_beat}
 
 @api_router.delete("/beats/{beat_id}")
-async def delete_beat(beat_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_beat(beat_id: str, current_user: dict = Depends(get_token_claims)):
     beat = await db.beats.find_one({"id": beat_id})
     if not beat:
         raise HTTPException(status_code=404, detail="Beat not found")
@@ -518,10 +1561,50 @@ async def delete_beat(beat_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.beats.delete_one({"id": beat_id})
+    # Unflushed plays already reached the producer's pending total; they go with the beat too
+    plays = beat.get('plays', 0) + play_buffer.discard(beat_id)
+    await update_producer_counters(beat['producer_id'], total_beats=-1, total_plays=-plays)
+    dashboard_cache.invalidate(beat['producer_id'])
+    await bump_version("beats")
+    update_suggest_index(lambda index: index.remove_beat(beat_id))
+    if beat_columns is not None:
+        beat_columns.remove(beat_id)
+    # Only pages that listed the beat change; later pages start from their own cursor
+    catalog_cache.invalidate_tags(f"beat:{beat_id}")
+    facet_cache.clear()
     return {"message": "Beat deleted successfully"}
 
 # ============ PURCHASES ROUTES ============
 
+async def apply_purchase_rollups(purchase: Purchase):
+    """Apply every counter and rollup derived from a stored purchase.
+    
+    The writes are independent, so they run concurrently. They are not one
+    transaction: a failed write is logged, and the purchases collection stays
+    the source of truth that init_db.py --backfill-producer-stats and
+    --backfill-sales-buckets rebuild all of them from.
+    """
+    day = purchase.created_at.date()
+    results = await asyncio.gather(
+        db.beats.update_one({"id": purchase.beat_id}, {"$inc": {"purchases": 1}}),
+        update_producer_counters(purchase.producer_id, total_sales=1, total_revenue=purchase.amount),
+        db.producer_daily_stats.update_one(
+            {"producer_id": purchase.producer_id, "day": day.isoformat()},
+            {"$inc": {"sales": 1, "revenue": purchase.amount}},
+            upsert=True
+        ),
+        db.sales_buckets.bulk_write(
+            [sales_buckets.bucket_update(purchase.producer_id, purchase.beat_id, purchase.amount, day)]
+        ),
+        db.producer_sales_buckets.bulk_write(
+            [sales_buckets.producer_bucket_update(purchase.producer_id, purchase.amount, day)]
+        ),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Rollup write for purchase {purchase.id} failed, rebuild with init_db.py backfills: {str(result)}")
+
 @api_router.post("/purchases")
 async def create_purchase(
     purchase_data: PurchaseCreate,
@@ -559,40 +1642,162 @@ async def create_purchase(
     
     await db.purchases.insert_one(purchase_dict)
     
-    # Update beat purchase count
-    await db.beats.update_one({"id": beat['id']}, {"$inc": {"purchases": 1}})
+    await apply_purchase_rollups(purchase)
+    dashboard_cache.invalidate(beat['producer_id'])
+    dashboard_cache.invalidate(current_user['id'])
+    await bump_version("beats", "purchases")
+    trending_buffer.record(beat['id'], TRENDING_PURCHASE_WEIGHT)
+    if beat_columns is not None:
+        beat_columns.increment(beat['id'], "purchases")
+    catalog_cache.invalidate_tags(f"beat:{beat['id']}", "sort:purchases")
     
     return {"message": "Purchase completed", "purchase": purchase.model_dump()}
 
 @api_router.get("/purchases/my-purchases")
-async def get_my_purchases(current_user: dict = Depends(get_current_user)):
-    purchases = await db.purchases.find(
-        {"buyer_id": current_user['id']},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
+async def get_my_purchases(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_token_claims)
+):
+    purchases, next_cursor = await paginate(
+        db.purchases, {"buyer_id": current_user['id']}, "created_at", -1, limit, cursor
+    )
     
-    return {"purchases": purchases, "count": len(purchases)}
+    return FastJSONResponse({"purchases": purchases, "count": len(purchases), "next_cursor": next_cursor})
 
 @api_router.get("/purchases/my-sales")
-async def get_my_sales(current_user: dict = Depends(get_current_user)):
+async def get_my_sales(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_token_claims)
+):
     if current_user['user_type'] != 'producer':
         raise HTTPException(status_code=403, detail="Only producers can view sales")
     
-    sales = await db.purchases.find(
-        {"producer_id": current_user['id']},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
+    sales, next_cursor = await paginate(
+        db.purchases, {"producer_id": current_user['id']}, "created_at", -1, limit, cursor
+    )
+    
+    # Revenue covers every sale, not just the current page; producer_stats keeps it per producer
+    counters = await load_producer_counters(current_user['id'])
     
-    total_revenue = sum(sale.get('amount', 0) for sale in sales)
+    return FastJSONResponse({
+        "sales": sales, "count": len(sales), "total_revenue": counters['total_revenue'], "next_cursor": next_cursor
+    })
+
+def export_range_queries(query: dict, start: Optional[datetime], end: Optional[datetime]) -> List[dict]:
+    """Split a purchases query into one query per created_at representation, each limited to start <= created_at < end."""
+    # API writes store created_at as a UTC ISO string, seeded and legacy purchases as a BSON date
+    start = (start if start.tzinfo else start.replace(tzinfo=timezone.utc)).astimezone(timezone.utc) if start else None
+    end = (end if end.tzinfo else end.replace(tzinfo=timezone.utc)).astimezone(timezone.utc) if end else None
+    queries = []
+    for bson_type, convert in (("string", datetime.isoformat), ("date", lambda value: value)):
+        bounds = {"$type": bson_type}
+        if start:
+            bounds["$gte"] = convert(start)
+        if end:
+            bounds["$lt"] = convert(end)
+        queries.append({**query, "created_at": bounds})
+    return queries
+
+def created_at_utc(value) -> datetime:
+    """A stored created_at (ISO string or naive/aware datetime) as an aware UTC datetime."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+async def merge_oldest_first(cursors: list):
+    """Merge cursors that are each sorted by (created_at, id) into one oldest-first stream."""
+    heads = []
+    for position, cursor in enumerate(cursors):
+        iterator = aiter(cursor)
+        purchase = await anext(iterator, None)
+        if purchase is not None:
+            heads.append((created_at_utc(purchase['created_at']), purchase.get('id', ''), position, purchase, iterator))
+    while heads:
+        head = min(heads, key=lambda entry: entry[:3])
+        heads.remove(head)
+        yield head[3]
+        purchase = await anext(head[4], None)
+        if purchase is not None:
+            heads.append((created_at_utc(purchase['created_at']), purchase.get('id', ''), head[2], purchase, head[4]))
+
+async def stream_purchases(queries: List[dict], columns: List[str], export_format: str):
+    """Yield purchases oldest first as CSV or NDJSON, then a totals row."""
+    projection = {"_id": 0, "created_at": 1, "id": 1, **{column: 1 for column in columns}}
+    cursors = [
+        db.purchases.find(query, projection).sort([("created_at", 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+        for query in queries
+    ]
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(columns)
+    
+    count = 0
+    total_amount = 0.0
+    async for purchase in merge_oldest_first(cursors):
+        purchase['created_at'] = created_at_utc(purchase['created_at']).isoformat()
+        count += 1
+        total_amount += purchase.get("amount", 0)
+        if export_format == "csv":
+            writer.writerow([purchase.get(column) for column in columns])
+        else:
+            buffer.write(json.dumps({column: purchase.get(column) for column in columns}) + "\n")
+        
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    total_amount = round(total_amount, 2)
+    if export_format == "csv":
+        totals = dict.fromkeys(columns)
+        totals.update({"id": f"TOTAL ({count} rows)", "amount": total_amount})
+        writer.writerow(totals.values())
+    else:
+        buffer.write(json.dumps({"summary": {"count": count, "total_amount": total_amount}}) + "\n")
+    yield buffer.getvalue()
+
+def export_response(queries: List[dict], columns: List[str], export_format: str, name: str) -> StreamingResponse:
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"{name}-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{export_format}"
+    return StreamingResponse(
+        stream_purchases(queries, columns, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/purchases/my-sales/export")
+async def export_my_sales(
+    format: Literal["csv", "ndjson"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_token_claims)
+):
+    if current_user['user_type'] != 'producer':
+        raise HTTPException(status_code=403, detail="Only producers can view sales")
     
-    return {"sales": sales, "count": len(sales), "total_revenue": total_revenue}
+    queries = export_range_queries({"producer_id": current_user['id']}, start, end)
+    return export_response(queries, SALES_EXPORT_COLUMNS, format, "sales")
+
+@api_router.get("/purchases/my-purchases/export")
+async def export_my_purchases(
+    format: Literal["csv", "ndjson"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_token_claims)
+):
+    queries = export_range_queries({"buyer_id": current_user['id']}, start, end)
+    return export_response(queries, PURCHASES_EXPORT_COLUMNS, format, "purchases")
 
 # ============ PROJECTS ROUTES ============
 
 @api_router.post("/projects")
 async def create_project(
     project_data: ProjectCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     if current_user['user_type'] != 'artist':
         raise HTTPException(status_code=403, detail="Only artists can create projects")
@@ -620,20 +1825,24 @@ async def create_project(
     project_dict['updated_at'] = project_dict['updated_at'].isoformat()
     
     await db.projects.insert_one(project_dict)
+    dashboard_cache.invalidate(current_user['id'])
     
     return {"message": "Project created", "project": project.model_dump()}
 
 @api_router.get("/projects/my-projects")
-async def get_my_projects(current_user: dict = Depends(get_current_user)):
-    projects = await db.projects.find(
-        {"artist_id": current_user['id']},
-        {"_id": 0}
-    ).sort("updated_at", -1).to_list(1000)
+async def get_my_projects(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_token_claims)
+):
+    projects, next_cursor = await paginate(
+        db.projects, {"artist_id": current_user['id']}, "updated_at", -1, limit, cursor
+    )
     
-    return {"projects": projects, "count": len(projects)}
+    return FastJSONResponse({"projects": projects, "count": len(projects), "next_cursor": next_cursor})
 
 @api_router.get("/projects/{project_id}")
-async def get_project(project_id: str, current_user: dict = Depends(get_current_user)):
+async def get_project(project_id: str, current_user: dict = Depends(get_token_claims)):
     project = await db.projects.find_one({"id": project_id}, {"_id": 0})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -649,7 +1858,7 @@ async def update_project(
     title: Optional[str] = None,
     description: Optional[str] = None,
     status: Optional[Literal["draft", "mixing", "mastering", "completed"]] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     if current_user['user_type'] != 'artist':
         raise HTTPException(status_code=403, detail="Only artists can update projects")
@@ -673,12 +1882,13 @@ async def update_project(
         update_data["status"] = status
     
     await db.projects.update_one({"id": project_id}, {"$set": update_data})
+    dashboard_cache.invalidate(current_user['id'])
     
     updated_project = await db.projects.find_one({"id": project_id}, {"_id": 0})
     return {"message": "Project updated successfully", "project": updated_project}
 
 @api_router.delete("/projects/{project_id}")
-async def delete_project(project_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_project(project_id: str, current_user: dict = Depends(get_token_claims)):
     project = await db.projects.find_one({"id": project_id})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -687,6 +1897,7 @@ async def delete_project(project_id: str, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.projects.delete_one({"id": project_id})
+    dashboard_cache.invalidate(current_user['id'])
     return {"message": "Project deleted successfully"}
 
 # ============ AI ROUTES ============
@@ -694,7 +1905,7 @@ async def delete_project(project_id: str, current_user: dict = Depends(get_curre
 @api_router.post("/ai/analyze")
 async def ai_analyze(
     request: AIAnalysisRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     """Análise de mixagem por IA - Em desenvolvimento"""
     return {
@@ -704,7 +1915,7 @@ async def ai_analyze(
 @api_router.post("/ai/generate-cover")
 async def generate_cover(
     request: CoverGenerationRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     """Geração de capa por IA - Em desenvolvimento"""
     return {
@@ -715,35 +1926,118 @@ async def generate_cover(
 # ============ STATS ROUTES ============
 
 @api_router.get("/stats/dashboard")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_dashboard_stats(current_user: dict = Depends(get_token_claims)):
+    cached = dashboard_cache.get(current_user['id'])
+    if cached is not None:
+        return FastJSONResponse(cached)
+    
     if current_user['user_type'] == 'producer':
-        beats = await db.beats.find({"producer_id": current_user['id']}, {"_id": 0}).to_list(1000)
-        sales = await db.purchases.find({"producer_id": current_user['id']}, {"_id": 0}).to_list(1000)
+        # Totals are the counters maintained in producer_stats, so this is usually a point read
+        producer = await load_producer_counters(current_user['id'])
+        beats, _ = await paginate(
+            db.beats, {"producer_id": current_user['id']}, "created_at", -1, 10, projection=BEAT_CARD_PROJECTION
+        )
         
-        total_plays = sum(beat.get('plays', 0) for beat in beats)
-        total_sales = len(sales)
-        total_revenue = sum(sale.get('amount', 0) for sale in sales)
+        producer_listeners = await unique_listeners("producer", [current_user['id']])
+        beat_listeners = await unique_listeners("beat", [beat['id'] for beat in beats])
+        for beat in beats:
+            beat['unique_listeners_30d'] = beat_listeners[beat['id']]
         
-        return {
-            "total_beats": len(beats),
-            "total_plays": total_plays,
-            "total_sales": total_sales,
-            "total_revenue": total_revenue,
-            "beats": beats[:10]  # Latest 10 beats
+        response = {
+            "total_beats": producer['total_beats'],
+            "total_plays": producer['total_plays'],
+            "unique_listeners_30d": producer_listeners[current_user['id']],
+            "total_sales": producer['total_sales'],
+            "total_revenue": producer['total_revenue'],
+            "beats": beats  # Latest 10 beats
         }
     else:
-        purchases = await db.purchases.find({"buyer_id": current_user['id']}, {"_id": 0}).to_list(1000)
-        projects = await db.projects.find({"artist_id": current_user['id']}, {"_id": 0}).to_list(1000)
+        # One aggregation counts purchases, sums spend and counts projects
+        totals = await db.purchases.aggregate([
+            {"$match": {"buyer_id": current_user['id']}},
+            {"$group": {"_id": "purchases", "count": {"$sum": 1}, "total": {"$sum": "$amount"}}},
+            {"$unionWith": {"coll": "projects", "pipeline": [
+                {"$match": {"artist_id": current_user['id']}},
+                {"$group": {"_id": "projects", "count": {"$sum": 1}}}
+            ]}}
+        ]).to_list(2)
+        totals = {row['_id']: row for row in totals}
+        purchases, _ = await paginate(db.purchases, {"buyer_id": current_user['id']}, "created_at", -1, 10)
+        projects, _ = await paginate(db.projects, {"artist_id": current_user['id']}, "updated_at", -1, 10)
         
-        total_spent = sum(purchase.get('amount', 0) for purchase in purchases)
-        
-        return {
-            "total_purchases": len(purchases),
-            "total_projects": len(projects),
-            "total_spent": total_spent,
-            "recent_purchases": purchases[:10],
-            "active_projects": projects[:10]
+        response = {
+            "total_purchases": totals.get('purchases', {}).get('count', 0),
+            "total_projects": totals.get('projects', {}).get('count', 0),
+            "total_spent": totals.get('purchases', {}).get('total', 0),
+            "recent_purchases": purchases,
+            "active_projects": projects
         }
+    
+    dashboard_cache.set(current_user['id'], response)
+    return FastJSONResponse(response)
+
+@api_router.get("/stats/sales-timeseries")
+async def get_sales_timeseries(
+    granularity: Literal["day", "week", "month"] = "day",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    beat_id: Optional[str] = None,
+    current_user: dict = Depends(get_token_claims)
+):
+    if current_user['user_type'] != 'producer':
+        raise HTTPException(status_code=403, detail="Only producers can view sales")
+    
+    end = date_to or datetime.now(timezone.utc).date()
+    start = date_from or end - timedelta(days=SALES_TIMESERIES_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if (end - start).days >= SALES_TIMESERIES_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range may span at most {SALES_TIMESERIES_MAX_DAYS} days")
+    
+    # One bucket per month of the range, read through the (producer_id[, beat_id], month) index
+    if beat_id:
+        buckets = db.sales_buckets.find(
+            {"producer_id": current_user['id'], "beat_id": beat_id, "month": sales_buckets.month_range(start, end)},
+            {"_id": 0, "month": 1, "days": 1}
+        )
+    else:
+        buckets = db.producer_sales_buckets.find(
+            {"producer_id": current_user['id'], "month": sales_buckets.month_range(start, end)},
+            {"_id": 0, "month": 1, "days": 1}
+        )
+    points = sales_buckets.series(sales_buckets.bucket_days(await buckets.to_list(None)), start, end, granularity)
+    
+    return FastJSONResponse({
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "beat_id": beat_id,
+        "points": points,
+        "total_sales": sum(point['sales'] for point in points),
+        "total_revenue": round(sum(point['revenue'] for point in points), 2)
+    })
+
+@api_router.get("/stats/metrics")
+async def get_metrics(admin: dict = Depends(require_admin)):
+    return {
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": {**token_cache.stats(), "revoked": len(revoked_tokens)},
+        "catalog_cache": catalog_cache.stats(),
+        "facet_cache": facet_cache.stats(),
+        "play_buffer": play_buffer.stats(),
+        "producer_play_buffer": producer_play_buffer.stats(),
+        "producer_daily_plays": producer_daily_plays.stats(),
+        "producer_list_cache": producer_list_cache.stats(),
+        "leaderboard_cache": leaderboard_cache.stats(),
+        "dashboard_cache": dashboard_cache.stats(),
+        "trending_buffer": trending_buffer.stats(),
+        "listener_sketches": listener_sketches.stats(),
+        "play_dedupe": play_dedupe.stats(),
+        "suggest_index": suggest_index.stats(),
+        "catalog_index": beat_columns.stats() if beat_columns is not None else None,
+        "compressed_responses": compressed_responses.stats()
+    }
 
 # Mount uploads directory BEFORE including router (so it doesn't conflict)
 uploads_dir = ROOT_DIR / "uploads"
@@ -753,6 +2047,27 @@ app.mount("/api/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads
 # Include router
 app.include_router(api_router)
 
+# Innermost middleware, so rate-limit rejections and CORS headers wrap compressed responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    exclude_paths=("/api/uploads",),  # Audio and images are already compressed
+    cache=compressed_responses
+)
+
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=MongoRateLimitBackend(db.rate_limits) if RATE_LIMIT_BACKEND == 'mongo' else InMemoryRateLimitBackend(),
+        ip_policy=BucketPolicy(rate=RATE_LIMIT_IP_RATE, burst=RATE_LIMIT_IP_BURST),
+        user_policy=BucketPolicy(rate=RATE_LIMIT_USER_RATE, burst=RATE_LIMIT_USER_BURST),
+        cost_fn=rate_limit_cost,
+        user_key_fn=rate_limit_user_key,
+        trusted_proxies=TRUSTED_PROXY_HOPS
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -767,6 +2082,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def backfill_trending_scores():
+    """Give beats created before trending scores existed an initial score."""
+    try:
+        scored = await trending_buffer.backfill(TRENDING_NEW_BEAT_WEIGHT, TRENDING_PURCHASE_WEIGHT)
+        if scored:
+            logger.info(f"Backfilled trending scores for {scored} beats")
+    except Exception as e:
+        logger.error(f"Error backfilling trending scores: {str(e)}")
+
+@app.on_event("startup")
+async def startup_background_tasks():
+    await load_revoked_tokens()
+    background_tasks.append(asyncio.create_task(reload_revoked_tokens_periodically()))
+    # Built in the background so startup is not held up by a large catalog
+    background_tasks.append(asyncio.create_task(refresh_suggest_index_periodically()))
+    background_tasks.append(asyncio.create_task(warm_catalog_cache()))
+    background_tasks.append(asyncio.create_task(refresh_unfiltered_facets_periodically()))
+    if beat_columns is not None:
+        background_tasks.append(asyncio.create_task(refresh_catalog_index_periodically()))
+    background_tasks.append(asyncio.create_task(play_buffer.run()))
+    background_tasks.append(asyncio.create_task(producer_play_buffer.run()))
+    background_tasks.append(asyncio.create_task(producer_daily_plays.run()))
+    background_tasks.append(asyncio.create_task(listener_sketches.run()))
+    background_tasks.append(asyncio.create_task(trending_buffer.run()))
+    background_tasks.append(asyncio.create_task(backfill_trending_scores()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in background_tasks:
+        task.cancel()
+    # flush() waits for a batch the cancelled loops were writing, then writes the rest
+    await play_buffer.flush()
+    await producer_play_buffer.flush()
+    await producer_daily_plays.flush()
+    await listener_sketches.flush()
+    await trending_buffer.flush()
+    client.close()
+    password_hasher.shutdown()
\ No newline at end of file
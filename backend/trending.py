@@ -0,0 +1,100 @@
+"""
+Trending Scores for VibeBeats
+
+Each beat carries a time-decayed popularity score in its "trending" field. The
+score is stored in log space relative to a fixed epoch,
+
+    trending = ln(sum(weight_i * 2 ** ((t_i - EPOCH) / half_life)))
+
+so an event never has to be re-decayed: adding one is a log-sum-exp with its
+own term, and ordering by the stored value is the same as ordering by the
+decayed score at any moment. Only beats with new plays or purchases are
+written, which keeps recomputation incremental however large the catalog is.
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from play_counter import WriteBehindBuffer
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def logaddexp(a: float, b: float) -> float:
+    """ln(e**a + e**b) without overflow."""
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _logaddexp_expr(a, b) -> dict:
+    # Same formula as logaddexp, as an aggregation expression for pipeline updates
+    return {"$add": [
+        {"$max": [a, b]},
+        {"$ln": {"$add": [1, {"$exp": {"$multiply": [-1, {"$abs": {"$subtract": [a, b]}}]}}]}}
+    ]}
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class TrendingBuffer(WriteBehindBuffer):
+    """Buffers weighted play and purchase events and folds them into beats.trending."""
+
+    def __init__(self, collection, flush_interval: float, max_keys: int, half_life_hours: float):
+        super().__init__(collection, flush_interval, max_keys)
+        self.half_life_hours = half_life_hours
+
+    def score(self, weight: float, at: Optional[datetime] = None) -> float:
+        """Log-space contribution of an event of the given weight at time at."""
+        at = _as_datetime(at) if at else datetime.now(timezone.utc)
+        hours = (at - EPOCH).total_seconds() / 3600
+        return math.log(weight) + hours / self.half_life_hours * math.log(2)
+
+    def record(self, beat_id: str, weight: float, at: Optional[datetime] = None):
+        """Add an event to a beat's score on the next flush."""
+        self._add(beat_id, self.score(weight, at))
+
+    def _combine(self, current, value):
+        return logaddexp(current, value)
+
+    def _request(self, beat_id, score):
+        return UpdateOne({"id": beat_id}, [{"$set": {"trending": {"$cond": [
+            {"$eq": [{"$type": "$trending"}, "missing"]},
+            score,
+            _logaddexp_expr("$trending", score)
+        ]}}}])
+
+    async def backfill(self, new_beat_weight: float, purchase_weight: float) -> int:
+        """Score beats that predate trending from their creation time and lifetime counters."""
+        scored = 0
+        cursor = self.collection.find(
+            {"trending": {"$exists": False}},
+            {"_id": 0, "id": 1, "created_at": 1, "plays": 1, "purchases": 1}
+        )
+        batch = []
+        async for beat in cursor:
+            created_at = beat.get("created_at") or EPOCH
+            score = self.score(new_beat_weight, created_at)
+            activity = beat.get("plays", 0) + purchase_weight * beat.get("purchases", 0)
+            if activity > 0:
+                score = logaddexp(score, self.score(activity, created_at))
+            batch.append(UpdateOne({"id": beat["id"], "trending": {"$exists": False}}, {"$set": {"trending": score}}))
+
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                await self.collection.bulk_write(batch, ordered=False)
+                scored += len(batch)
+                batch = []
+        if batch:
+            await self.collection.bulk_write(batch, ordered=False)
+            scored += len(batch)
+        return scored
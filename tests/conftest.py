@@ -0,0 +1,38 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; nothing here ever connects to Mongo
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+os.environ.setdefault("DB_NAME", "vibebeats_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("CATALOG_INDEX_ENABLED", "false")
+
+from tests.fake_mongo import FakeDatabase  # noqa: E402
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Point server.py (and every buffer bound to a collection) at an in-memory database."""
+    import server
+    from cache import StatsCache
+    from play_counter import WriteBehindBuffer
+
+    database = FakeDatabase()
+    monkeypatch.setattr(server, "db", database)
+    for obj in list(vars(server).values()):
+        if isinstance(obj, WriteBehindBuffer):
+            monkeypatch.setattr(obj, "collection", database[obj.collection.name])
+            monkeypatch.setattr(obj, "_pending", {})
+            monkeypatch.setattr(obj, "_flush_task", None)
+        if isinstance(obj, StatsCache):
+            obj.clear()
+    for name in ("collection_versions", "versions_synced_at", "unfiltered_facets"):
+        monkeypatch.setattr(server, name, {})
+    return database
@@ -0,0 +1,463 @@
+"""
+In-memory stand-in for the Motor API used by the backend.
+
+Supports the query, update, projection and sort features the server relies on,
+including BSON type bracketing: comparisons only match values of the same type
+and sorts order values null < numbers < strings < objects < booleans < dates.
+Aggregation is limited to $match, $sort, $limit, $project and $group with $sum.
+"""
+
+import copy
+import functools
+import re
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+
+_MISSING = object()
+
+
+def _type_rank(value) -> int:
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    raise TypeError(f"Unsupported value {value!r}")
+
+
+_TYPE_ALIASES = {
+    "null": {1},
+    "number": {2}, "int": {2}, "long": {2}, "double": {2},
+    "string": {3},
+    "object": {4},
+    "array": {5},
+    "objectId": {7},
+    "bool": {8},
+    "date": {9},
+}
+
+
+def compare(a, b) -> int:
+    """Order two values the way MongoDB sorts them."""
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        return 0
+    if rank_a == 9:
+        a, b = _naive(a), _naive(b)
+    return (a > b) - (a < b)
+
+
+def _naive(value: datetime) -> datetime:
+    # BSON dates carry no zone; Motor hands them back naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def get_path(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _candidates(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _match_operator(value, op: str, arg) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op == "$in":
+        return any(_equals(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_equals(value, item) for item in arg)
+    if op == "$type":
+        ranks = set().union(*(_TYPE_ALIASES[name] for name in _candidates(arg)))
+        return value is not _MISSING and _type_rank(value) in ranks
+    if op == "$regex":
+        return any(isinstance(item, str) and re.search(arg, item) for item in _candidates(value))
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for item in _candidates(value):
+            if item is _MISSING or _type_rank(item) != _type_rank(arg):
+                continue
+            result = compare(item, arg)
+            if {"$gt": result > 0, "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[op]:
+                return True
+        return False
+    raise NotImplementedError(op)
+
+
+def _equals(value, arg) -> bool:
+    if arg is None:
+        return value is _MISSING or value is None or (isinstance(value, list) and None in value)
+    if value is _MISSING:
+        return False
+    if isinstance(value, list) and not isinstance(arg, list):
+        return any(_equals(item, arg) for item in value)
+    if isinstance(arg, (dict, list)):
+        return value == arg
+    return _type_rank(value) == _type_rank(arg) and compare(value, arg) == 0
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """True if doc satisfies query."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$text":
+            raise NotImplementedError("$text")
+        else:
+            value = get_path(doc, key)
+            if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+                options = condition.get("$options", "")
+                for op, arg in condition.items():
+                    if op == "$options":
+                        continue
+                    if op == "$regex":
+                        arg = re.compile(arg, re.IGNORECASE if "i" in options else 0)
+                    if not _match_operator(value, op, arg):
+                        return False
+            elif isinstance(condition, re.Pattern):
+                if not _match_operator(value, "$regex", condition):
+                    return False
+            elif not _equals(value, condition):
+                return False
+    return True
+
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def apply_update(doc: dict, update, inserting: bool = False):
+    if isinstance(update, list):
+        raise NotImplementedError("pipeline updates")
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = get_path(doc, path)
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                if current is _MISSING or compare(arg, current) > 0:
+                    _set_path(doc, path, arg)
+            elif op == "$min":
+                if current is _MISSING or compare(arg, current) < 0:
+                    _set_path(doc, path, arg)
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$currentDate":
+                _set_path(doc, path, datetime.utcnow())
+            elif op == "$push":
+                _set_path(doc, path, (current if isinstance(current, list) else []) + [arg])
+            elif op == "$addToSet":
+                items = current if isinstance(current, list) else []
+                _set_path(doc, path, items if arg in items else items + [arg])
+            elif op == "$pull":
+                _set_path(doc, path, [item for item in _candidates(current) if item != arg])
+            else:
+                raise NotImplementedError(op)
+
+
+def project(doc: dict, projection) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    projection = {key: value for key, value in projection.items() if not isinstance(value, dict)}
+    include = [key for key, value in projection.items() if value and key != "_id"]
+    if include:
+        result = {}
+        for key in include:
+            value = get_path(doc, key)
+            if value is not _MISSING:
+                _set_path(result, key, copy.deepcopy(value))
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = copy.deepcopy(doc)
+    for key, value in projection.items():
+        if not value:
+            _unset_path(result, key)
+    return result
+
+
+def _sort_key(spec):
+    def cmp(a, b):
+        for field, direction in spec:
+            result = compare(get_path(a, field), get_path(b, field))
+            if result:
+                return result * direction
+        return 0
+    return functools.cmp_to_key(cmp)
+
+
+class FakeCursor:
+    def __init__(self, docs: list, projection):
+        self._docs = docs
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self.hinted = None
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def hint(self, index):
+        self.hinted = index
+        return self
+
+    def _results(self) -> list:
+        docs = self._docs
+        if self._sort:
+            docs = sorted(docs, key=_sort_key(self._sort))
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs = []
+        self.indexes = []
+
+    def _matching(self, query) -> list:
+        return [doc for doc in self.docs if matches(doc, query)]
+
+    def find(self, query=None, projection=None, sort=None, limit=0):
+        cursor = FakeCursor(self._matching(query), projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.limit(limit)
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        results = await self.find(query, projection, sort=sort, limit=1).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, query=None, limit=0):
+        count = len(self._matching(query))
+        return min(count, limit) if limit else count
+
+    async def insert_one(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+        return _Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: list, ordered: bool = True):
+        for doc in docs:
+            await self.insert_one(doc)
+        return _Result(inserted_ids=[doc["_id"] for doc in docs])
+
+    def _upsert(self, query: dict, update) -> dict:
+        doc = {"_id": ObjectId()}
+        for key, value in query.items():
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value)):
+                _set_path(doc, key, copy.deepcopy(value))
+        apply_update(doc, update, inserting=True)
+        self.docs.append(doc)
+        return doc
+
+    async def update_one(self, query: dict, update, upsert: bool = False):
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                apply_update(doc, update)
+                return _Result(matched_count=1, modified_count=int(doc != before), upserted_id=None)
+        if upsert:
+            return _Result(matched_count=0, modified_count=0, upserted_id=self._upsert(query, update)["_id"])
+        return _Result(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: dict, update, upsert: bool = False):
+        matched = self._matching(query)
+        for doc in matched:
+            apply_update(doc, update)
+        if not matched and upsert:
+            self._upsert(query, update)
+        return _Result(matched_count=len(matched), modified_count=len(matched))
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        docs = self._matching(query)
+        if sort:
+            docs = sorted(docs, key=_sort_key(sort))
+        if not docs:
+            if not upsert:
+                return None
+            doc = self._upsert(query, update)
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        doc = docs[0]
+        before = project(doc, projection)
+        apply_update(doc, update)
+        return project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def find_one_and_delete(self, query, projection=None):
+        docs = self._matching(query)
+        if not docs:
+            return None
+        self.docs.remove(docs[0])
+        return project(docs[0], projection)
+
+    async def delete_one(self, query):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return _Result(deleted_count=1)
+        return _Result(deleted_count=0)
+
+    async def delete_many(self, query):
+        matched = self._matching(query)
+        for doc in matched:
+            self.docs.remove(doc)
+        return _Result(deleted_count=len(matched))
+
+    async def bulk_write(self, requests: list, ordered: bool = True):
+        for request in requests:
+            if isinstance(request, UpdateOne):
+                await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+            elif isinstance(request, InsertOne):
+                await self.insert_one(request._doc)
+            elif isinstance(request, DeleteOne):
+                await self.delete_one(request._filter)
+            else:
+                raise NotImplementedError(type(request).__name__)
+        return _Result(bulk_api_result={})
+
+    async def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+        return options.get("name", str(keys))
+
+    def aggregate(self, pipeline: list):
+        docs = [copy.deepcopy(doc) for doc in self.docs]
+        for stage in pipeline:
+            (name, arg), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, arg)]
+            elif name == "$sort":
+                docs = sorted(docs, key=_sort_key(list(arg.items())))
+            elif name == "$limit":
+                docs = docs[:arg]
+            elif name == "$project":
+                docs = [project(doc, arg) for doc in docs]
+            elif name == "$group":
+                docs = _group(docs, arg)
+            elif name == "$sortByCount":
+                docs = sorted(_group(docs, {"_id": arg, "count": {"$sum": 1}}), key=lambda doc: -doc["count"])
+            else:
+                raise NotImplementedError(name)
+        return FakeCursor(docs, None)
+
+
+def _evaluate(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        (op, arg), = expression.items()
+        if op == "$ifNull":
+            value = _evaluate(doc, arg[0])
+            return _evaluate(doc, arg[1]) if value is None else value
+        raise NotImplementedError(op)
+    return expression
+
+
+def _group(docs: list, spec: dict) -> list:
+    groups = {}
+    for doc in docs:
+        key = _evaluate(doc, spec["_id"])
+        group = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = accumulator.items()
+            if op != "$sum":
+                raise NotImplementedError(op)
+            group[field] = group.get(field, 0) + (_evaluate(doc, arg) or 0)
+    return list(groups.values())
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    for i in range(5):
+        asyncio.run(fake_db.beats.insert_one({
+            "id": f"b{i}", "title": f"Beat {i}", "producer_id": "p1", "genre": "Trap", "price": 10.0,
+            "plays": 10 * i, "purchases": 0, "description": "Liner notes", "version": 2,
+            "created_at": f"2025-01-0{i + 1}T00:00:00+00:00",
+        }))
+    return TestClient(server.app)
+
+
+def test_fetch_keeps_request_order_collapses_duplicates_and_lists_missing(client, fake_db, monkeypatch):
+    import server
+
+    queries = []
+    find = fake_db.beats.find
+
+    def recording_find(query, projection=None):
+        queries.append(query)
+        return find(query, projection)
+
+    monkeypatch.setattr(fake_db.beats, "find", recording_find)
+    beats, missing = asyncio.run(server.fetch_beats_by_ids(["b3", "gone", "b1", "b3", "b0", "gone"], {"_id": 0}))
+    assert [beat["id"] for beat in beats] == ["b3", "b1", "b0"]
+    assert missing == ["gone"]
+    assert queries == [{"id": {"$in": ["b3", "gone", "b1", "b0"]}}]
+
+
+def test_get_batch_returns_beats_in_request_order(client):
+    response = client.get("/api/beats/batch", params={"ids": "b4, b2,b2,nope,b0,"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [beat["id"] for beat in body["beats"]] == ["b4", "b2", "b0"]
+    assert body["count"] == 3 and body["missing"] == ["nope"]
+    assert "version" not in body["beats"][0]
+
+
+def test_post_batch_takes_ids_and_a_fieldset(client):
+    response = client.post("/api/beats/batch", json={"ids": ["b1", "b1", "b3", "x"], "fields": "title"})
+    assert response.status_code == 200
+    body = response.json()
+    # Plus the fields a listing cursor needs
+    assert [set(beat) for beat in body["beats"]] == [{"id", "title", "created_at"}] * 2
+    assert [beat["id"] for beat in body["beats"]] == ["b1", "b3"]
+    assert body["missing"] == ["x"]
+
+
+def test_batches_above_the_limit_are_rejected(client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "BEAT_BATCH_MAX_IDS", 3)
+    # Duplicates collapse before the limit applies
+    assert client.get("/api/beats/batch", params={"ids": "b0,b1,b2,b2,b0"}).status_code == 200
+    response = client.get("/api/beats/batch", params={"ids": "b0,b1,b2,b3"})
+    assert response.status_code == 400
+    assert "At most 3 ids" in response.json()["detail"]
+    assert client.post("/api/beats/batch", json={"ids": ["b0", "b1", "b2", "b3"]}).status_code == 400
+
+
+def test_batch_lookups_never_count_as_plays(client, fake_db):
+    import server
+
+    client.get("/api/beats/batch", params={"ids": "b1,b2"})
+    client.post("/api/beats/batch", json={"ids": ["b1", "b2"]})
+    assert server.play_buffer.pending("b1") == 0 and server.play_buffer.pending("b2") == 0
+    assert not server.trending_buffer._pending
+    assert [beat["plays"] for beat in fake_db.beats.docs] == [0, 10, 20, 30, 40]
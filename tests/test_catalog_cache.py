@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from cache import TaggedTTLCache
+
+PRODUCER = {"id": "p1", "email": "p@example.com", "name": "Mia", "user_type": "producer"}
+ARTIST = {"id": "a1", "email": "a@example.com", "name": "Ada", "user_type": "artist"}
+
+
+@pytest.fixture
+def client(fake_db, tmp_path, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "ROOT_DIR", tmp_path)
+    for user in (PRODUCER, ARTIST):
+        asyncio.run(fake_db.users.insert_one(dict(user)))
+    for i, genre in enumerate(["Trap", "Trap", "Pop", "Drill"]):
+        asyncio.run(fake_db.beats.insert_one({
+            "id": f"b{i}", "title": f"Beat {i}", "producer_id": "p1", "producer_name": "Mia", "genre": genre,
+            "bpm": 120, "key": "C", "description": "", "price": 10.0, "license_type": "non_exclusive", "tags": [],
+            "plays": 0, "purchases": 0, "created_at": f"2025-01-0{i + 1}T00:00:00+00:00",
+        }))
+    return TestClient(server.app)
+
+
+def auth(user: dict) -> dict:
+    import server
+
+    return {"Authorization": f"Bearer {server.create_access_token(user)}"}
+
+
+def listing(genre=None, sort_by="created_at", limit=50, cursor=None) -> tuple:
+    """The catalog_cache key list_beats stores a get_beats page under."""
+    return (genre, None, None, None, None, sort_by, limit, cursor, None)
+
+
+def cached(key) -> bool:
+    import server
+
+    return server.catalog_cache.peek(key) is not None
+
+
+def load(client, genre=None, sort_by="created_at", limit=50, cursor=None) -> dict:
+    params = {"genre": genre, "sort_by": sort_by, "limit": limit, "cursor": cursor}
+    page = client.get("/api/beats", params={key: value for key, value in params.items() if value}).json()
+    assert cached(listing(genre, sort_by, limit, cursor))
+    return page
+
+
+def form(genre: str) -> dict:
+    return {"title": "New", "genre": genre, "bpm": "90", "key": "A", "description": "Moved", "price": "5",
+            "license_type": "non_exclusive"}
+
+
+def test_create_drops_the_new_genre_and_unfiltered_pages_only(client):
+    for genre in (None, "Pop", "Trap"):
+        load(client, genre)
+
+    audio = {"audio_file": ("a.mp3", b"ID3")}
+    response = client.post("/api/beats", data=form("Pop"), files=audio, headers=auth(PRODUCER))
+    assert response.status_code == 200
+    assert not cached(listing()) and not cached(listing("Pop"))
+    assert cached(listing("Trap"))
+    assert len(load(client, "Pop")["beats"]) == 2
+
+
+def test_update_moving_genres_drops_pages_of_both_genres(client):
+    # b0 is on page two of Trap; page one and the Drill page never listed it
+    first = load(client, "Trap", limit=1)
+    load(client, "Trap", limit=1, cursor=first["next_cursor"])
+    load(client, "Pop")
+    load(client, "Drill")
+
+    response = client.put("/api/beats/b0", data=form("Pop"), headers=auth(PRODUCER))
+    assert response.status_code == 200
+    assert not cached(listing("Trap", limit=1)), "previous_genre pages must go even without the beat on them"
+    assert not cached(listing("Pop"))
+    assert cached(listing("Drill"))
+    assert [beat["id"] for beat in load(client, "Pop")["beats"]] == ["b2", "b0"]
+    assert [beat["id"] for beat in load(client, "Trap")["beats"]] == ["b1"]
+
+
+def test_delete_drops_only_pages_listing_the_beat(client):
+    first = load(client, "Trap", limit=1)
+    load(client, "Trap", limit=1, cursor=first["next_cursor"])
+    load(client, "Pop")
+
+    assert client.delete("/api/beats/b0", headers=auth(PRODUCER)).status_code == 200
+    assert not cached(listing("Trap", limit=1, cursor=first["next_cursor"]))
+    assert cached(listing("Trap", limit=1)) and cached(listing("Pop"))
+
+
+def test_purchase_drops_pages_sorted_by_purchases(client):
+    load(client, "Drill", sort_by="purchases")
+    load(client, "Drill")
+    load(client, "Pop")
+
+    response = client.post("/api/purchases", json={"beat_id": "b2", "payment_method": "pix"}, headers=auth(ARTIST))
+    assert response.status_code == 200
+    assert not cached(listing("Drill", sort_by="purchases")), "the beat may now rank onto a purchases page"
+    assert not cached(listing("Pop"))
+    assert cached(listing("Drill"))
+
+
+def test_prune_drops_expired_and_evicted_keys_from_the_tag_index():
+    cache = TaggedTTLCache(maxsize=4, ttl=0.05)
+    cache.set("expired", 1, ["beat:b1", "genre:Trap"])
+    time.sleep(0.06)
+    cache.set("evicted", 2, ["beat:b2"])
+    cache.set("kept", 3, ["beat:b2", "genre:Trap"])
+    assert cache._tagged["genre:Trap"] == {"expired", "kept"}
+    cache._cache.pop("evicted")
+
+    cache.set("new", 4, ["beat:b3"])  # maxsize sets since the last sweep prune
+    assert cache._tagged == {"beat:b2": {"kept"}, "genre:Trap": {"kept"}, "beat:b3": {"new"}}
+    cache.invalidate_tags("beat:b2")
+    assert cache.peek("kept") is None and cache.peek("new") == 4
+
+
+def test_warmup_caches_the_landing_page_and_the_largest_genres(client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "CATALOG_WARMUP_TOP_N", 1)
+    asyncio.run(server.warm_catalog_cache())
+    assert len(server.catalog_cache) == 2
+    assert cached(listing()) and cached(listing("Trap"))
+    assert server.catalog_cache.hits == 0
+
+    client.get("/api/beats", params={"genre": "Trap"})
+    assert server.catalog_cache.hits == 1
@@ -0,0 +1,161 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.testclient import TestClient
+
+import catalog_index
+from catalog_index import CatalogIndex
+from pagination import decode_cursor, encode_cursor, paginate
+from tests.fake_mongo import FakeDatabase
+
+BASE = datetime(2025, 1, 1)
+
+
+def random_catalog(seed: int, size: int) -> list:
+    rng = random.Random(seed)
+    beats = []
+    for i in range(size):
+        moment = BASE + timedelta(seconds=rng.randrange(0, 3600 * 24 * 30), microseconds=rng.randrange(10 ** 6))
+        kind = rng.random()
+        if kind < 0.6:
+            created_at = moment.isoformat() + "+00:00"  # API writes: UTC ISO string
+        elif kind < 0.9:
+            created_at = moment.replace(microsecond=moment.microsecond // 1000 * 1000)  # BSON date, ms precision
+        else:
+            created_at = None
+        beats.append({
+            # Ids share long prefixes, so ties are decided past the first 8 bytes
+            "id": f"beat-{rng.choice('ab')}{i:05d}",
+            "genre": rng.choice(["Trap", "Drill", "Lo-Fi"]),
+            "bpm": rng.choice([90, 120, 140]),
+            "price": rng.choice([9.99, 19.99, 29.99]),
+            "plays": rng.randrange(5),
+            "purchases": rng.randrange(3),
+            "created_at": created_at,
+        })
+    return beats
+
+
+def mongo_filter(genre=None, min_bpm=None, max_bpm=None, max_price=None) -> dict:
+    query = {}
+    if genre:
+        query["genre"] = genre
+    if min_bpm or max_bpm:
+        query["bpm"] = {**({"$gte": min_bpm} if min_bpm else {}), **({"$lte": max_bpm} if max_bpm else {})}
+    if max_price:
+        query["price"] = {"$lte": max_price}
+    return query
+
+
+def index_pages(index, sort_field, direction, limit, filters):
+    ids, cursors, cursor = [], [], None
+    while True:
+        page = index.query(sort_field, direction, limit + 1, **filters, after=decode_cursor(cursor) if cursor else None)
+        ids += page[:limit]
+        if len(page) <= limit:
+            return ids, cursors
+        cursor = encode_cursor({"id": page[limit - 1], sort_field: index.cursor_value(page[limit - 1], sort_field)}, sort_field)
+        cursors.append(cursor)
+
+
+def mongo_pages(collection, sort_field, direction, limit, filters):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = asyncio.run(paginate(collection, mongo_filter(**filters), sort_field, direction, limit, cursor))
+        ids += [doc["id"] for doc in docs]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    beats = random_catalog(11, 400)
+    db = FakeDatabase()
+    asyncio.run(db.beats.insert_many([dict(beat) for beat in beats]))
+    index = CatalogIndex()
+    for beat in beats:
+        index.upsert(beat)
+    return index, db.beats
+
+
+@pytest.mark.parametrize("sort_field", catalog_index.SORT_FIELDS)
+@pytest.mark.parametrize("direction", [-1, 1])
+@pytest.mark.parametrize("filters", [{}, {"genre": "Trap"}, {"min_bpm": 100, "max_price": 20}])
+def test_pages_and_cursors_match_the_mongo_path(catalog, sort_field, direction, filters):
+    index, collection = catalog
+    limit = 37
+    ids, cursors = index_pages(index, sort_field, direction, limit, filters)
+    assert ids == mongo_pages(collection, sort_field, direction, limit, filters)
+
+    # A cursor minted by the index continues identically on the Mongo path
+    cursor = cursors[len(cursors) // 2]
+    docs, _ = asyncio.run(paginate(collection, mongo_filter(**filters), sort_field, direction, limit, cursor))
+    after = index.query(sort_field, direction, limit, **filters, after=decode_cursor(cursor))
+    assert [doc["id"] for doc in docs] == after
+
+
+def test_ties_are_broken_by_the_full_id():
+    index = CatalogIndex()
+    for beat_id in ["samepref-c", "samepref-a", "samepref-b", "other"]:
+        index.upsert({"id": beat_id, "plays": 1 if beat_id != "other" else 2})
+    assert index.query("plays", -1, 10) == ["other", "samepref-c", "samepref-b", "samepref-a"]
+    assert index.query("plays", 1, 10) == ["samepref-a", "samepref-b", "samepref-c", "other"]
+    assert index.query("plays", -1, 2, after=(1, "samepref-c")) == ["samepref-b", "samepref-a"]
+
+
+def test_cursor_values_are_stored_values():
+    index = CatalogIndex()
+    index.upsert({"id": "s", "created_at": "2025-03-01T10:00:00.123456+00:00", "price": 19.99})
+    index.upsert({"id": "d", "created_at": datetime(2025, 3, 1, 10, 0, 0, 123000)})
+    index.upsert({"id": "n", "created_at": None})
+    assert index.cursor_value("s", "created_at") == "2025-03-01T10:00:00.123456+00:00"
+    assert index.cursor_value("d", "created_at").replace(tzinfo=None) == datetime(2025, 3, 1, 10, 0, 0, 123000)
+    assert index.cursor_value("n", "created_at") is None
+    assert index.cursor_value("s", "price") == 19.99
+    # Mongo order: null < strings < dates, whatever the instants
+    assert index.query("created_at", -1, 3) == ["d", "s", "n"]
+
+
+@pytest.fixture
+def server_index(fake_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "beat_columns", CatalogIndex())
+    for beat in random_catalog(5, 60):
+        asyncio.run(fake_db.beats.insert_one({**beat, "title": beat["id"], "producer_id": "p1"}))
+    asyncio.run(server.build_catalog_index())
+    return server
+
+
+def test_plays_do_not_reorder_pages_until_the_next_load(server_index, fake_db):
+    server = server_index
+    client = TestClient(server.app)
+    params = {"sort_by": "plays", "limit": 10, "fields": "title"}
+    before = [beat["id"] for beat in client.get("/api/beats", params=params).json()["beats"]]
+
+    last = before[-1]
+    for i in range(20):
+        client.post(f"/api/beats/{last}/play", headers={"User-Agent": f"listener-{i}"})
+    server.catalog_cache.clear()
+    assert [beat["id"] for beat in client.get("/api/beats", params=params).json()["beats"]] == before
+
+    # Once the plays are flushed and the index reloaded, both paths agree again
+    asyncio.run(server.play_buffer.flush())
+    asyncio.run(server.build_catalog_index())
+    server.catalog_cache.clear()
+    indexed = client.get("/api/beats", params=params).json()["beats"]
+    assert indexed[0]["id"] == last
+    server.beat_columns.ready = False
+    server.catalog_cache.clear()
+    assert client.get("/api/beats", params=params).json()["beats"] == indexed
+
+
+def test_reload_drops_beats_deleted_by_other_workers(server_index, fake_db):
+    server = server_index
+    asyncio.run(fake_db.beats.delete_one({"id": server.beat_columns.ids()[0]}))
+    removed = set(server.beat_columns.ids()) - {doc["id"] for doc in fake_db.beats.docs}
+    asyncio.run(server.build_catalog_index())
+    assert len(server.beat_columns) == 59
+    assert not removed & set(server.beat_columns.ids())
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from cache import StatsBytesTTLCache
+
+GZIP = {"Accept-Encoding": "gzip"}
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    asyncio.run(fake_db.beats.insert_one({
+        "id": "b1", "title": "Beat", "producer_id": "p1", "producer_name": "Mia", "genre": "Trap", "bpm": 120,
+        "price": 10.0, "plays": 1, "purchases": 0, "description": "Long liner notes. " * 200,
+        "created_at": "2025-01-01T00:00:00+00:00",
+    }))
+    return TestClient(server.app)
+
+
+def test_vary_is_sent_whether_or_not_the_body_is_compressed(client):
+    plain = client.get("/api/beats/b1", headers=IDENTITY)
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    small = client.get("/api/beats", params={"fields": "title", "limit": 1}, headers=IDENTITY)
+    assert small.headers["vary"] == "Accept-Encoding"
+
+    revalidated = client.get("/api/beats/b1", headers={**IDENTITY, "If-None-Match": plain.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["vary"] == "Accept-Encoding"
+
+
+def test_compressed_representation_revalidates_with_its_own_etag(client):
+    plain_etag = client.get("/api/beats/b1", headers=IDENTITY).headers["etag"]
+    compressed = client.get("/api/beats/b1", headers=GZIP)
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] == plain_etag[:-1] + '-gzip"'
+
+    revalidated = client.get("/api/beats/b1", headers={**GZIP, "If-None-Match": compressed.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == compressed.headers["etag"]
+
+
+def test_cached_compressed_bodies_follow_body_changes(client, fake_db):
+    import server
+
+    first = client.get("/api/beats/b1", headers=GZIP)
+    again = client.get("/api/beats/b1", headers=GZIP)
+    assert again.headers["etag"] == first.headers["etag"]
+    assert server.compressed_responses.hits == 1
+
+    # A play, then a trending write: each is a new body, never a cached old one
+    client.post("/api/beats/b1/play")
+    after_play = client.get("/api/beats/b1", headers={**GZIP, "If-None-Match": first.headers["etag"]})
+    assert after_play.status_code == 200
+    assert after_play.json()["plays"] == 2
+    asyncio.run(fake_db.beats.update_one({"id": "b1"}, {"$set": {"trending": 3.0}}))
+    server.catalog_cache.clear()  # the rendered page expires after CATALOG_CACHE_TTL_SECONDS
+    after_trending = client.get("/api/beats/b1", headers=GZIP)
+    assert after_trending.json()["trending"] == 3.0
+    assert len({first.headers["etag"], after_play.headers["etag"], after_trending.headers["etag"]}) == 3
+
+
+def test_compressed_body_cache_expires_and_stays_within_its_byte_bound():
+    cache = StatsBytesTTLCache(max_bytes=100, ttl=0.05)
+    cache.set("a", b"x" * 60)
+    cache.set("b", b"y" * 60)  # evicts "a" to stay under 100 bytes
+    cache.set("huge", b"z" * 101)
+    assert cache.peek("a") is None and cache.peek("huge") is None
+    assert cache.get("b") == b"y" * 60
+    time.sleep(0.06)
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    asyncio.run(fake_db.users.insert_one({
+        "id": "p1", "email": "p@example.com", "name": "Mia", "user_type": "producer",
+        "password": "hash", "version": 3, "created_at": "2025-01-01T00:00:00+00:00",
+    }))
+    for i in range(3):
+        asyncio.run(fake_db.beats.insert_one({
+            "id": f"b{i}", "title": f"Beat {i}", "producer_id": "p1", "producer_name": "Mia", "genre": "Trap",
+            "bpm": 120, "price": 10.0, "plays": i, "purchases": 0, "version": 7,
+            "created_at": f"2025-01-0{i + 1}T00:00:00+00:00",
+        }))
+    return TestClient(server.app)
+
+
+def test_catalog_revalidates_with_304(client):
+    first = client.get("/api/beats")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, no-cache"
+
+    again = client.get("/api/beats", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert client.get("/api/beats", params={"genre": "Pop"}, headers={"If-None-Match": etag}).status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/api/beats", "/api/beats/b1", "/api/users/p1", "/api/users/producers"])
+def test_bookkeeping_fields_are_not_returned(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert '"version"' not in response.text
+    assert '"password"' not in response.text
+
+
+def test_etags_change_with_any_field_of_the_body(client, fake_db):
+    import server
+
+    etag = client.get("/api/beats/b1").headers["etag"]
+    assert client.get("/api/beats/b1", headers={"If-None-Match": etag}).status_code == 304
+
+    # Plays show up in the body at once, flushed counters and trending writes once the rendered page expires
+    client.post("/api/beats/b1/play")
+    response = client.get("/api/beats/b1", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()["plays"] == 2
+    etag = response.headers["etag"]
+    asyncio.run(fake_db.beats.update_one({"id": "b1"}, {"$set": {"trending": 4.2}}))
+    assert client.get("/api/beats/b1", headers={"If-None-Match": etag}).status_code == 304
+    server.catalog_cache.clear()
+    assert client.get("/api/beats/b1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_revalidations_skip_mongo_and_serialization(client, fake_db, monkeypatch):
+    import server
+
+    paths = ["/api/beats", "/api/beats/b1", "/api/users/p1", "/api/users/producers"]
+    etags = [client.get(path).headers["etag"] for path in paths]
+
+    def unreachable(*args, **kwargs):
+        raise AssertionError("a revalidation read Mongo or rendered a body")
+
+    monkeypatch.setattr(server, "render", unreachable)
+    for collection in (fake_db.beats, fake_db.users, fake_db.producer_stats):
+        monkeypatch.setattr(collection, "find", unreachable)
+        monkeypatch.setattr(collection, "find_one", unreachable)
+    for path, etag in zip(paths, etags):
+        response = client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 304 and response.headers["etag"] == etag
+
+
+def test_user_etag_follows_profile_writes(client):
+    import server
+
+    token = server.create_access_token({"id": "p1", "email": "p@example.com", "user_type": "producer"})
+    user_etag = client.get("/api/users/p1").headers["etag"]
+    assert client.get("/api/users/p1", headers={"If-None-Match": user_etag}).status_code == 304
+    assert client.get("/api/users/p2", headers={"If-None-Match": user_etag}).status_code == 404
+
+    client.put("/api/auth/profile", params={"bio": "New bio"}, headers={"Authorization": f"Bearer {token}"})
+    response = client.get("/api/users/p1", headers={"If-None-Match": user_etag})
+    assert response.status_code == 200 and response.json()["bio"] == "New bio"
+    assert response.headers["etag"] != user_etag
+    producers = client.get("/api/users/producers").json()["producers"]
+    assert producers[0]["bio"] == "New bio"
+
+
+def test_catalog_etag_changes_when_counters_change(client, fake_db):
+    import server
+
+    etag = client.get("/api/beats", params={"sort_by": "plays"}).headers["etag"]
+    asyncio.run(fake_db.beats.update_one({"id": "b0"}, {"$inc": {"plays": 5}}))
+    # Flushed play counts reach listings once the cached page expires (CATALOG_CACHE_TTL_SECONDS)
+    assert client.get("/api/beats", params={"sort_by": "plays"}, headers={"If-None-Match": etag}).status_code == 304
+    server.catalog_cache.clear()
+    response = client.get("/api/beats", params={"sort_by": "plays"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b0", "b2", "b1"]
+
+
+def test_versions_are_read_from_mongo_at_most_once_per_interval(client, fake_db, monkeypatch):
+    import server
+
+    reads = []
+    original_find = fake_db.collection_versions.find
+
+    def find(query=None, projection=None):
+        reads.append(query)
+        return original_find(query, projection)
+
+    monkeypatch.setattr(fake_db.collection_versions, "find", find)
+    monkeypatch.setattr(server, "VERSION_SYNC_SECONDS", 60)
+    for _ in range(5):
+        assert client.get("/api/beats").status_code == 200
+    assert len(reads) == 1
+
+    # Once the interval has passed the next request re-reads, sees another worker's write and drops cached listings
+    server.catalog_cache.set("stale", {"beats": []}, set())
+    asyncio.run(fake_db.collection_versions.update_one({"_id": "beats"}, {"$inc": {"version": 1}}, upsert=True))
+    monkeypatch.setattr(server, "VERSION_SYNC_SECONDS", 0)
+    assert client.get("/api/beats").status_code == 200
+    assert len(reads) == 2
+    assert server.collection_versions["beats"] == 1
+    assert server.catalog_cache.peek("stale") is None
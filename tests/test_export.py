@@ -0,0 +1,55 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    purchases = [
+        # API writes store ISO strings; seeded and legacy purchases are BSON dates (naive UTC)
+        ("s1", "2025-02-27T23:00:00+00:00"),
+        ("d1", datetime(2025, 3, 1, 9, 0)),
+        ("s2", "2025-03-02T10:00:00+00:00"),
+        ("d2", datetime(2025, 3, 3, 8, 0)),
+        ("s3", "2025-03-05T00:00:00+00:00"),
+        ("d3", datetime(2025, 3, 9)),
+    ]
+    for purchase_id, created_at in purchases:
+        asyncio.run(fake_db.purchases.insert_one({
+            "id": purchase_id, "created_at": created_at, "beat_id": "b1", "beat_title": "Dark",
+            "buyer_id": "a1", "buyer_name": "Ari", "producer_id": "p1", "amount": 10.0,
+            "license_type": "basic", "payment_method": "stripe", "payment_status": "completed",
+        }))
+    token = server.create_access_token({"id": "p1", "email": "p1@example.com", "user_type": "producer"})
+    return TestClient(server.app, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_range_matches_string_and_date_created_at(client):
+    response = client.get("/api/purchases/my-sales/export", params={
+        "format": "ndjson", "start": "2025-03-01T00:00:00Z", "end": "2025-03-05T00:00:00Z"
+    })
+    assert response.status_code == 200
+    *rows, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ["d1", "s2", "d2"]
+    assert rows[0]["created_at"] == "2025-03-01T09:00:00+00:00"
+    assert summary == {"summary": {"count": 3, "total_amount": 30.0}}
+
+
+def test_export_interleaves_both_representations_oldest_first(client):
+    response = client.get("/api/purchases/my-sales/export", params={"format": "csv"})
+    ids = [line.split(",")[0] for line in response.text.splitlines()[1:-1]]
+    assert ids == ["s1", "d1", "s2", "d2", "s3", "d3"]
+
+
+def test_range_queries_bound_each_representation():
+    import server
+
+    start = datetime(2025, 3, 1, 1, 0, tzinfo=timezone.utc)
+    string_query, date_query = server.export_range_queries({"buyer_id": "a1"}, start, None)
+    assert string_query == {"buyer_id": "a1", "created_at": {"$type": "string", "$gte": "2025-03-01T01:00:00+00:00"}}
+    assert date_query == {"buyer_id": "a1", "created_at": {"$type": "date", "$gte": start}}
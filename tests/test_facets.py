@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+FACET_RESULT = [{
+    "genre": [{"_id": "Trap", "count": 3}],
+    "bpm": [{"_id": 120, "count": 3}],
+    "price": [{"_id": 0, "count": 3}],
+    "license_type": [{"_id": "basic", "count": 3}],
+    "total": [{"count": 3}],
+}]
+
+
+class AggregateRecorder:
+    def __init__(self):
+        self.pipelines = []
+
+    def __call__(self, pipeline):
+        self.pipelines.append(pipeline)
+        recorder = self
+
+        class Cursor:
+            async def to_list(self, length):
+                return [dict(FACET_RESULT[0], total=[{"count": len(recorder.pipelines)}])]
+        return Cursor()
+
+
+@pytest.fixture
+def aggregate(fake_db, monkeypatch):
+    recorder = AggregateRecorder()
+    monkeypatch.setattr(fake_db.beats, "aggregate", recorder)
+    return recorder
+
+
+def test_unfiltered_facets_never_scan_on_the_request_path(fake_db, aggregate):
+    import server
+
+    client = TestClient(server.app)
+    first = client.get("/api/beats/facets").json()
+    assert first["genre"] == [{"value": "Trap", "count": 3}]
+    assert first["bpm"] == [{"min": 120, "max": 140, "count": 3}]
+
+    # Writes drop filtered results but leave the materialized unfiltered counts alone
+    started = time.perf_counter()
+    for _ in range(200):
+        server.invalidate_catalog({"id": "b1", "genre": "Trap"})
+        assert client.get("/api/beats/facets").json()["total"] == 1
+    per_request_ms = (time.perf_counter() - started) / 200 * 1000
+    print(f"unfiltered facets: {len(aggregate.pipelines)} aggregation for 200 requests interleaved with writes, "
+          f"{per_request_ms:.2f}ms per request in process")
+    assert len(aggregate.pipelines) == 1
+    assert aggregate.pipelines[0][0] == {"$match": {}}
+
+
+def test_background_refresh_replaces_the_unfiltered_counts(fake_db, aggregate, monkeypatch):
+    import server
+
+    async def scenario():
+        monkeypatch.setattr(server, "FACET_REFRESH_SECONDS", 0.01)
+        task = asyncio.create_task(server.refresh_unfiltered_facets_periodically())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert len(aggregate.pipelines) > 1
+    assert server.unfiltered_facets["counts"]["total"] == len(aggregate.pipelines)
+
+
+def test_filtered_facets_are_cached_per_filter_and_dropped_on_writes(fake_db, aggregate):
+    import server
+
+    client = TestClient(server.app)
+    for _ in range(3):
+        client.get("/api/beats/facets", params={"genre": "Trap"})
+    assert len(aggregate.pipelines) == 1
+    assert aggregate.pipelines[0][0] == {"$match": {"genre": "Trap"}}
+
+    server.invalidate_catalog({"id": "b1", "genre": "Trap"})
+    client.get("/api/beats/facets", params={"genre": "Trap"})
+    assert len(aggregate.pipelines) == 2
+
+
+def test_metrics_require_an_admin(fake_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"ops@example.com"})
+    client = TestClient(server.app)
+    artist = server.create_access_token({"id": "u1", "email": "a@example.com", "user_type": "artist"})
+    admin = server.create_access_token({"id": "u2", "email": "Ops@Example.com", "user_type": "producer"})
+
+    assert client.get("/api/stats/metrics").status_code == 403
+    response = client.get("/api/stats/metrics", headers={"Authorization": f"Bearer {artist}"})
+    assert response.status_code == 403
+    response = client.get("/api/stats/metrics", headers={"Authorization": f"Bearer {admin}"})
+    assert response.status_code == 200
+    assert "password_hashing" in response.json()
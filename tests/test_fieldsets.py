@@ -0,0 +1,83 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+from starlette.testclient import TestClient
+
+
+def beat(i: int) -> dict:
+    return {
+        "id": f"b{i:03d}", "title": f"Beat {i}", "producer_id": "p1", "producer_name": "Mia",
+        "genre": "Trap", "bpm": 140, "key": "Am", "description": "Long liner notes. " * 60,
+        "price": 29.99, "license_type": "non_exclusive", "audio_url": f"/api/uploads/beats/{i}.mp3",
+        # Legacy documents carry inline base64 covers
+        "cover_url": "data:image/png;base64," + "A" * 8000 if i % 5 == 0 else f"/api/uploads/covers/{i}.png",
+        "tags": ["dark", "808"], "plays": i, "purchases": 0,
+        "created_at": (datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)).isoformat(),
+    }
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    for i in range(60):
+        asyncio.run(fake_db.beats.insert_one(beat(i)))
+    return TestClient(server.app)
+
+
+def test_explicit_fields_always_carry_id_and_sort_value(client):
+    response = client.get("/api/beats", params={"fields": "title,price", "sort_by": "plays", "limit": 2})
+    assert response.status_code == 200
+    beats = response.json()["beats"]
+    assert [set(b) for b in beats] == [{"id", "title", "price", "plays"}] * 2
+
+    # The cursor built from the sparse page still pages correctly
+    next_page = client.get("/api/beats", params={
+        "fields": "title,price", "sort_by": "plays", "limit": 2, "cursor": response.json()["next_cursor"]
+    }).json()["beats"]
+    assert [b["plays"] for b in beats + next_page] == [59, 58, 57, 56]
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get("/api/beats", params={"fields": "title,password"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: password"
+
+
+def test_card_projection_drops_description_and_inline_covers():
+    import server
+
+    projection = server.beat_projection("card")
+    assert "description" not in projection
+    cover = projection["cover_url"]["$cond"]
+    assert cover[0] == {"$eq": [{"$substrCP": [{"$ifNull": ["$cover_url", ""]}, 0, 5]}, "data:"]}
+
+
+def card_view(doc: dict) -> dict:
+    """Apply BEAT_CARD_PROJECTION the way Mongo evaluates it."""
+    import server
+
+    card = {field: doc[field] for field in server.BEAT_CARD_PROJECTION if field in doc and field != "cover_url"}
+    card["cover_url"] = None if doc["cover_url"].startswith("data:") else doc["cover_url"]
+    return card
+
+
+def test_benchmark_card_page_payload():
+    """Micro-benchmark: a card page must be much smaller and cheaper to serialize than full documents."""
+    full = [beat(i) for i in range(50)]
+    cards = [card_view(doc) for doc in full]
+
+    def serialize(page):
+        started = time.perf_counter()
+        for _ in range(200):
+            body = orjson.dumps({"beats": page})
+        return len(body), (time.perf_counter() - started) / 200 * 1e6
+
+    full_bytes, full_us = serialize(full)
+    card_bytes, card_us = serialize(cards)
+    print(f"50-beat page: full {full_bytes} bytes / {full_us:.0f}us, card {card_bytes} bytes / {card_us:.0f}us")
+    assert card_bytes * 5 < full_bytes
+    assert card_us < full_us
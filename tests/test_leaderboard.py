@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from starlette.testclient import TestClient
+
+# producer -> (sales today, 10 days ago, 100 days ago); all-time totals add them up
+SALES = {"p1": (2, 0, 9), "p2": (2, 3, 0), "p3": (1, 5, 0)}
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    today = datetime.now(timezone.utc).date()
+    for producer_id, sales in SALES.items():
+        asyncio.run(fake_db.users.insert_one({"id": producer_id, "name": producer_id.upper(), "user_type": "producer"}))
+        asyncio.run(fake_db.producer_stats.insert_one({
+            "producer_id": producer_id, "total_sales": sum(sales), "total_revenue": sum(sales) * 10.0, "total_plays": 7,
+        }))
+        for days_ago, count in zip((0, 10, 100), sales):
+            asyncio.run(fake_db.producer_daily_stats.insert_one({
+                "producer_id": producer_id, "day": (today - timedelta(days=days_ago)).isoformat(),
+                "sales": count, "revenue": count * 10.0, "plays": 1,
+            }))
+    return TestClient(server.app)
+
+
+def ranking(client, window, **params):
+    response = client.get("/api/users/producers/leaderboard", params={"window": window, **params})
+    assert response.status_code == 200
+    return [(producer["id"], producer["sales"]) for producer in response.json()["producers"]]
+
+
+def test_each_window_counts_only_its_days(client):
+    # p1 and p2 tie over 7 days with equal revenue
+    assert ranking(client, "7d") == [("p2", 2), ("p1", 2), ("p3", 1)]
+    assert ranking(client, "30d") == [("p3", 6), ("p2", 5), ("p1", 2)]
+    assert ranking(client, "all") == [("p1", 11), ("p3", 6), ("p2", 5)]
+    assert ranking(client, "30d", limit=1) == [("p3", 6)]
+
+
+def test_ties_break_on_producer_id_the_same_way_in_every_window(client, fake_db):
+    asyncio.run(fake_db.producer_stats.update_one({"producer_id": "p2"}, {"$set": {"total_sales": 11}}))
+    asyncio.run(fake_db.producer_daily_stats.insert_one({
+        "producer_id": "p1", "day": datetime.now(timezone.utc).date().isoformat(),
+        "sales": 3, "revenue": 30.0, "plays": 0,
+    }))
+    # p1 and p2 now tie on sales and revenue in every window
+    assert ranking(client, "7d") == [("p1", 5), ("p2", 2), ("p3", 1)]
+    assert ranking(client, "30d") == [("p3", 6), ("p2", 5), ("p1", 5)]
+    assert ranking(client, "all") == [("p2", 11), ("p1", 11), ("p3", 6)]
+
+
+def test_rankings_are_cached_per_window(client, fake_db, monkeypatch):
+    reads = []
+    for collection, method in ((fake_db.producer_daily_stats, "aggregate"), (fake_db.producer_stats, "find")):
+        def recording(*args, original=getattr(collection, method), name=collection.name, **kwargs):
+            reads.append(name)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(collection, method, recording)
+
+    assert ranking(client, "7d")[0] == ("p2", 2)
+    assert ranking(client, "all")[0] == ("p1", 11)
+    assert reads == ["producer_daily_stats", "producer_stats"]
+    # A different limit slices the cached ranking
+    assert ranking(client, "7d", limit=2) == [("p2", 2), ("p1", 2)]
+    assert ranking(client, "all", limit=1) == [("p1", 11)]
+    assert len(reads) == 2
+
+    asyncio.run(fake_db.producer_daily_stats.insert_one({
+        "producer_id": "p3", "day": datetime.now(timezone.utc).date().isoformat(),
+        "sales": 4, "revenue": 0.0, "plays": 0,
+    }))
+    # 30d was never asked for, so it is computed fresh; 7d keeps its cached ranking until the TTL
+    assert ranking(client, "30d")[0] == ("p3", 10)
+    assert ranking(client, "7d")[0] == ("p2", 2)
+    assert len(reads) == 3
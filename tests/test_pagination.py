@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor, keyset_filter, paginate
+from tests.fake_mongo import FakeDatabase, compare
+
+
+def page_through(collection, sort_field, direction, limit, query=None):
+    async def scenario():
+        seen, cursor, pages = [], None, 0
+        while True:
+            docs, cursor = await paginate(collection, query or {}, sort_field, direction, limit, cursor)
+            seen += [doc["id"] for doc in docs]
+            pages += 1
+            if cursor is None:
+                return seen, pages
+    return asyncio.run(scenario())
+
+
+def expected_order(docs, sort_field, direction):
+    import functools
+
+    def cmp(a, b):
+        return (compare(a.get(sort_field), b.get(sort_field)) or compare(a["id"], b["id"])) * direction
+    return [doc["id"] for doc in sorted(docs, key=functools.cmp_to_key(cmp))]
+
+
+@pytest.fixture
+def mixed_purchases():
+    """created_at as API-written ISO strings, seeded BSON dates, and a few missing."""
+    db = FakeDatabase()
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(7):
+        docs.append({"id": f"s{i}", "created_at": (base + timedelta(days=i)).isoformat()})
+        docs.append({"id": f"d{i}", "created_at": (base + timedelta(days=i, hours=1)).replace(tzinfo=None)})
+    docs += [{"id": "n0"}, {"id": "n1", "created_at": None}]
+    # Duplicate sort values exercise the id tiebreak
+    docs.append({"id": "s9", "created_at": docs[0]["created_at"]})
+    for doc in docs:
+        asyncio.run(db.purchases.insert_one(doc))
+    return db.purchases, docs
+
+
+@pytest.mark.parametrize("direction", [-1, 1])
+@pytest.mark.parametrize("limit", [1, 2, 3, 50])
+def test_paging_crosses_type_boundaries(mixed_purchases, direction, limit):
+    collection, docs = mixed_purchases
+    seen, _ = page_through(collection, "created_at", direction, limit)
+    assert seen == expected_order(docs, "created_at", direction)
+    assert len(seen) == len(docs)
+
+
+def test_numeric_paging_with_ties():
+    db = FakeDatabase()
+    docs = [{"id": f"b{i:02d}", "plays": i % 4} for i in range(20)]
+    for doc in docs:
+        asyncio.run(db.beats.insert_one(doc))
+
+    seen, pages = page_through(db.beats, "plays", -1, 3, query={"plays": {"$gte": 1}})
+    assert seen == expected_order([d for d in docs if d["plays"] >= 1], "plays", -1)
+    assert pages == 5
+
+
+def test_cursor_round_trip_keeps_datetimes():
+    when = datetime(2025, 3, 1, 12, 30)
+    cursor = encode_cursor({"id": "x", "created_at": when}, "created_at")
+    assert decode_cursor(cursor) == (when, "x")
+
+
+def test_keyset_filter_names_every_later_type():
+    cursor = encode_cursor({"id": "x", "created_at": "2025-01-01"}, "created_at")
+    assert keyset_filter("created_at", -1, cursor) == {"$or": [
+        {"created_at": "2025-01-01", "id": {"$lt": "x"}},
+        {"created_at": {"$lt": "2025-01-01"}},
+        {"created_at": None},
+        {"created_at": {"$type": ["number"]}},
+    ]}
+    assert keyset_filter("created_at", 1, cursor)["$or"][-1] == {"created_at": {"$type": ["date"]}}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor({"id": 5, "x": 1}, "x"),
+                                    encode_cursor({"id": "a", "x": [1]}, "x")])
+def test_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        keyset_filter("x", 1, cursor)
+    assert raised.value.status_code == 400
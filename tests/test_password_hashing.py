@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import bcrypt
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.testclient import TestClient
+
+from password_hashing import PasswordHasher, PasswordHasherBusy
+
+FAST_SALT = bcrypt.gensalt(rounds=4)
+
+
+def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher(max_workers=2, max_queue=2)
+
+    async def scenario():
+        hashed = await hasher.hash("s3cret")
+        return await hasher.verify("s3cret", hashed), await hasher.verify("wrong", hashed)
+
+    assert asyncio.run(scenario()) == (True, False)
+    assert hasher.stats()["completed"] == 3
+    hasher.shutdown()
+
+
+def test_saturated_pool_rejects_immediately():
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=10)).decode()
+
+    async def scenario():
+        running = [asyncio.create_task(hasher.verify("pw", hashed)) for _ in range(2)]
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.verify("pw", hashed)
+        rejected_in = time.perf_counter() - started
+        assert all(await asyncio.gather(*running))
+        return rejected_in
+
+    # Rejection must not wait behind the bcrypt work already queued
+    assert asyncio.run(scenario()) < 0.01
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["in_flight"] == 0
+    hasher.shutdown()
+
+
+def test_server_maps_saturation_to_503(monkeypatch):
+    import server
+
+    hasher = PasswordHasher(max_workers=1, max_queue=0)
+    hasher._in_flight = 1
+    monkeypatch.setattr(server, "password_hasher", hasher)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(server.hash_password("pw"))
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "1"}
+
+
+def test_login_returns_503_when_pool_is_full(fake_db, monkeypatch):
+    import server
+
+    asyncio.run(fake_db.users.insert_one({
+        "id": "u1", "email": "a@example.com", "name": "A", "user_type": "artist",
+        "password": bcrypt.hashpw(b"pw", FAST_SALT).decode(),
+    }))
+    hasher = PasswordHasher(max_workers=1, max_queue=0)
+    hasher._in_flight = 1
+    monkeypatch.setattr(server, "password_hasher", hasher)
+
+    response = TestClient(server.app).post("/api/auth/login", json={"email": "a@example.com", "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_benchmark_event_loop_stays_responsive_during_hashing():
+    """Micro-benchmark: concurrent bcrypt work must not stall the event loop."""
+    hasher = PasswordHasher(max_workers=4, max_queue=16)
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=11)).decode()
+    started = time.perf_counter()
+    bcrypt.checkpw(b"pw", hashed.encode())
+    inline = time.perf_counter() - started
+
+    async def scenario():
+        gaps = []
+
+        async def ticker(stop):
+            last = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        stop = asyncio.Event()
+        tick = asyncio.create_task(ticker(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(hasher.verify("pw", hashed) for _ in range(8)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await tick
+        return elapsed, max(gaps)
+
+    elapsed, worst_gap = asyncio.run(scenario())
+    print(f"8 bcrypt verifies in {elapsed * 1000:.1f}ms, worst event-loop stall {worst_gap * 1000:.2f}ms "
+          f"(one inline verify blocks for {inline * 1000:.1f}ms)")
+    # Inline bcrypt would stall the loop for a whole verify at least once
+    assert worst_gap < inline / 3
+    hasher.shutdown()
+
+
+def test_benchmark_login_storm_keeps_catalog_latency(fake_db):
+    """Benchmark: catalog p99 while 50 logins hash concurrently, driven through the ASGI app."""
+    import server
+
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=8)).decode()
+    asyncio.run(fake_db.users.insert_one({
+        "id": "u1", "email": "a@example.com", "name": "A", "user_type": "artist", "password": hashed,
+    }))
+    for i in range(20):
+        asyncio.run(fake_db.beats.insert_one({"id": f"b{i}", "title": f"Beat {i}", "genre": f"G{i % 4}", "plays": i,
+                                              "created_at": f"2025-01-{i + 1:02d}T00:00:00+00:00"}))
+    started = time.perf_counter()
+    bcrypt.checkpw(b"pw", hashed.encode())
+    inline = time.perf_counter() - started
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            latencies = []
+
+            async def timed_catalog(genre):
+                started = time.perf_counter()
+                response = await client.get("/api/beats", params={"genre": genre})
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+            logins = asyncio.gather(*(
+                client.post("/api/auth/login", json={"email": "a@example.com", "password": "pw"}) for _ in range(50)
+            ))
+            logins = asyncio.ensure_future(logins)
+            round_number = 0
+            while not logins.done():
+                await asyncio.gather(*(timed_catalog(f"G{(round_number + i) % 4}") for i in range(10)))
+                round_number += 1
+            return [response.status_code for response in await logins], sorted(latencies)
+
+    started = time.perf_counter()
+    statuses, latencies = asyncio.run(scenario())
+    elapsed = time.perf_counter() - started
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"50 concurrent logins in {elapsed * 1000:.0f}ms alongside {len(latencies)} /api/beats requests: "
+          f"p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms (one inline bcrypt verify: {inline * 1000:.1f}ms)")
+    assert statuses == [200] * 50
+    # Hashing inline would hold every catalog request behind whole verifies
+    assert p99 < inline
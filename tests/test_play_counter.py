@@ -0,0 +1,207 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from pymongo.errors import BulkWriteError
+
+from play_counter import DailyPlayRollupBuffer, ListenerSketchBuffer, PlayCountBuffer
+from tests.fake_mongo import FakeDatabase
+
+
+class CountingCollection:
+    """Wraps a fake collection and records every bulk_write."""
+
+    def __init__(self, collection, fail_with=None):
+        self.collection = collection
+        self.name = collection.name
+        self.batches = []
+        self.fail_with = fail_with
+
+    async def bulk_write(self, requests, ordered=True):
+        self.batches.append(requests)
+        await asyncio.sleep(0)  # a round trip: other coroutines run meanwhile
+        if self.fail_with is not None:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        return await self.collection.bulk_write(requests, ordered=ordered)
+
+
+def test_plays_are_summed_per_beat_and_flushed_in_one_bulk_write():
+    db = FakeDatabase()
+    for beat_id in ("b1", "b2"):
+        asyncio.run(db.beats.insert_one({"id": beat_id, "plays": 10}))
+    collection = CountingCollection(db.beats)
+    buffer = PlayCountBuffer(collection, flush_interval=60, max_keys=100)
+
+    for _ in range(3):
+        buffer.record("b1")
+    buffer.record("b2", 5)
+    assert buffer.pending("b1") == 3
+
+    asyncio.run(buffer.flush())
+    assert len(collection.batches) == 1 and len(collection.batches[0]) == 2
+    assert {doc["id"]: doc["plays"] for doc in db.beats.docs} == {"b1": 13, "b2": 15}
+    assert buffer.pending("b1") == 0
+    assert buffer.stats()["flushed_keys"] == 2
+
+    asyncio.run(buffer.flush())  # nothing pending, nothing written
+    assert len(collection.batches) == 1
+
+
+def test_failed_flush_is_retried_on_the_next_one():
+    db = FakeDatabase()
+    asyncio.run(db.beats.insert_one({"id": "b1", "plays": 0}))
+    collection = CountingCollection(db.beats, fail_with=ConnectionError("primary stepped down"))
+    buffer = PlayCountBuffer(collection, flush_interval=60, max_keys=100)
+
+    buffer.record("b1", 2)
+    asyncio.run(buffer.flush())
+    buffer.record("b1", 1)
+    asyncio.run(buffer.flush())
+
+    assert db.beats.docs[0]["plays"] == 3
+    assert buffer.stats()["flushes"] == 1
+
+
+def test_partial_failure_requeues_only_failed_keys():
+    db = FakeDatabase()
+    error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "boom"}]})
+    buffer = PlayCountBuffer(CountingCollection(db.beats, fail_with=error), flush_interval=60, max_keys=100)
+    buffer.record("b1")
+    buffer.record("b2", 4)
+
+    asyncio.run(buffer.flush())
+    assert buffer._pending == {"b2": 4}
+
+
+def test_requeue_never_grows_past_max_keys():
+    db = FakeDatabase()
+    buffer = PlayCountBuffer(CountingCollection(db.beats, fail_with=ConnectionError()), flush_interval=60, max_keys=3)
+
+    async def scenario():
+        buffer.record("b1")
+        buffer.record("b2")
+        flushing = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        buffer.record("b3")
+        buffer.record("b4")
+        await flushing
+
+    asyncio.run(scenario())
+    assert len(buffer._pending) == 3
+    assert buffer.stats()["dropped_keys"] == 1
+
+
+def test_reaching_max_keys_flushes_early():
+    db = FakeDatabase()
+    collection = CountingCollection(db.beats)
+    buffer = PlayCountBuffer(collection, flush_interval=3600, max_keys=3)
+
+    async def scenario():
+        for beat_id in ("b1", "b2", "b3"):
+            buffer.record(beat_id)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert len(collection.batches) == 1
+    assert not buffer._pending
+
+
+def test_daily_rollups_upsert_per_owner_and_day():
+    db = FakeDatabase()
+    buffer = DailyPlayRollupBuffer(db.producer_daily_stats, flush_interval=60, max_keys=100, owner_field="producer_id")
+    buffer.record("p1", "2025-03-01", 2)
+    buffer.record("p1", "2025-03-01")
+    buffer.record("p1", "2025-03-02")
+    asyncio.run(buffer.flush())
+    buffer.record("p1", "2025-03-01")
+    asyncio.run(buffer.flush())
+
+    rows = {(doc["producer_id"], doc["day"]): doc["plays"] for doc in db.producer_daily_stats.docs}
+    assert rows == {("p1", "2025-03-01"): 4, ("p1", "2025-03-02"): 1}
+
+
+def test_listener_sketches_merge_registers_with_max():
+    db = FakeDatabase()
+    buffer = ListenerSketchBuffer(db.listener_sketches, flush_interval=60, max_keys=100, retention_days=35)
+    buffer.record("beat", "b1", "2025-03-01", (5, 2))
+    buffer.record("beat", "b1", "2025-03-01", (5, 4))
+    buffer.record("beat", "b1", "2025-03-01", (9, 1))
+    asyncio.run(buffer.flush())
+    buffer.record("beat", "b1", "2025-03-01", (5, 3))
+    asyncio.run(buffer.flush())
+
+    (doc,) = db.listener_sketches.docs
+    assert doc["r"] == {"5": 4, "9": 1}
+
+
+def test_benchmark_buffered_plays_vs_one_write_per_play():
+    """Micro-benchmark: recording is an in-memory add and 10k plays become one write per beat."""
+    db = FakeDatabase()
+    collection = CountingCollection(db.beats)
+    buffer = PlayCountBuffer(collection, flush_interval=60, max_keys=10000)
+    plays = 10000
+
+    started = time.perf_counter()
+    for i in range(plays):
+        buffer.record(f"b{i % 100}")
+    record_us = (time.perf_counter() - started) / plays * 1e6
+    asyncio.run(buffer.flush())
+
+    written = sum(len(batch) for batch in collection.batches)
+    print(f"{plays} plays: {record_us:.2f}us per record(), {len(collection.batches)} bulk_write "
+          f"carrying {written} updates (unbuffered: {plays} update_one round trips)")
+    assert written == 100 and len(collection.batches) == 1
+    assert record_us < 10
+
+
+def test_cancelled_run_loop_does_not_drop_the_batch_in_flight():
+    db = FakeDatabase()
+    asyncio.run(db.beats.insert_one({"id": "b1", "plays": 0}))
+    collection = CountingCollection(db.beats)
+    buffer = PlayCountBuffer(collection, flush_interval=0, max_keys=100)
+
+    async def scenario():
+        buffer.record("b1", 2)
+        loop = asyncio.create_task(buffer.run())
+        while not collection.batches:
+            await asyncio.sleep(0)
+        assert buffer._flushing()  # run() is now awaiting the bulk_write
+        buffer.record("b1", 1)
+        loop.cancel()
+        await buffer.flush()  # what shutdown does
+
+    asyncio.run(scenario())
+    assert db.beats.docs[0]["plays"] == 3
+    assert len(collection.batches) == 2
+
+
+def test_early_flush_errors_are_logged(caplog):
+    class Broken:
+        name = "beats"
+
+        def bulk_write(self, requests, ordered=True):
+            raise TypeError("not awaitable")
+
+    buffer = PlayCountBuffer(Broken(), flush_interval=3600, max_keys=1)
+
+    async def scenario():
+        buffer.record("b1")
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert "flush failed: not awaitable" in caplog.text
+    assert buffer._pending == {"b1": 1}
+
+
+def test_sketches_expire_after_the_retention_window():
+    db = FakeDatabase()
+    buffer = ListenerSketchBuffer(db.listener_sketches, flush_interval=60, max_keys=100, retention_days=35)
+    buffer.record("beat", "b1", "2025-03-01", (5, 2))
+    asyncio.run(buffer.flush())
+    buffer.record("beat", "b1", "2025-03-01", (5, 3))
+    asyncio.run(buffer.flush())
+
+    (doc,) = db.listener_sketches.docs
+    assert doc["expires_at"] == datetime(2025, 4, 5, tzinfo=timezone.utc)
@@ -0,0 +1,88 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from starlette.testclient import TestClient
+
+import hyperloglog
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    asyncio.run(fake_db.beats.insert_one({"id": "b1", "producer_id": "p1", "plays": 0}))
+    return TestClient(server.app)
+
+
+def test_client_chosen_listener_ids_do_not_create_listeners(client):
+    import server
+
+    events = [{"listener_id": f"anon-{i}"} for i in range(20)]
+    response = client.post("/api/beats/b1/play", json={"events": events})
+    assert response.json() == {"counted": 1, "deduplicated": 19, "rejected": 0}
+    sketch = server.listener_sketches._pending[("beat", "b1", datetime.now(timezone.utc).date().isoformat())]
+    assert hyperloglog.estimate(sketch) == 1
+
+
+def test_stale_plays_are_rejected_and_future_ones_clamped(client):
+    import server
+
+    now = datetime.now(timezone.utc)
+    events = [
+        {"played_at": (now - timedelta(days=3)).isoformat()},
+        {"played_at": (now + timedelta(days=3)).isoformat()},
+    ]
+    response = client.post("/api/beats/b1/play", json={"events": events})
+    assert response.json() == {"counted": 1, "deduplicated": 0, "rejected": 1}
+    assert [day for _, day in server.producer_daily_plays._pending] == [now.date().isoformat()]
+
+
+def test_expired_and_revoked_tokens_count_as_anonymous_listeners(client):
+    import server
+
+    expired = jwt.encode({"user_id": "u1", "exp": 1}, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+    revoked = server.create_access_token({"id": "u2", "email": "b@example.com", "user_type": "artist"})
+    server.revoked_tokens[server.token_digest(revoked)] = 2 ** 31
+    try:
+        responses = [client.post("/api/beats/b1/play", headers={"Authorization": f"Bearer {token}"})
+                     for token in (expired, revoked)]
+    finally:
+        server.revoked_tokens.clear()
+
+    # Both fall back to the same client address and user agent, so the second play is a repeat
+    assert [response.json()["counted"] for response in responses] == [1, 0]
+
+
+@pytest.mark.parametrize("distinct", [10, 500, 20000])
+def test_estimate_is_within_a_few_percent(distinct):
+    sketch = {}
+    for i in range(distinct):
+        hyperloglog.merge(sketch, dict([hyperloglog.register_for(f"user:{i}")]))
+        hyperloglog.merge(sketch, dict([hyperloglog.register_for(f"user:{i}")]))  # repeats never count
+    assert abs(hyperloglog.estimate(sketch) - distinct) <= max(1, distinct * 0.1)
+
+
+def test_merging_daily_sketches_counts_the_union():
+    rng = random.Random(7)
+    listeners = [f"user:{i}" for i in range(3000)]
+    days = [rng.sample(listeners, 800) for _ in range(5)]
+    sketches = []
+    for day in days:
+        sketch = {}
+        for listener in day:
+            hyperloglog.merge(sketch, dict([hyperloglog.register_for(listener)]))
+        sketches.append(sketch)
+
+    forward, backward = {}, {}
+    for sketch in sketches:
+        hyperloglog.merge(forward, sketch)
+    for sketch in reversed(sketches):
+        hyperloglog.merge(backward, {str(k): v for k, v in sketch.items()})  # keys as stored in Mongo
+
+    union = len(set().union(*days))
+    assert forward == backward
+    assert abs(hyperloglog.estimate(forward) - union) <= union * 0.1
+    assert hyperloglog.estimate({}) == 0
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timezone
+
+import bcrypt
+import pytest
+from starlette.testclient import TestClient
+
+PASSWORD_HASH = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=4)).decode()
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    for i, (producer_id, sales) in enumerate([("p1", 3), ("p2", 9)]):
+        asyncio.run(fake_db.users.insert_one({
+            "id": producer_id, "email": f"{producer_id}@example.com", "name": producer_id.upper(),
+            "user_type": "producer", "password": PASSWORD_HASH, "created_at": f"2025-01-0{i + 1}T00:00:00+00:00",
+            # Counters an earlier version kept on the user document
+            "total_sales": sales, "total_revenue": 999.0,
+        }))
+        asyncio.run(fake_db.producer_stats.insert_one({
+            "producer_id": producer_id, "total_beats": 2, "total_sales": sales,
+            "total_revenue": sales * 25.0, "total_plays": 40,
+        }))
+        asyncio.run(fake_db.producer_daily_stats.insert_one({
+            "producer_id": producer_id, "day": today, "sales": sales, "revenue": sales * 25.0, "plays": 4,
+        }))
+    return TestClient(server.app)
+
+
+def login(client, producer_id="p1"):
+    return client.post("/api/auth/login", json={"email": f"{producer_id}@example.com", "password": "pw"})
+
+
+@pytest.mark.parametrize("path", [
+    "/api/users/p1",
+    "/api/users/producers",
+    "/api/users/producers?sort=sales&limit=1",
+    "/api/users/producers/leaderboard?window=all",
+    "/api/users/producers/leaderboard?window=7d",
+])
+def test_revenue_is_absent_from_public_responses(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert "revenue" not in response.text
+
+
+def test_revenue_is_absent_from_login_and_me(client):
+    response = login(client)
+    assert response.status_code == 200
+    assert "revenue" not in response.text
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {response.json()['token']}"})
+    assert me.status_code == 200
+    assert "revenue" not in me.text
+
+
+def test_owner_dashboard_still_shows_revenue(client):
+    token = login(client)
+    dashboard = client.get("/api/stats/dashboard", headers={"Authorization": f"Bearer {token.json()['token']}"})
+    assert dashboard.json()["total_revenue"] == 75.0
+    assert dashboard.json()["total_sales"] == 3
+
+
+def test_producers_list_public_counters_from_producer_stats(client):
+    producers = client.get("/api/users/producers", params={"sort": "sales"}).json()["producers"]
+    assert [(p["id"], p["total_sales"], p["total_beats"], p["total_plays"]) for p in producers] == [
+        ("p2", 9, 2, 40), ("p1", 3, 2, 40)
+    ]
+    ranking = client.get("/api/users/producers/leaderboard", params={"window": "all"}).json()["producers"]
+    assert ranking[0] == {"id": "p2", "name": "P2", "avatar_url": None, "sales": 9, "plays": 40}
+
+
+def test_new_producers_get_a_stats_document(client, fake_db):
+    response = client.post("/api/auth/register", json={
+        "email": "new@example.com", "name": "New", "user_type": "producer", "password": "pw123456"
+    })
+    assert response.status_code == 200
+    producer_id = response.json()["user"]["id"]
+    stats = asyncio.run(fake_db.producer_stats.find_one({"producer_id": producer_id}, {"_id": 0}))
+    assert stats == {"producer_id": producer_id, "total_beats": 0, "total_sales": 0, "total_revenue": 0.0, "total_plays": 0}
+    assert "total_sales" not in asyncio.run(fake_db.users.find_one({"id": producer_id}))
+
+
+def test_dashboard_aggregates_counters_that_were_never_backfilled(client, fake_db):
+    import server
+
+    for i in range(3):
+        asyncio.run(fake_db.beats.insert_one({"id": f"b{i}", "producer_id": "p3", "plays": 10 * i,
+                                              "created_at": f"2025-02-0{i + 1}T00:00:00+00:00"}))
+    asyncio.run(fake_db.purchases.insert_one({"id": "x1", "producer_id": "p3", "amount": 30.0}))
+    # Only a play flush has touched producer_stats since the upgrade
+    asyncio.run(fake_db.producer_stats.insert_one({"producer_id": "p3", "total_plays": 1}))
+
+    token = server.create_access_token({"id": "p3", "email": "p3@example.com", "user_type": "producer"})
+    dashboard = client.get("/api/stats/dashboard", headers={"Authorization": f"Bearer {token}"}).json()
+    assert {key: dashboard[key] for key in ("total_beats", "total_plays", "total_sales", "total_revenue")} == {
+        "total_beats": 3, "total_plays": 30, "total_sales": 1, "total_revenue": 30.0
+    }
+    stored = asyncio.run(fake_db.producer_stats.find_one({"producer_id": "p3"}, {"_id": 0}))
+    assert stored["total_beats"] == 3 and stored["total_revenue"] == 30.0
+
+
+def test_my_sales_total_comes_from_producer_stats(client, fake_db, monkeypatch):
+    import server
+
+    for i in range(3):
+        asyncio.run(fake_db.purchases.insert_one({"id": f"x{i}", "producer_id": "p1", "amount": 25.0,
+                                                  "created_at": f"2025-02-0{i + 1}T00:00:00+00:00"}))
+
+    def unreachable(*args, **kwargs):
+        raise AssertionError("my-sales aggregated every purchase")
+
+    monkeypatch.setattr(fake_db.purchases, "aggregate", unreachable)
+    token = server.create_access_token({"id": "p1", "email": "p1@example.com", "user_type": "producer"})
+    page = client.get("/api/purchases/my-sales", params={"limit": 2}, headers={"Authorization": f"Bearer {token}"})
+    assert page.status_code == 200
+    # The fixture's producer_stats total, not a sum over the purchases
+    assert page.json()["count"] == 2 and page.json()["total_revenue"] == 75.0
+
+
+def test_deleting_a_beat_takes_its_unflushed_plays_off_the_producer(client, fake_db):
+    import server
+
+    asyncio.run(fake_db.beats.insert_one({"id": "b1", "producer_id": "p1", "plays": 30}))
+    for _ in range(4):
+        server.play_buffer.record("b1")
+        server.producer_play_buffer.record("p1")
+
+    token = server.create_access_token({"id": "p1", "email": "p1@example.com", "user_type": "producer"})
+    assert client.delete("/api/beats/b1", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert server.play_buffer.pending("b1") == 0
+    asyncio.run(server.producer_play_buffer.flush())
+    stats = asyncio.run(fake_db.producer_stats.find_one({"producer_id": "p1"}, {"_id": 0}))
+    # 40 before, minus the beat's 30 stored and 4 buffered plays, plus the 4 buffered for the producer
+    assert stats["total_plays"] == 10
@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+import rate_limit
+from rate_limit import BucketPolicy, InMemoryRateLimitBackend, RateLimitMiddleware, client_ip
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def consume(backend, key, cost, policy):
+    return asyncio.run(backend.consume(key, cost, policy))
+
+
+def test_burst_then_reject(clock):
+    backend = InMemoryRateLimitBackend()
+    policy = BucketPolicy(rate=1, burst=3)
+
+    assert [consume(backend, "ip:a", 1, policy) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert consume(backend, "ip:a", 1, policy) == pytest.approx(1.0)
+    # Other callers have their own bucket
+    assert consume(backend, "ip:b", 1, policy) == 0.0
+
+
+def test_tokens_refill_at_the_configured_rate(clock):
+    backend = InMemoryRateLimitBackend()
+    policy = BucketPolicy(rate=2, burst=4)
+    for _ in range(4):
+        consume(backend, "ip:a", 1, policy)
+
+    clock.now += 0.5
+    assert consume(backend, "ip:a", 1, policy) == 0.0
+    assert consume(backend, "ip:a", 1, policy) == pytest.approx(0.5)
+
+    # Refill is capped at the burst size
+    clock.now += 60
+    assert [consume(backend, "ip:a", 1, policy) for _ in range(4)] == [0.0] * 4
+    assert consume(backend, "ip:a", 1, policy) > 0
+
+
+def test_costly_requests_wait_for_enough_tokens(clock):
+    backend = InMemoryRateLimitBackend()
+    policy = BucketPolicy(rate=1, burst=10)
+    assert consume(backend, "ip:a", 10, policy) == 0.0
+    assert consume(backend, "ip:a", 4, policy) == pytest.approx(4.0)
+
+
+def test_eviction_drops_least_recently_used_bucket_only(clock):
+    backend = InMemoryRateLimitBackend(max_keys=3)
+    policy = BucketPolicy(rate=1, burst=2)
+    for key in ("ip:a", "ip:b", "ip:c"):
+        consume(backend, key, 2, policy)
+    consume(backend, "ip:a", 0, policy)  # a becomes most recently used
+
+    consume(backend, "ip:d", 1, policy)
+
+    assert list(backend._buckets) == ["ip:c", "ip:a", "ip:d"]
+    assert backend.evictions == 1
+    # Surviving callers keep their drained buckets instead of being reset
+    assert consume(backend, "ip:a", 1, policy) > 0
+    assert consume(backend, "ip:c", 1, policy) > 0
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def limited_app(backend, ip_policy, user_policy=None, cost=1, user=None):
+    return RateLimitMiddleware(
+        ok_app,
+        backend=backend,
+        ip_policy=ip_policy,
+        user_policy=user_policy or ip_policy,
+        cost_fn=lambda scope: cost,
+        user_key_fn=lambda scope: user,
+    )
+
+
+def test_middleware_returns_429_with_retry_after(clock):
+    client = TestClient(limited_app(InMemoryRateLimitBackend(), BucketPolicy(rate=0.4, burst=2)))
+
+    assert [client.get("/").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    # 1 token at 0.4/s is 2.5s away; Retry-After rounds up to whole seconds
+    assert response.headers["retry-after"] == "3"
+
+    clock.now += 2.5
+    assert client.get("/").status_code == 200
+
+
+def test_middleware_charges_the_user_bucket(clock):
+    backend = InMemoryRateLimitBackend()
+    app = limited_app(backend, BucketPolicy(rate=1, burst=100), BucketPolicy(rate=1, burst=1), user="u1")
+    client = TestClient(app)
+
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 429
+    assert set(backend._buckets) == {"ip:testclient", "user:u1"}
+
+
+def test_zero_cost_requests_skip_limiting(clock):
+    backend = InMemoryRateLimitBackend()
+    client = TestClient(limited_app(backend, BucketPolicy(rate=1, burst=1), cost=0))
+    assert [client.get("/").status_code for _ in range(5)] == [200] * 5
+    assert not backend._buckets
+
+
+@pytest.mark.parametrize("hops, expected", [(0, "10.0.0.9"), (1, "203.0.113.7"), (2, "198.51.100.1"), (5, "1.2.3.4")])
+def test_client_ip_counts_trusted_proxy_hops_from_the_right(hops, expected):
+    # The client forged 1.2.3.4; the outer proxy saw 198.51.100.1, the ingress saw 203.0.113.7
+    scope = {
+        "headers": [(b"x-forwarded-for", b"1.2.3.4, 198.51.100.1"), (b"x-forwarded-for", b"203.0.113.7")],
+        "client": ("10.0.0.9", 443),
+    }
+    assert client_ip(scope, hops) == expected
+
+
+def test_callers_behind_a_proxy_get_their_own_buckets(clock):
+    backend = InMemoryRateLimitBackend()
+    app = RateLimitMiddleware(
+        ok_app, backend=backend, ip_policy=BucketPolicy(rate=1, burst=1), user_policy=BucketPolicy(rate=1, burst=1),
+        cost_fn=lambda scope: 1, user_key_fn=lambda scope: None, trusted_proxies=1,
+    )
+    client = TestClient(app)
+
+    for address in ("203.0.113.7", "203.0.113.8"):
+        assert client.get("/", headers={"X-Forwarded-For": f"6.6.6.6, {address}"}).status_code == 200
+    assert client.get("/", headers={"X-Forwarded-For": "203.0.113.7"}).status_code == 429
+    assert set(backend._buckets) == {"ip:203.0.113.7", "ip:203.0.113.8"}
+
+
+def test_benchmark_middleware_overhead_under_50us():
+    """Micro-benchmark: admission control must add less than 50us per request."""
+    backend = InMemoryRateLimitBackend(max_keys=1000)
+    policy = BucketPolicy(rate=1e9, burst=1e9)
+    wrapped = limited_app(backend, policy, user="u1")
+    rounds = 5000
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    def scope(i):
+        return {"type": "http", "method": "GET", "path": "/", "headers": [], "client": (f"10.0.{i % 250}.1", 1234)}
+
+    async def timed(app):
+        scopes = [scope(i) for i in range(rounds)]
+        started = time.perf_counter()
+        for s in scopes:
+            await app(s, receive, send)
+        return (time.perf_counter() - started) / rounds
+
+    async def scenario():
+        await timed(wrapped)  # warm the buckets
+        return await timed(ok_app), await timed(wrapped)
+
+    bare, limited = asyncio.run(scenario())
+    overhead_us = (limited - bare) * 1e6
+    print(f"rate limiter adds {overhead_us:.1f}us per request (two bucket updates)")
+    assert overhead_us < 50
@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def fixture_db(fake_db):
+    asyncio.run(fake_db.users.insert_one({"id": "a1", "email": "a1@example.com", "name": "Ari", "user_type": "artist"}))
+    asyncio.run(fake_db.users.insert_one({"id": "p1", "email": "p1@example.com", "name": "Mia", "user_type": "producer"}))
+    for beat_id in ("b1", "b2"):
+        asyncio.run(fake_db.beats.insert_one({
+            "id": beat_id, "title": beat_id, "producer_id": "p1", "price": 20.0, "license_type": "non_exclusive",
+            "plays": 0, "purchases": 0, "created_at": "2025-01-01T00:00:00+00:00",
+        }))
+    return fake_db
+
+
+def auth(user_id: str, user_type: str) -> dict:
+    import server
+
+    token = server.create_access_token({"id": user_id, "email": f"{user_id}@example.com", "user_type": user_type})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_purchase_updates_every_rollup_once(fixture_db):
+    import server
+
+    client = TestClient(server.app)
+    response = client.post("/api/purchases", json={"beat_id": "b1", "payment_method": "pix"}, headers=auth("a1", "artist"))
+    assert response.status_code == 200
+
+    today = datetime.now(timezone.utc).date()
+    daily, = fixture_db.producer_daily_stats.docs
+    bucket, = fixture_db.sales_buckets.docs
+    producer_bucket, = fixture_db.producer_sales_buckets.docs
+    assert (daily["day"], daily["sales"], daily["revenue"]) == (today.isoformat(), 1, 20.0)
+    assert (bucket["beat_id"], bucket["month"], bucket["sales"]) == ("b1", today.strftime("%Y-%m"), 1)
+    assert "beat_id" not in producer_bucket
+    assert producer_bucket["days"] == {f"{today.day:02d}": {"sales": 1, "revenue": 20.0}}
+    stats = asyncio.run(fixture_db.producer_stats.find_one({"producer_id": "p1"}))
+    assert (stats["total_sales"], stats["total_revenue"]) == (1, 20.0)
+    assert asyncio.run(fixture_db.beats.find_one({"id": "b1"}))["purchases"] == 1
+
+
+def test_failed_rollup_write_is_logged_and_the_purchase_stands(fixture_db, monkeypatch, caplog):
+    import server
+
+    async def unavailable(requests, ordered=True):
+        raise ConnectionError("sales_buckets unavailable")
+
+    monkeypatch.setattr(fixture_db.sales_buckets, "bulk_write", unavailable)
+    client = TestClient(server.app)
+    response = client.post("/api/purchases", json={"beat_id": "b1", "payment_method": "pix"}, headers=auth("a1", "artist"))
+    assert response.status_code == 200
+    assert "rebuild with init_db.py backfills: sales_buckets unavailable" in caplog.text
+    assert len(fixture_db.purchases.docs) == 1 and len(fixture_db.producer_daily_stats.docs) == 1
+
+
+def test_producer_and_beat_series_read_month_buckets(fixture_db):
+    import server
+
+    asyncio.run(fixture_db.producer_sales_buckets.insert_one({
+        "producer_id": "p1", "month": "2025-03", "sales": 6, "revenue": 120.0,
+        "days": {"03": {"sales": 2, "revenue": 40.0}, "05": {"sales": 1, "revenue": 20.0},
+                 "10": {"sales": 3, "revenue": 60.0}},
+    }))
+    asyncio.run(fixture_db.sales_buckets.insert_one({
+        "producer_id": "p1", "beat_id": "b2", "month": "2025-03", "sales": 1, "revenue": 20.0,
+        "days": {"05": {"sales": 1, "revenue": 20.0}},
+    }))
+    client = TestClient(server.app, headers=auth("p1", "producer"))
+    params = {"granularity": "week", "from": "2025-03-03", "to": "2025-03-16"}
+
+    producer = client.get("/api/stats/sales-timeseries", params=params).json()
+    assert producer["points"] == [
+        {"period": "2025-03-03", "sales": 3, "revenue": 60.0},
+        {"period": "2025-03-10", "sales": 3, "revenue": 60.0},
+    ]
+    beat = client.get("/api/stats/sales-timeseries", params={**params, "beat_id": "b2"}).json()
+    assert [point["sales"] for point in beat["points"]] == [1, 0]
+    assert beat["total_revenue"] == 20.0
+
+
+def test_two_year_producer_series_reads_one_document_per_month(fixture_db, monkeypatch):
+    import server
+
+    reads = []
+    find = fixture_db.producer_sales_buckets.find
+
+    def recording_find(*args, **kwargs):
+        cursor = find(*args, **kwargs)
+        reads.append(cursor)
+        return cursor
+
+    monkeypatch.setattr(fixture_db.producer_sales_buckets, "find", recording_find)
+    for year in (2024, 2025):
+        for month in range(1, 13):
+            asyncio.run(fixture_db.producer_sales_buckets.insert_one({
+                "producer_id": "p1", "month": f"{year}-{month:02d}", "days": {"15": {"sales": 1, "revenue": 10.0}},
+            }))
+    client = TestClient(server.app, headers=auth("p1", "producer"))
+    response = client.get("/api/stats/sales-timeseries", params={"granularity": "month", "from": "2024-01-01",
+                                                                 "to": "2025-12-31"}).json()
+
+    assert len(asyncio.run(reads[0].to_list(None))) == 24
+    assert response["total_sales"] == 24 and len(response["points"]) == 24
+
+
+def test_backfill_rebuilds_beat_and_producer_buckets(fixture_db):
+    import init_db
+
+    asyncio.run(fixture_db.producer_sales_buckets.insert_one({"producer_id": "p1", "month": "2020-01", "sales": 99}))
+    for purchase_id, beat_id, created_at, amount in [
+        ("u1", "b1", "2025-03-03T10:00:00+00:00", 20.0),
+        ("u2", "b2", "2025-03-03T11:00:00+00:00", 30.0),
+        ("u3", "b1", "2025-04-01T09:00:00+00:00", 20.0),
+    ]:
+        asyncio.run(fixture_db.purchases.insert_one({
+            "id": purchase_id, "beat_id": beat_id, "producer_id": "p1", "amount": amount, "created_at": created_at,
+        }))
+    asyncio.run(init_db.backfill_sales_buckets(fixture_db, batch_size=2))
+
+    buckets = {(b["beat_id"], b["month"]): b["sales"] for b in fixture_db.sales_buckets.docs}
+    assert buckets == {("b1", "2025-03"): 1, ("b2", "2025-03"): 1, ("b1", "2025-04"): 1}
+    producer = {b["month"]: (b["sales"], b["revenue"], b["days"]) for b in fixture_db.producer_sales_buckets.docs}
+    assert producer == {
+        "2025-03": (2, 50.0, {"03": {"sales": 2, "revenue": 50.0}}),
+        "2025-04": (1, 20.0, {"01": {"sales": 1, "revenue": 20.0}}),
+    }
+
+
+def test_seed_on_existing_data_runs_no_backfills(fixture_db, monkeypatch):
+    import sys
+
+    import init_db
+
+    class Client:
+        def __getitem__(self, name):
+            return fixture_db
+
+        def close(self):
+            pass
+
+    async def noop(*args, **kwargs):
+        return True
+
+    calls = []
+
+    async def record(db, *args, **kwargs):
+        calls.append(db)
+
+    monkeypatch.setattr(init_db, "AsyncIOMotorClient", lambda url: Client())
+    monkeypatch.setattr(init_db, "create_indexes", noop)
+    monkeypatch.setattr(init_db, "verify_connection", noop)
+    monkeypatch.setattr(init_db, "backfill_producer_stats", record)
+    monkeypatch.setattr(init_db, "backfill_sales_buckets", record)
+    monkeypatch.setattr(sys, "argv", ["init_db.py", "--seed"])
+    asyncio.run(init_db.main())
+    assert calls == []
+
+    monkeypatch.setattr(sys, "argv", ["init_db.py", "--backfill-sales-buckets"])
+    asyncio.run(init_db.main())
+    assert calls == [fixture_db]
@@ -0,0 +1,255 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.testclient import TestClient
+
+from search_index import SuggestIndex, beat_search_words
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+BEATS = [
+    ("b1", "Dark Nights", "Dave", ["trap"], 50),
+    ("b2", "Daylight", "Mia", ["pop"], 500),
+    ("b3", "Sunny Side", "Danny", ["lofi"], 5),
+    ("b4", "Midnight Drive", "Mia", ["dance"], 80),
+    ("b5", "Ocean", "Leo", ["ambient"], 1),
+]
+
+
+@pytest.fixture
+def catalog(fake_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "suggest_index", SuggestIndex())
+    for i, (beat_id, title, producer, tags, plays) in enumerate(BEATS):
+        insert_beat(fake_db, beat_id, title, producer, tags, plays, BASE + timedelta(days=i))
+    asyncio.run(server.build_suggest_index())
+    return TestClient(server.app)
+
+
+def insert_beat(db, beat_id, title, producer, tags, plays, created_at, genre="Trap", description=""):
+    beat = {
+        "id": beat_id, "title": title, "producer_id": producer.lower(), "producer_name": producer,
+        "tags": tags, "plays": plays, "purchases": 0, "genre": genre, "bpm": 120, "price": 20.0,
+        "license_type": "basic", "description": description, "created_at": created_at.isoformat(),
+    }
+    beat["search_words"] = beat_search_words(beat)
+    asyncio.run(db.beats.insert_one(beat))
+
+
+def test_short_search_matches_word_prefixes(catalog):
+    import server
+
+    assert server.build_beats_query(search="da") == {"$and": [{"search_words": {"$regex": "^da"}}]}
+
+    response = catalog.get("/api/beats", params={"search": "Da"})
+    assert response.status_code == 200
+    # Word prefixes in titles, producer names and tags; newest first as usual
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b4", "b3", "b2", "b1"]
+    assert "search_words" not in response.json()["beats"][0]
+
+
+def test_short_search_pages_with_cursors(catalog):
+    first = catalog.get("/api/beats", params={"search": "da", "limit": 3}).json()
+    second = catalog.get("/api/beats", params={"search": "da", "limit": 3, "cursor": first["next_cursor"]}).json()
+    assert [beat["id"] for beat in first["beats"] + second["beats"]] == ["b4", "b3", "b2", "b1"]
+    assert second["next_cursor"] is None
+
+
+def test_short_search_filters_every_match_and_covers_descriptions(catalog, fake_db):
+    insert_beat(fake_db, "b6", "Ocean Floor", "Leo", [], 0, BASE, genre="Pop", description="Made at dawn")
+    insert_beat(fake_db, "b7", "Dawn", "Leo", [], 0, BASE, genre="Pop")
+
+    response = catalog.get("/api/beats", params={"search": "da", "genre": "Pop"})
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b7", "b6"]
+    response = catalog.get("/api/beats", params={"search": "ma"})
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b6"]
+
+
+def test_short_search_with_many_matches_walks_the_sort_index(catalog, fake_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "SEARCH_SORT_MAX_MATCHES", 2)
+    cursors = []
+    find = fake_db.beats.find
+
+    def recording_find(*args, **kwargs):
+        cursors.append(find(*args, **kwargs))
+        return cursors[-1]
+
+    monkeypatch.setattr(fake_db.beats, "find", recording_find)
+    pages, cursor = [], None
+    while True:
+        params = {"search": "da", "sort_by": "plays", "limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = catalog.get("/api/beats", params=params).json()
+        pages += [beat["id"] for beat in page["beats"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    # Every match is listed, none are dropped past the in-memory sort budget
+    assert pages == ["b2", "b4", "b1", "b3"]
+    assert {tuple(c.hinted) for c in cursors} == {(("plays", -1), ("id", -1), ("bpm", 1), ("price", 1))}
+
+    # Few matches: the planner is free to sort them in memory
+    cursors.clear()
+    catalog.get("/api/beats", params={"search": "su"})
+    assert [c.hinted for c in cursors] == [None]
+
+
+def test_short_search_does_not_wait_for_the_suggest_index(fake_db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "suggest_index", SuggestIndex())
+    insert_beat(fake_db, "b1", "Dark Nights", "Dave", [], 0, BASE)
+    response = TestClient(server.app).get("/api/beats", params={"search": "d"})
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b1"]
+
+
+def test_relevance_rejects_cursors(catalog):
+    response = catalog.get("/api/beats", params={"search": "dark", "sort_by": "relevance", "cursor": "abc"})
+    assert response.status_code == 400
+    assert "relevance" in response.json()["detail"]
+
+
+def test_relevance_sorts_by_text_score_without_returning_it(catalog, fake_db, monkeypatch):
+    import server
+
+    calls = []
+    original_find = fake_db.beats.find
+
+    def find(query, projection=None):
+        calls.append((query, projection))
+        return original_find({"id": "b1"}, projection)
+
+    monkeypatch.setattr(fake_db.beats, "find", find)
+    response = asyncio.run(server.query_beats(None, None, None, None, "dark", "relevance", 10, None, None))
+
+    (query, projection), = calls
+    assert query == {"$text": {"$search": "dark"}}
+    assert "score" not in projection
+    assert [beat["id"] for beat in response["beats"]] == ["b1"]
+    assert "score" not in response["beats"][0]
+
+
+def test_benchmark_short_search_prefix_range_vs_scan():
+    """Micro-benchmark: an anchored prefix on search_words reads one index range instead of every beat."""
+    import bisect
+    import re
+    import time
+
+    words = ["dark", "dawn", "day", "drill", "sun", "soul", "trap", "zen", "ocean", "wave"]
+    beats = [
+        {"id": f"b{i}", "title": f"{words[i % 10]} {words[i * 7 % 10]} {i}", "producer_name": f"P{i % 300}",
+         "tags": [words[i * 3 % 10]], "description": ""}
+        for i in range(50000)
+    ]
+    # What the multikey search_words index holds: one sorted (word, id) entry per stored word
+    entries = sorted((word, beat["id"]) for beat in beats for word in beat_search_words(beat))
+
+    started = time.perf_counter()
+    for _ in range(20):
+        start = bisect.bisect_left(entries, ("da",))
+        end = bisect.bisect_left(entries, ("db",), start)
+        ids = {beat_id for _, beat_id in entries[start:end]}
+    index_ms = (time.perf_counter() - started) / 20 * 1000
+
+    # What the old case-insensitive regex did: test every document
+    pattern = re.compile("^da", re.IGNORECASE)
+    started = time.perf_counter()
+    scanned = [b["id"] for b in beats
+               if pattern.search(b["title"]) or pattern.search(b["producer_name"])
+               or any(pattern.search(tag) for tag in b["tags"])]
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    print(f"short search over 50k beats: prefix range {index_ms:.2f}ms, regex scan {scan_ms:.1f}ms "
+          f"({len(ids)} matches)")
+    # The regex only matched the start of each field, search_words matches every word
+    assert set(scanned) < ids
+    assert index_ms < scan_ms
+
+
+def test_suggest_index_is_built_off_the_loop_and_swapped_with_concurrent_writes(catalog, fake_db, monkeypatch):
+    import threading
+
+    import server
+
+    live = server.suggest_index
+    staged_on = []
+    stage_beats = SuggestIndex.stage_beats
+
+    def recording_stage_beats(index, batch):
+        staged_on.append(threading.get_ident())
+        stage_beats(index, batch)
+
+    monkeypatch.setattr(SuggestIndex, "stage_beats", recording_stage_beats)
+    monkeypatch.setattr(server, "SUGGEST_INDEX_BATCH_SIZE", 2)
+
+    async def scenario():
+        build = asyncio.create_task(server.build_suggest_index())
+        while server.suggest_index_changes is None:
+            await asyncio.sleep(0)
+        # Writes while the fresh index is being built reach the live index at once and the new one later
+        server.update_suggest_index(lambda index: index.add_beat({"id": "b9", "title": "Dawn Chorus", "plays": 9}))
+        server.update_suggest_index(lambda index: index.remove_beat("b1"))
+        assert server.suggest_index is live and "b9" in live.match_beat_ids("dawn", 5)
+        await build
+
+    asyncio.run(scenario())
+    assert server.suggest_index is not live
+    assert server.suggest_index_changes is None
+    assert threading.get_ident() not in staged_on and len(staged_on) == 3
+    assert server.suggest_index.match_beat_ids("da", 10) == ["b2", "b4", "b9", "b3"]
+
+
+def test_backfill_stores_search_words_on_beats_without_them(fake_db):
+    import init_db
+
+    asyncio.run(fake_db.beats.insert_one({"id": "old", "title": "Lo-Fi Nights", "producer_name": "Dave",
+                                          "tags": ["Chill"], "description": "Made at dawn"}))
+    insert_beat(fake_db, "new", "Sunny", "Mia", [], 0, BASE)
+    asyncio.run(init_db.backfill_search_words(fake_db))
+
+    stored = {beat["id"]: beat["search_words"] for beat in fake_db.beats.docs}
+    assert stored == {"old": ["at", "chill", "dave", "dawn", "fi", "lo", "made", "nights"], "new": ["mia", "sunny"]}
+
+
+def test_short_search_without_words_lists_the_catalog(catalog):
+    import server
+
+    # Mongo rejects an empty $and, and punctuation alone matches no stored word anyway
+    assert server.build_beats_query(search="-!") == {}
+    assert len(catalog.get("/api/beats", params={"search": "-!"}).json()["beats"]) == 5
+
+
+@pytest.mark.parametrize("matches", [1, 501])
+def test_text_search_sorts_in_memory_only_within_the_budget(catalog, fake_db, monkeypatch, matches):
+    counted, calls = [], []
+    find = fake_db.beats.find
+
+    async def count_documents(query, limit=0):
+        counted.append((query, limit))
+        return min(matches, limit)
+
+    def recording_find(query, projection=None):
+        # The fake has no text index: answer every query with the one beat that matches "dark nights"
+        calls.append(query)
+        calls.append(find({"id": "b1"}, projection))
+        return calls[-1]
+
+    monkeypatch.setattr(fake_db.beats, "count_documents", count_documents)
+    monkeypatch.setattr(fake_db.beats, "find", recording_find)
+    response = catalog.get("/api/beats", params={"search": "Dark Nights", "genre": "Trap"})
+
+    assert [beat["id"] for beat in response.json()["beats"]] == ["b1"]
+    assert counted == [({"genre": "Trap", "$text": {"$search": "dark nights"}}, 501)]
+    query, cursor = calls
+    if matches <= 500:
+        assert query == {"genre": "Trap", "$text": {"$search": "dark nights"}}
+        assert cursor.hinted is None
+    else:
+        # Too many to sort: walk the genre's created_at index, filtering on the stored words
+        assert query == {"genre": "Trap", "search_words": {"$in": ["dark", "nights"]}}
+        assert cursor.hinted == [("genre", 1), ("created_at", -1), ("id", -1), ("bpm", 1), ("price", 1)]
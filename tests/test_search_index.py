@@ -0,0 +1,156 @@
+import random
+import time
+
+import pytest
+
+from search_index import SuggestIndex, normalize
+
+WORDS = ["dark", "dawn", "day", "drill", "dream", "deep", "sun", "soul", "summer", "trap", "tropic", "zen"]
+
+
+def random_catalog(seed: int, size: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"b{i:05d}",
+            "title": " ".join(rng.sample(WORDS, 2)),
+            "producer_id": f"p{i % 7}",
+            "producer_name": rng.choice(["Dave", "Mia", "Sunny D"]),
+            "tags": rng.sample(["trap", "lo-fi", "drill", "soul"], 1),
+            "plays": rng.randrange(50),
+        }
+        for i in range(size)
+    ]
+
+
+def brute_force(beats: list, query: str, limit: int) -> list:
+    words = normalize(query).split()
+
+    def beat_words(beat):
+        text = " ".join([beat["title"], beat["producer_name"], *beat["tags"]])
+        return normalize(text).split()
+
+    matching = [b for b in beats if all(any(w.startswith(q) for w in beat_words(b)) for q in words)]
+    matching.sort(key=lambda b: (-b["plays"], b["id"]))
+    return [b["id"] for b in matching[:limit]]
+
+
+@pytest.mark.parametrize("query", ["d", "da", "dr", "s", "sun", "trap d", "d s", "dave zen", "lo", "x"])
+def test_matches_are_the_most_played_true_matches(query):
+    beats = random_catalog(1, 3000)
+    index = SuggestIndex()
+    index.load(beats, [])
+    assert index.match_beat_ids(query, 25) == brute_force(beats, query, 25)
+
+
+def test_multi_word_matches_outside_the_first_word_top_postings():
+    # 2000 popular "beat" titles hide the few that also contain "zed"
+    beats = [{"id": f"b{i:04d}", "title": "beat", "plays": 1000 + i} for i in range(2000)]
+    beats += [{"id": f"z{i}", "title": "beat zed", "plays": i} for i in range(3)]
+    index = SuggestIndex()
+    index.load(beats, [])
+    assert index.match_beat_ids("beat ze", 10) == ["z2", "z1", "z0"]
+
+
+def test_incremental_updates_match_a_fresh_load():
+    beats = random_catalog(2, 400)
+    incremental = SuggestIndex()
+    for beat in beats:
+        incremental.add_beat(beat)
+    rng = random.Random(3)
+    for beat in rng.sample(beats, 100):
+        beat["plays"] = rng.randrange(1000)
+        incremental.add_beat(beat)
+    removed = {beat["id"] for beat in rng.sample(beats, 50)}
+    for beat_id in removed:
+        incremental.remove_beat(beat_id)
+
+    fresh = SuggestIndex()
+    fresh.load([beat for beat in beats if beat["id"] not in removed], [])
+    for query in ("d", "dr", "s", "t", "summer", "lo fi", "mia"):
+        assert incremental.suggest(query, 20) == fresh.suggest(query, 20)
+
+
+def test_producers_and_tags_are_listed_by_name():
+    index = SuggestIndex()
+    index.load(
+        [{"id": "b1", "title": "x", "tags": ["Lo-Fi", "Lounge", "Trap"], "plays": 1}],
+        [("p2", "Lola"), ("p1", "Leo"), ("p3", "Mia Lo")],
+    )
+    result = index.suggest("lo", 10)
+    assert [p["name"] for p in result["producers"]] == ["Lola", "Mia Lo"]
+    assert result["tags"] == ["Lo-Fi", "Lounge"]
+
+    index.set_producer("p1", "Lorde")
+    assert [p["name"] for p in index.suggest("lo", 10)["producers"]] == ["Lola", "Lorde", "Mia Lo"]
+
+
+def test_benchmark_bulk_load_sorts_once():
+    """Micro-benchmark: loading a catalog with a large vocabulary must stay near-linear."""
+    def catalog(size):
+        return [{"id": f"b{i}", "title": f"w{i} x{i % 97}", "tags": [f"t{i}"], "plays": i % 1000} for i in range(size)]
+
+    timings = {}
+    for size in (20000, 80000):
+        beats = catalog(size)
+        started = time.perf_counter()
+        SuggestIndex().load(beats, [])
+        timings[size] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    incremental = SuggestIndex()
+    for beat in catalog(20000):
+        incremental.add_beat(beat)
+    incremental_seconds = time.perf_counter() - started
+
+    print(f"load 20k beats {timings[20000] * 1000:.0f}ms, 80k beats {timings[80000] * 1000:.0f}ms; "
+          f"20k one-by-one inserts {incremental_seconds * 1000:.0f}ms")
+    # 4x the beats (and distinct terms) must cost far less than the 16x of a quadratic build
+    assert timings[80000] < timings[20000] * 8
+
+
+def test_precomputed_short_prefixes_stay_exact_through_updates(monkeypatch):
+    import search_index
+
+    # A tiny top list so lookups also run past its end into the merged postings
+    monkeypatch.setattr(search_index, "TOP_KEYS", 5)
+    beats = random_catalog(4, 300)
+    index = SuggestIndex()
+    index.load(beats, [])
+    rng = random.Random(5)
+    for beat in rng.sample(beats, 60):
+        beat["plays"] = rng.randrange(1000)
+        index.add_beat(beat)
+    removed = {beat["id"] for beat in rng.sample(beats, 40)}
+    for beat_id in removed:
+        index.remove_beat(beat_id)
+    remaining = [beat for beat in beats if beat["id"] not in removed]
+
+    for query in ("d", "da", "s", "su", "t", "lo", "d s", "z"):
+        for limit in (3, 5, 8, 40):
+            assert index.match_beat_ids(query, limit) == brute_force(remaining, query, limit)
+
+
+def test_benchmark_short_prefix_lookup_latency():
+    """Micro-benchmark: one and two character queries, which match most of the catalog, stay under 2ms."""
+    rng = random.Random(6)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = sorted({"".join(rng.choice(letters) for _ in range(rng.randrange(3, 9))) for _ in range(30000)})
+    beats = [
+        {"id": f"b{i}", "title": " ".join(rng.sample(vocabulary, 3)), "producer_name": rng.choice(vocabulary),
+         "tags": rng.sample(vocabulary[:300], 2), "plays": rng.randrange(100000)}
+        for i in range(100000)
+    ]
+    index = SuggestIndex()
+    index.load(beats, [(f"p{i}", rng.choice(vocabulary)) for i in range(2000)])
+
+    timings = {}
+    for query in ("a", "s", "ab", "st", "a b", "s t"):
+        index.suggest(query, 10)
+        started = time.perf_counter()
+        for _ in range(50):
+            index.suggest(query, 10)
+        timings[query] = (time.perf_counter() - started) / 50 * 1000
+
+    print("suggest() over 100k beats, 30k terms: " + ", ".join(f"{q!r} {ms:.2f}ms" for q, ms in timings.items()))
+    assert max(timings.values()) < 2
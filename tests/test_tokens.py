@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from starlette.testclient import TestClient
+
+USER = {"id": "u1", "email": "a@example.com", "name": "Ada", "user_type": "producer"}
+
+
+@pytest.fixture
+def client(fake_db):
+    import server
+
+    asyncio.run(fake_db.users.insert_one(dict(USER)))
+    server.revoked_tokens.clear()
+    yield TestClient(server.app)
+    server.revoked_tokens.clear()
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_decode_token_caches_verified_payload(fake_db):
+    import server
+
+    token = server.create_access_token(USER)
+    first = server.decode_token(token)
+    assert server.token_cache.get(server.token_digest(token)) == first
+    assert server.decode_token(token) is first
+
+
+def test_invalid_and_tampered_tokens_are_rejected(fake_db):
+    import server
+
+    forged = jwt.encode({"user_id": "u1", "exp": time.time() + 60}, "other-secret", algorithm="HS256")
+    with pytest.raises(HTTPException) as raised:
+        server.decode_token(forged)
+    assert raised.value.detail == "Invalid token"
+
+    expired = jwt.encode({"user_id": "u1", "exp": time.time() - 5}, server.JWT_SECRET, algorithm="HS256")
+    with pytest.raises(HTTPException) as raised:
+        server.decode_token(expired)
+    assert raised.value.detail == "Token expired"
+
+
+def test_logout_revokes_a_cached_token(client):
+    import server
+
+    token = server.create_access_token(USER)
+    assert client.get("/api/auth/me", headers=auth(token)).status_code == 200
+    assert client.post("/api/auth/logout", headers=auth(token)).status_code == 200
+
+    response = client.get("/api/auth/me", headers=auth(token))
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+
+
+def test_revocations_reload_from_mongo(client, fake_db):
+    import server
+
+    token = server.create_access_token(USER)
+    server.decode_token(token)
+    asyncio.run(server.revoke_token(token, jwt.decode(token, server.JWT_SECRET, algorithms=["HS256"])))
+    server.revoked_tokens.clear()
+
+    # Another worker's revocation arrives through the periodic reload
+    asyncio.run(server.load_revoked_tokens())
+    with pytest.raises(HTTPException):
+        server.decode_token(token)
+
+
+def test_benchmark_cached_decode_beats_signature_check(fake_db):
+    """Micro-benchmark: a token cache hit must be cheaper than verifying the JWT."""
+    import server
+
+    token = server.create_access_token(USER)
+    rounds = 2000
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        jwt.decode(token, server.JWT_SECRET, algorithms=[server.JWT_ALGORITHM])
+    verify_us = (time.perf_counter() - started) / rounds * 1e6
+
+    server.decode_token(token)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        server.decode_token(token)
+    cached_us = (time.perf_counter() - started) / rounds * 1e6
+
+    print(f"jwt.decode {verify_us:.1f}us per call, cached decode_token {cached_us:.1f}us per call")
+    assert cached_us < verify_us / 2
+
+
+def test_access_token_carries_no_mutable_claims(fake_db):
+    import server
+
+    payload = jwt.decode(server.create_access_token(USER), server.JWT_SECRET, algorithms=["HS256"])
+    assert "name" not in payload
+    assert payload["user_type"] == "producer"
+
+
+def test_writes_use_the_current_display_name(client, fake_db):
+    import server
+
+    artist = {"id": "a1", "email": "b@example.com", "name": "Old Name", "user_type": "artist"}
+    asyncio.run(fake_db.users.insert_one(dict(artist)))
+    asyncio.run(fake_db.beats.insert_one({
+        "id": "b1", "title": "Beat", "producer_id": "u1", "producer_name": "Ada",
+        "price": 10.0, "license_type": "basic", "genre": "trap", "plays": 0, "purchases": 0,
+    }))
+    token = server.create_access_token(artist)
+
+    assert client.get("/api/auth/me", headers=auth(token)).json()["name"] == "Old Name"
+    assert client.put("/api/auth/profile", params={"name": "New Name"}, headers=auth(token)).status_code == 200
+
+    # The token issued before the rename must not write the old name
+    response = client.post("/api/purchases", json={"beat_id": "b1", "payment_method": "stripe"}, headers=auth(token))
+    assert response.status_code == 200, response.text
+    assert fake_db.purchases.docs[0]["buyer_name"] == "New Name"
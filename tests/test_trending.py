@@ -0,0 +1,91 @@
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from tests.fake_mongo import FakeDatabase
+from trending import EPOCH, TrendingBuffer, _logaddexp_expr, logaddexp
+
+HALF_LIFE = 48
+
+
+def evaluate(expr, doc):
+    """Evaluate the arithmetic aggregation operators used by TrendingBuffer."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc[expr[1:]]
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    values = [evaluate(arg, doc) for arg in args] if isinstance(args, list) else [evaluate(args, doc)]
+    return {
+        "$add": lambda v: sum(v), "$max": max, "$ln": lambda v: math.log(v[0]), "$exp": lambda v: math.exp(v[0]),
+        "$multiply": lambda v: math.prod(v), "$abs": lambda v: abs(v[0]), "$subtract": lambda v: v[0] - v[1],
+    }[op](values)
+
+
+def decayed(events, now):
+    return sum(weight * 0.5 ** ((now - at).total_seconds() / 3600 / HALF_LIFE) for weight, at in events)
+
+
+def test_stored_order_matches_decayed_score_at_any_time():
+    rng = random.Random(5)
+    buffer = TrendingBuffer(None, 60, 1000, HALF_LIFE)
+    start = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    beats = {
+        f"b{i}": [(rng.choice([1, 1, 1, 25]), start + timedelta(hours=rng.uniform(0, 24 * 30))) for _ in range(rng.randrange(1, 40))]
+        for i in range(50)
+    }
+    stored = {}
+    for beat_id, events in beats.items():
+        for weight, at in events:
+            score = buffer.score(weight, at)
+            stored[beat_id] = score if beat_id not in stored else buffer._combine(stored[beat_id], score)
+
+    for now in (start + timedelta(days=31), start + timedelta(days=400)):
+        by_decay = sorted(beats, key=lambda b: decayed(beats[b], now), reverse=True)
+        assert sorted(beats, key=stored.get, reverse=True) == by_decay
+        # The stored value is the decayed score, shifted by a constant for a given instant
+        offset = stored["b0"] - math.log(decayed(beats["b0"], now))
+        for beat_id in beats:
+            assert math.isclose(stored[beat_id] - math.log(decayed(beats[beat_id], now)), offset, rel_tol=1e-9)
+
+
+def test_one_half_life_later_counts_double():
+    buffer = TrendingBuffer(None, 60, 1000, HALF_LIFE)
+    at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    later = buffer.score(1, at + timedelta(hours=HALF_LIFE))
+    assert math.isclose(later - buffer.score(1, at), math.log(2))
+    assert math.isclose(buffer.score(25, at) - buffer.score(1, at), math.log(25))
+    assert buffer.score(1, at.replace(tzinfo=None)) == buffer.score(1, at)  # naive means UTC
+    assert buffer.score(1, at.isoformat()) == buffer.score(1, at)
+
+
+def test_logaddexp_does_not_overflow_far_from_the_epoch():
+    big = TrendingBuffer(None, 60, 1000, 1).score(1, EPOCH + timedelta(days=3650))
+    assert big > 700  # e**big overflows a float
+    assert math.isclose(logaddexp(big, big), big + math.log(2))
+    assert logaddexp(big, 0.0) == big
+
+
+def test_pipeline_expression_matches_logaddexp():
+    for a, b in [(0.0, 0.0), (3.5, -2.0), (-1.0, 40.0), (800.0, 799.0)]:
+        assert math.isclose(evaluate(_logaddexp_expr("$trending", b), {"trending": a}), logaddexp(a, b))
+
+
+def test_backfill_scores_only_unscored_beats():
+    db = FakeDatabase()
+    created_at = (EPOCH + timedelta(days=100)).isoformat()
+    for beat in [
+        {"id": "quiet", "created_at": created_at, "plays": 0, "purchases": 0},
+        {"id": "busy", "created_at": created_at, "plays": 40, "purchases": 2},
+        {"id": "scored", "created_at": created_at, "plays": 40, "trending": 1.5},
+    ]:
+        asyncio.run(db.beats.insert_one(beat))
+    buffer = TrendingBuffer(db.beats, 60, 1000, HALF_LIFE)
+
+    assert asyncio.run(buffer.backfill(5, 25)) == 2
+    scores = {doc["id"]: doc["trending"] for doc in db.beats.docs}
+    assert scores["scored"] == 1.5
+    assert math.isclose(scores["quiet"], buffer.score(5, created_at))
+    assert math.isclose(scores["busy"], buffer.score(5 + 40 + 2 * 25, created_at))
+    assert asyncio.run(buffer.backfill(5, 25)) == 0